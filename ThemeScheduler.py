@@ -29,185 +29,1278 @@ See multiconf.py for more details.
 
 Creates theme file if it doesn't exists (turned off by default).
 """
-from datetime import datetime, timedelta
-import time
 import sublime
 import sublime_plugin
-from collections import namedtuple
-import threading
-from .lib.file_strip.json import sanitize_json
-from .lib.multiconf import get as multiget
 import json
-from os.path import exists, join
-import textwrap
+from fnmatch import fnmatch
+import threading
+import time
+from .lib.clock import Deadline, aware, format_time, next_deadline, to_wall, wall_datetime, DAY
+from .lib.lifecycle import Lifecycle, Pending, TimerWorker, Worker
+from .lib.multiconf import get as multiget, prefetch_hostname, Qualifications
+from .lib.profiles import Profiles, DEFAULT as DEFAULT_PROFILE
+from .lib.schedule import Schedule
+from .lib.transaction import Transaction
+import os
+from os.path import basename, exists, join
 
 LOAD_RETRIES = 5
+TIMINGS = {"plugin_loaded": 0.0}
+COMMAND_TIMEOUT = 10.0
+VIEW_CHUNK_SIZE = 200
+WINDOW_KEY = "theme_scheduler_window"
 SETTINGS = {}
 
-if 'ts_thread' not in globals():
-    ts_thread = None
+if 'LIFECYCLE' not in globals():
+    LIFECYCLE = Lifecycle('ThemeScheduler')
+
+
+def log(s):
+    """Basic logging."""
+    print("ThemeScheduler: %s" % s)
+
+
+def debug_log(s):
+    """Debug logging."""
+
+    if SETTINGS.get("debug", False):
+        log(s)
+
+
+def create_settings(settings_path):
+    """Create settings file."""
+
+    err = False
+    default_theme = {
+        "enabled": False,
+        "themes": [],
+    }
+    j = json.dumps(default_theme, sort_keys=True, indent=4, separators=(',', ': '))
+    try:
+        with open(settings_path, 'w') as f:
+            f.write(j + "\n")
+    except Exception:
+        err = True
+    return err
+
+
+def get_current_time():
+    """Get the current local time as seconds since midnight and a naive `datetime`."""
+
+    wall = to_wall(int(time.time()))
+    return wall % DAY, wall_datetime(wall)
+
+
+def show_panel(name, text):
+    """Append text to an output panel and show it."""
+
+    window = sublime.active_window()
+    if window is None:
+        log(text)
+        return
+    panel = window.find_output_panel(name)
+    if panel is None:
+        panel = window.create_output_panel(name)
+    panel.run_command('append', {'characters': text + '\n', 'force': True, 'scroll_to_end': True})
+    window.run_command('show_panel', {'panel': 'output.%s' % name})
+
+
+def display_message(msg):
+    """Display alert message."""
+
+    settings = sublime.load_settings("ThemeScheduler.sublime-settings")
+    use_sub_notify = multiget(settings, "use_sub_notify", False)
+    if use_sub_notify:
+        sublime.run_command("sub_notify", {"title": "ThemeScheduler", "msg": msg})
+    else:
+        if ThemeScheduler.dialog_open:
+            log("Dialog already open!")
+            log(msg)
+            return
+        ThemeScheduler.dialog_open = True
+        sublime.ok_cancel_dialog(msg)
+        ThemeScheduler.update = True
+        ThemeScheduler.dialog_open = False
+        if LIFECYCLE.worker is not None:
+            LIFECYCLE.worker.wake()
+
+
+class ThemeSchedulerGetNextChangeCommand(sublime_plugin.ApplicationCommand):
+    """Show the time and theme in queue."""
+
+    def run(self):
+        """Run command."""
+
+        next_time = ThemeScheduler.next_time
+        sublime.message_dialog(
+            "ThemeScheduler: Next Change @ %s\n%s" % (
+                next_time.strftime('%Y-%m-%d %H:%M:%S') if next_time is not None else "None",
+                str(ThemeScheduler.next_change)
+            )
+        )
+
+
+class ThemeSchedulerProfileCommand(sublime_plugin.ApplicationCommand):
+    """Profile the next scheduler operations."""
+
+    def run(self, count=3):
+        """Run command."""
+
+        Profiler.arm(count)
+
+
+class ThemeSchedulerJournalCommand(sublime_plugin.ApplicationCommand):
+    """Show the journal entries of a time range."""
+
+    def run(self, start=None, end=None, hours=24):
+        """
+        Run command.
+
+        `start` and `end` are local times (`YYYY-MM-DD HH:MM`), by default the last `hours` are shown.
+        """
+
+        try:
+            end = time.mktime(time.strptime(end, '%Y-%m-%d %H:%M')) if end else time.time()
+            start = time.mktime(time.strptime(start, '%Y-%m-%d %H:%M')) if start else end - hours * 3600
+        except ValueError as e:
+            log("Invalid journal range: %s" % str(e))
+            return
+        History.show(int(start), int(end))
+
+
+class ThemeSchedulerRefreshCommand(sublime_plugin.ApplicationCommand):
+    """Refresh the theme for the current time."""
+
+    def run(self):
+        """Run command."""
+
+        ResourceIndex.invalidate()
+        ScheduleCache.invalidate()
+        if Includes.cache is not None:
+            Includes.cache.clear()
+        if ThemeScheduler.profiles is not None:
+            ThemeScheduler.profiles.clear()
+        manage_thread()
+
+
+class ThemeSchedulerPreviewCommand(sublime_plugin.ApplicationCommand):
+    """Preview the schedule entries."""
+
+    def run(self):
+        """Run command."""
+
+        window = sublime.active_window()
+        if window is not None:
+            Preview.show(window)
+
+
+class ThemeSchedulerSwitchProfileCommand(sublime_plugin.ApplicationCommand):
+    """Switch the schedule profile."""
+
+    def run(self, profile=None):
+        """Run command."""
+
+        if profile is not None:
+            ThemeScheduler.switch(profile)
+            return
+
+        window = sublime.active_window()
+        if window is None:
+            return
+        names = ThemeScheduler.get_profile_names()
+        active = ThemeScheduler.get_profiles().active
+        window.show_quick_panel(
+            names,
+            lambda index: ThemeScheduler.switch(names[index]) if index != -1 else None,
+            selected_index=names.index(active) if active in names else 0
+        )
+
+
+class CommandWrapper(object):
+    """
+    Command wrapper that stores the command, arguments and how the command is run.
+
+    Wrappers are shared by every record with the same command, so they hold no run state.
+    """
+
+    TARGETS = ("application", "window", "view")
+    __slots__ = ("cmd", "args", "target", "before", "run_async", "timeout")
+
+    def __init__(self, cmd):
+        """Setup command and arguments to be run."""
+
+        self.cmd = cmd["command"]
+        self.args = cmd.get("args", {})
+        self.target = cmd.get("target", "application")
+        if self.target not in self.TARGETS:
+            log("Command %s has an invalid target '%s', using 'application'." % (self.cmd, self.target))
+            self.target = "application"
+        self.before = cmd.get("order", "after") == "before"
+        self.run_async = bool(cmd.get("async", False))
+        timeout = cmd.get("timeout", COMMAND_TIMEOUT)
+        try:
+            self.timeout = float(timeout)
+            if not self.timeout > 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            log("Command %s has an invalid timeout '%s', using %s." % (self.cmd, timeout, COMMAND_TIMEOUT))
+            self.timeout = COMMAND_TIMEOUT
+
+    def __str__(self):
+        """Return command name."""
+
+        return self.cmd
+
+    __repr__ = __str__
+
+    def get_target(self):
+        """Get the object to run the command on."""
+
+        if self.target == "application":
+            return sublime
+        window = sublime.active_window()
+        if self.target == "window" or window is None:
+            return window
+        return window.active_view()
+
+    def run(self):
+        """Execute command and return how long it took."""
+
+        started = time.perf_counter()
+        try:
+            target = self.get_target()
+            if target is None:
+                log("Command %s failed: no active %s!" % (self.cmd, self.target))
+            else:
+                target.run_command(self.cmd, self.args)
+        except Exception as e:
+            log("Command %s failed with %s: %s" % (self.cmd, type(e).__name__, str(e)))
+        latency = time.perf_counter() - started
+        debug_log("Command %s took %.3fs" % (self.cmd, latency))
+        if latency > self.timeout:
+            log("Command %s exceeded its timeout of %.1fs!" % (self.cmd, self.timeout))
+        return latency
+
+    def check_timeout(self, done):
+        """Report an asynchronous command that is still running after its timeout."""
+
+        if not done.is_set():
+            log("Command %s timed out after %.1fs and is still running!" % (self.cmd, self.timeout))
+
+
+class CommandStage(object):
+    """
+    Commands of a record.
+
+    Commands run in order, either before or after the color scheme change.
+    Commands marked `async` run in order on a worker thread so they don't block the main thread.
+    """
+
+    __slots__ = ("commands",)
+
+    def __init__(self, commands, wrappers=CommandWrapper):
+        """Setup commands, creating the command wrappers with the `wrappers` factory."""
+
+        self.commands = tuple(wrappers(cmd) for cmd in ([commands] if isinstance(commands, dict) else commands))
+
+    def __str__(self):
+        """Return command names."""
+
+        return ', '.join(str(cmd) for cmd in self.commands)
+
+    __repr__ = __str__
+
+    def run(self, before):
+        """Run the commands that are ordered before or after the color scheme change."""
+
+        pending = [cmd for cmd in self.commands if cmd.before == before]
+        background = [cmd for cmd in pending if cmd.run_async]
+        for cmd in pending:
+            if not cmd.run_async:
+                cmd.run()
+        if background:
+            worker = threading.Thread(target=self.run_background, args=(background,))
+            worker.daemon = True
+            worker.start()
+
+    def run_background(self, commands):
+        """Run asynchronous commands in order and watch for timeouts."""
+
+        for cmd in commands:
+            done = threading.Event()
+            sublime.set_timeout(lambda c=cmd, d=done: c.check_timeout(d), int(cmd.timeout * 1000))
+            cmd.run()
+            done.set()
+
+
+class ResourceIndex(object):
+    """Index of the color scheme and theme resources known to Sublime."""
+
+    extensions = ('.tmTheme', '.sublime-color-scheme', '.sublime-theme')
+    paths = set()
+    names = {}
+    ready = False
+    digest = None
+    packages = None
+    preloaded = set()
+
+    @classmethod
+    def build(cls):
+        """Index all scheme and theme resources with a single resource sweep."""
+
+        import hashlib
+
+        paths = set()
+        names = {}
+        for resource in sublime.find_resources('*'):
+            if resource.endswith(cls.extensions):
+                paths.add(resource)
+                names.setdefault(basename(resource), resource)
+        cls.paths = paths
+        cls.names = names
+        cls.digest = hashlib.sha1('\n'.join(sorted(paths)).encode('utf-8')).hexdigest()
+        cls.preloaded = set()
+        cls.ready = True
+        debug_log("Indexed %d scheme and theme resources" % len(paths))
+
+    @classmethod
+    def invalidate(cls):
+        """Mark the index as stale so it is rebuilt on next use."""
+
+        cls.ready = False
+
+    @classmethod
+    def check_packages(cls):
+        """Invalidate the index if the installed or ignored packages changed."""
+
+        packages = (
+            tuple(sublime.load_settings("Preferences.sublime-settings").get("ignored_packages", [])),
+            tuple(sublime.load_settings("Package Control.sublime-settings").get("installed_packages", []))
+        )
+        if packages != cls.packages:
+            cls.packages = packages
+            cls.invalidate()
+
+    @classmethod
+    def watch(cls):
+        """Watch for package changes."""
+
+        for settings_file in ("Preferences.sublime-settings", "Package Control.sublime-settings"):
+            settings = sublime.load_settings(settings_file)
+            settings.clear_on_change('ThemeScheduler.resources')
+            settings.add_on_change('ThemeScheduler.resources', cls.check_packages)
+        cls.check_packages()
+
+    @classmethod
+    def unwatch(cls):
+        """Stop watching for package changes."""
+
+        for settings_file in ("Preferences.sublime-settings", "Package Control.sublime-settings"):
+            sublime.load_settings(settings_file).clear_on_change('ThemeScheduler.resources')
+
+    @classmethod
+    def get_digest(cls):
+        """Get a hash of the indexed resources."""
+
+        if not cls.ready:
+            cls.build()
+        return cls.digest
+
+    @classmethod
+    def find(cls, resource):
+        """Return the full resource path, or `None` if the resource is not available."""
+
+        if not cls.ready:
+            cls.build()
+        if resource in cls.paths:
+            return resource
+        return cls.names.get(resource)
+
+    @classmethod
+    def exists(cls, resource):
+        """
+        Check if a resource exists.
+
+        If nothing is indexed (resources are not available yet), everything is assumed to exist.
+        """
+
+        return cls.find(resource) is not None or not cls.paths
+
+    @classmethod
+    def preload(cls, record):
+        """Read the resources of a record ahead of time so the change hits a warm cache."""
+
+        for resource in (record.theme, record.ui_theme):
+            path = cls.find(resource) if resource is not None else None
+            if path is not None and path not in cls.preloaded:
+                try:
+                    sublime.load_binary_resource(path)
+                    cls.preloaded.add(path)
+                    debug_log("Preloaded %s" % path)
+                except IOError:
+                    pass
+
+
+class ThemeSchedulerResourceListener(sublime_plugin.EventListener):
+    """Keep the resource index and `file` qualifiers current when files are saved."""
+
+    def on_post_save(self, view):
+        """Reload the schedule when a scheme, theme, or include is saved, and check `file` qualifiers."""
+
+        file_name = view.file_name()
+        if file_name is not None and file_name.endswith(ResourceIndex.extensions):
+            # A new resource may be one the schedule was missing.
+            ResourceIndex.invalidate()
+            ThemeScheduler.request_reload()
+        elif file_name is not None and Includes.is_include(file_name):
+            ThemeScheduler.request_reload()
+        Qualifications.invalidate("file")
+
+
+class ProjectScheduler(object):
+    """
+    Manage color scheme schedules scoped to project windows, or to windows given a name.
+
+    Color schemes are applied through view settings.  All views that need a different
+    color scheme are gathered in one pass and then updated in chunks so the UI stays responsive.
+    """
+
+    schedules = []
+    next_deadline = None
+    applied = {}
+    generation = 0
+
+    @classmethod
+    def init(cls, schedules):
+        """Initialize the scoped schedules and apply them."""
+
+        cls.schedules = schedules
+        cls.update(get_current_time()[1])
+
+    @classmethod
+    def get_schedule(cls, window):
+        """Get the schedule that applies to a window, the window's name goes before its project."""
+
+        if window is None:
+            return None
+        name = window.settings().get(WINDOW_KEY)
+        project = window.project_file_name()
+        found = None
+        for (scope, patterns), schedule in cls.schedules:
+            if scope == "windows":
+                if name in patterns:
+                    return schedule
+            elif found is None and project and any(
+                fnmatch(project, p) or fnmatch(basename(project), p) for p in patterns
+            ):
+                found = schedule
+        return found
+
+    @classmethod
+    def get_window_names(cls):
+        """Get the window names the schedules are scoped to."""
+
+        names = []
+        for (scope, patterns), _ in cls.schedules:
+            if scope == "windows":
+                names.extend(name for name in patterns if name not in names)
+        return names
+
+    @classmethod
+    def get_scheme(cls, schedule, now):
+        """Get the color scheme a schedule currently calls for."""
+
+        record = schedule.current(now) if schedule is not None else None
+        return record.theme if record is not None else None
+
+    @classmethod
+    def update(cls, now):
+        """Apply the current scoped color schemes and find the next scoped change."""
+
+        ts = int(time.time())
+        cls.next_deadline = None
+        for _, schedule in cls.schedules:
+            epoch = next_deadline(schedule, ts)[2]
+            if epoch is not None and (cls.next_deadline is None or epoch < cls.next_deadline.epoch):
+                cls.next_deadline = Deadline(epoch)
+
+        schemes = {}
+        updates = []
+        for window in sublime.windows():
+            schedule = cls.get_schedule(window)
+            if id(schedule) not in schemes:
+                schemes[id(schedule)] = cls.get_scheme(schedule, now)
+            scheme = schemes[id(schedule)]
+            for view in window.views():
+                if cls.applied.get(view.id()) != scheme:
+                    updates.append((view, scheme))
+
+        cls.generation += 1
+        if updates:
+            debug_log("Updating color scheme of %d view(s)" % len(updates))
+            cls.apply(updates, cls.generation)
+
+    @classmethod
+    def apply(cls, updates, generation):
+        """Apply color schemes to views a chunk at a time."""
+
+        if generation != cls.generation:
+            # A newer update has superseded this one.
+            return
+
+        for view, scheme in updates[:VIEW_CHUNK_SIZE]:
+            if not view.is_valid():
+                cls.applied.pop(view.id(), None)
+            elif scheme is None:
+                view.settings().erase('color_scheme')
+                cls.applied.pop(view.id(), None)
+            else:
+                view.settings().set('color_scheme', scheme)
+                cls.applied[view.id()] = scheme
+
+        remaining = updates[VIEW_CHUNK_SIZE:]
+        if remaining:
+            sublime.set_timeout(lambda: cls.apply(remaining, generation), 0)
+
+    @classmethod
+    def on_activated(cls, view):
+        """Apply the scoped color scheme to a view that is new or moved to another window."""
+
+        scheme = cls.get_scheme(cls.get_schedule(view.window()), get_current_time()[1])
+        if cls.applied.get(view.id()) != scheme:
+            cls.apply([(view, scheme)], cls.generation)
+
+
+class ThemeSchedulerSetWindowCommand(sublime_plugin.WindowCommand):
+    """Name the window for the schedules scoped to windows, an empty name clears it."""
+
+    def run(self, name=None):
+        """Run command."""
+
+        if name is not None:
+            self.set_name(name)
+            return
+
+        names = ProjectScheduler.get_window_names()
+        if not names:
+            log("No rules are scoped to windows!")
+            return
+        current = self.window.settings().get(WINDOW_KEY)
+        items = names + ["None"]
+        self.window.show_quick_panel(
+            items,
+            lambda index: self.set_name(names[index] if index < len(names) else "") if index != -1 else None,
+            selected_index=names.index(current) if current in names else len(names)
+        )
+
+    def set_name(self, name):
+        """Name the window and apply the color scheme of its schedule."""
+
+        if name:
+            self.window.settings().set(WINDOW_KEY, name)
+        else:
+            self.window.settings().erase(WINDOW_KEY)
+        ProjectScheduler.update(get_current_time()[1])
+
+
+class ThemeSchedulerProjectListener(sublime_plugin.EventListener):
+    """Track views for project scoped schedules."""
+
+    def on_activated(self, view):
+        """Apply the project color scheme if needed."""
+
+        if ProjectScheduler.schedules or ProjectScheduler.applied:
+            ProjectScheduler.on_activated(view)
+
+    def on_close(self, view):
+        """Forget closed views."""
+
+        ProjectScheduler.applied.pop(view.id(), None)
+
+    def on_load_project(self, window):
+        """Check `project` qualifiers against the new project."""
+
+        Qualifications.invalidate("project")
+
+
+class Preview(object):
+    """
+    Preview schedule entries in a quick panel.
+
+    The highlighted entry's color scheme is shown through view settings of the window's views,
+    so previewing never writes the preferences.  The resources of the entries around the
+    highlighted one are preloaded so moving through the list doesn't wait on disk access.
+    Each view's own color scheme, if it had one, is put back when the preview ends.
+    """
+
+    NEIGHBORS = 2
+    window = None
+    records = []
+    # Views of the window and the color scheme they set themselves: `(view, scheme)`.
+    views = []
+
+    @classmethod
+    def show(cls, window):
+        """Show the schedule entries."""
+
+        cls.window = window
+        cls.records = list(ThemeScheduler.themes)
+        cls.views = []
+        if not cls.records:
+            log("There are no schedule entries to preview!")
+            return
+
+        items = []
+        for record in cls.records:
+            details = [
+                "%s: %s" % (label, value) for label, value in (
+                    ("filters", record.filters), ("ui_theme", record.ui_theme), ("msg", record.msg)
+                ) if value is not None
+            ]
+            name = basename(record.theme) if record.theme is not None else "(no color scheme)"
+            items.append(
+                ["%s  %s" % (format_time(record.time), name), ', '.join(details) if details else "color scheme only"]
+            )
+        current = ThemeScheduler.schedule.current(get_current_time()[1])
+        window.show_quick_panel(
+            items, cls.on_done, 0,
+            cls.records.index(current) if current in cls.records else 0,
+            cls.on_highlight
+        )
+
+    @classmethod
+    def on_highlight(cls, index):
+        """Show the entry's color scheme in the window's views."""
+
+        record = cls.records[index]
+        scheme = ResourceIndex.find(record.theme) if record.theme is not None else None
+        if not cls.views:
+            cls.views = [(view, cls.get_override(view)) for view in cls.window.views() if view.is_valid()]
+        for view, previous in cls.views:
+            if not view.is_valid():
+                continue
+            if scheme is None:
+                cls.restore(view, previous)
+            elif view.settings().get('color_scheme') != scheme:
+                view.settings().set('color_scheme', scheme)
+
+        for i in range(max(index - cls.NEIGHBORS, 0), min(index + cls.NEIGHBORS + 1, len(cls.records))):
+            ResourceIndex.preload(cls.records[i])
+
+    @staticmethod
+    def get_override(view):
+        """Get the color scheme a view sets itself, `None` if it uses the preferences."""
+
+        if view.id() in ProjectScheduler.applied:
+            return ProjectScheduler.applied[view.id()]
+        # View settings fall back to the preferences.
+        scheme = view.settings().get('color_scheme')
+        if scheme == sublime.load_settings("Preferences.sublime-settings").get('color_scheme'):
+            return None
+        return scheme
+
+    @staticmethod
+    def restore(view, scheme):
+        """Restore the color scheme a view had before the preview."""
+
+        if scheme is not None:
+            view.settings().set('color_scheme', scheme)
+        else:
+            view.settings().erase('color_scheme')
+
+    @classmethod
+    def on_done(cls, index):
+        """Restore the views, and apply the selected entry."""
+
+        for view, previous in cls.views:
+            if view.is_valid():
+                cls.restore(view, previous)
+        cls.views = []
+        if index != -1:
+            record = cls.records[index]
+            ThemeScheduler.apply_changes(record.theme, None, record.filters, record.ui_theme, None)
+        cls.window = None
+        cls.records = []
+
+
+class Includes(object):
+    """
+    Shared schedule files included by the settings.
+
+    Includes are checked for changes every few seconds on the scheduler tick, and when they are saved in Sublime.
+    """
+
+    CHECK_INTERVAL = 10.0
+    cache = None
+    # Paths and stamps the default profile was last compiled with.
+    stamps = []
+    last_check = 0.0
+
+    @classmethod
+    def get_cache(cls):
+        """Get the cache of parsed and compiled includes."""
+
+        if cls.cache is None:
+            from .lib.includes import IncludeCache
+
+            cls.cache = IncludeCache()
+        return cls.cache
+
+    @classmethod
+    def get_paths(cls):
+        """Get the full paths of the includes, relative paths are relative to the `User` package."""
+
+        paths = multiget(SETTINGS, "include", [])
+        if isinstance(paths, str):
+            paths = [paths]
+        if not paths or not isinstance(paths, list):
+            return []
+
+        from .lib.includes import resolve_path
+
+        base = join(sublime.packages_path(), 'User')
+        return [resolve_path(path, base) for path in paths if isinstance(path, str)]
+
+    @classmethod
+    def get_stamps(cls, paths):
+        """Get the paths and stamps of includes."""
+
+        if not paths:
+            return []
+
+        from .lib.includes import get_stamp
+
+        return [[path, get_stamp(path)] for path in paths]
+
+    @classmethod
+    def is_include(cls, path):
+        """Check if a file is included."""
+
+        return os.path.normpath(path) in cls.get_paths()
+
+    @classmethod
+    def check(cls):
+        """Reload the schedule if an include changed (called on every scheduler tick)."""
+
+        now = time.monotonic()
+        if now - cls.last_check < cls.CHECK_INTERVAL:
+            return
+        cls.last_check = now
+        profiles = ThemeScheduler.profiles
+        if profiles is None or profiles.active != DEFAULT_PROFILE:
+            return
+        stamps = cls.stamps
+        changed = [new[0] for old, new in zip(stamps, cls.get_stamps([path for path, _ in stamps])) if new != old]
+        if changed or [path for path, _ in stamps] != cls.get_paths():
+            debug_log("Includes changed: %s" % ', '.join(changed))
+            ThemeScheduler.request_reload()
+
+
+class ScheduleCache(object):
+    """
+    Compiled schedules cached on disk, one file per profile.
+
+    The cache is keyed by a hash of the settings the schedule is compiled from (as
+    resolved for this host), the platform, and the installed and ignored packages.
+    Computing the key doesn't touch the resources: the hash of the indexed resources
+    the schedule was compiled with is stored with it, and checked in the background
+    after the cached schedule is applied.
+    """
+
+    VERSION = 5
+    lock = threading.Lock()
+
+    @classmethod
+    def get_path(cls, profile=DEFAULT_PROFILE):
+        """Get the cache file path of a profile."""
+
+        import hashlib
+
+        name = 'schedule.json'
+        if profile != DEFAULT_PROFILE:
+            # Profile names are user defined, so they are not used as file names.
+            name = 'schedule.%s.json' % hashlib.sha1(profile.encode('utf-8')).hexdigest()[:12]
+        return join(sublime.cache_path(), 'ThemeScheduler', name)
+
+    @classmethod
+    def get_key(cls, themes, stamps=()):
+        """Get the hash of everything the compiled schedule of the given `themes` and include `stamps` depends on."""
+
+        import hashlib
+
+        data = {
+            "version": cls.VERSION,
+            "themes": themes,
+            "includes": stamps,
+            "settings": {key: SETTINGS.get(key, None) for key in ("latitude", "longitude")},
+            "os": sublime.platform(),
+            "packages": ResourceIndex.packages
+        }
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def load(cls, key, profile=DEFAULT_PROFILE):
+        """
+        Load the compiled schedule if it was compiled from the same settings.
+
+        Returns the entries and the hash of the resources they were compiled with, or `None`.
+        """
+
+        try:
+            with open(cls.get_path(profile), 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("key") != key or not isinstance(data.get("entries"), list):
+            return None
+        return data["entries"], data.get("resources")
+
+    @classmethod
+    def save(cls, key, resources, entries, profile=DEFAULT_PROFILE):
+        """Save the compiled schedule (called off the main thread)."""
+
+        path = cls.get_path(profile)
+        content = json.dumps({"key": key, "resources": resources, "entries": entries}, separators=(',', ':'))
+        with cls.lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + '.tmp', 'w') as f:
+                    f.write(content)
+                os.replace(path + '.tmp', path)
+            except OSError:
+                log("Failed to write schedule cache!")
+
+    @classmethod
+    def invalidate(cls):
+        """Remove the cached schedules."""
+
+        folder = os.path.dirname(cls.get_path())
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith('schedule.') and name.endswith('.json'):
+                try:
+                    os.remove(join(folder, name))
+                except OSError:
+                    pass
+
+
+class Profiler(object):
+    """
+    Profile the next scheduler operations when armed.
+
+    Each capture is written as a pstats file to the profiles cache folder (oldest captures are removed
+    once there are too many or they take too much space), and a summary is shown in an output panel.
+    """
+
+    MAX_FILES = 20
+    MAX_BYTES = 10 * 1024 * 1024
+    TOP = 30
+    PANEL = "theme_scheduler_profile"
+    remaining = 0
+
+    @classmethod
+    def get_folder(cls):
+        """Get the profiles folder."""
+
+        return join(sublime.cache_path(), 'ThemeScheduler', 'profiles')
+
+    @classmethod
+    def arm(cls, count):
+        """Profile the next `count` operations."""
+
+        cls.remaining = max(0, int(count))
+        log("Profiling the next %d operation(s)" % cls.remaining)
+
+    @classmethod
+    def run(cls, name, fn, *args):
+        """Run and profile a function."""
+
+        import cProfile
+
+        cls.remaining -= 1
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args)
+        finally:
+            cls.save(name, profile)
+
+    @classmethod
+    def save(cls, name, profile):
+        """Save the profile and show its summary."""
+
+        import io
+        import pstats
+
+        folder = cls.get_folder()
+        path = join(folder, '%s-%s.pstats' % (time.strftime('%Y%m%d-%H%M%S'), name))
+        count = 1
+        while exists(path):
+            count += 1
+            path = join(folder, '%s-%s-%d.pstats' % (time.strftime('%Y%m%d-%H%M%S'), name, count))
+        try:
+            os.makedirs(folder, exist_ok=True)
+            profile.dump_stats(path)
+        except OSError:
+            log("Failed to write profile!")
+            path = None
+        cls.rotate(folder)
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(cls.TOP)
+        cls.show("=== %s (%s) ===\n%s\n" % (name, path, stream.getvalue().strip()))
+
+    @classmethod
+    def rotate(cls, folder):
+        """Remove the oldest profiles so the number and size of profiles stay bounded."""
+
+        try:
+            files = sorted(
+                (os.stat(join(folder, f)).st_mtime, join(folder, f))
+                for f in os.listdir(folder) if f.endswith('.pstats')
+            )
+            sizes = [os.path.getsize(f) for _, f in files]
+            while files and (len(files) > cls.MAX_FILES or sum(sizes) > cls.MAX_BYTES):
+                os.remove(files.pop(0)[1])
+                sizes.pop(0)
+        except OSError:
+            pass
+
+    @classmethod
+    def show(cls, text):
+        """Append text to the profile output panel."""
+
+        show_panel(cls.PANEL, text)
+
+
+class History(object):
+    """
+    Journal of applied, skipped, caught up, and failed changes.
+
+    Entries are written to the journal folder of the cache folder off the main thread.
+    """
+
+    PANEL = "theme_scheduler_journal"
+    journal = None
+
+    @classmethod
+    def get_folder(cls):
+        """Get the journal folder."""
+
+        return join(sublime.cache_path(), 'ThemeScheduler', 'journal')
+
+    @classmethod
+    def configure(cls):
+        """Start or stop the journal according to the settings."""
+
+        if not multiget(SETTINGS, "journal", True):
+            cls.stop()
+        elif cls.journal is None:
+            from .lib.journal import Journal
+
+            cls.journal = Journal(cls.get_folder())
+
+    @classmethod
+    def stop(cls):
+        """Write what is left and stop the journal."""
+
+        if cls.journal is not None:
+            cls.journal.close()
+            cls.journal = None
+
+    @classmethod
+    def write(cls, event, record, scheduled=None, **extra):
+        """Add an entry for a record."""
+
+        if cls.journal is not None:
+            from .lib.records import fingerprint
+
+            cls.journal.write(event, scheduled, None, fingerprint(record) if record is not None else None, **extra)
+
+    @classmethod
+    def show(cls, start, end):
+        """Show the entries of a time range in the journal panel."""
+
+        def query():
+            """Read the entries off the main thread."""
+
+            from .lib.journal import Journal
+            from .lib.records import fingerprint
+
+            journal = cls.journal if cls.journal is not None else Journal(cls.get_folder())
+            journal.flush()
+            names = {fingerprint(r): r.theme for r in ThemeScheduler.themes}
+            lines = []
+            for entry in journal.query(start, end):
+                scheduled = entry.get("s")
+                lines.append(
+                    "%s  %-8s %s  %s%s" % (
+                        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry["a"])),
+                        entry["e"],
+                        "%+5ds late" % (entry["a"] - scheduled) if scheduled is not None else " " * 10,
+                        entry.get("f"),
+                        "  " + names[entry.get("f")] if entry.get("f") in names else "",
+                    ) + ("  (%s)" % entry["reason"] if "reason" in entry else "")
+                )
+            text = "=== %s - %s ===\n%s\n" % (
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(start)),
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(end)),
+                '\n'.join(lines) if lines else "No entries"
+            )
+            sublime.set_timeout(lambda: show_panel(cls.PANEL, text), 0)
 
+        thread = threading.Thread(target=query)
+        thread.daemon = True
+        thread.start()
 
-def log(s):
-    """Basic logging."""
-    print("ThemeScheduler: %s" % s)
 
+class IdleGate(object):
+    """
+    Defer heavy changes (filters or a UI theme change) while the user is typing.
 
-def debug_log(s):
-    """Debug logging."""
+    A heavy change waits until there has been no input for `idle_time` seconds,
+    but never longer than `idle_max_delay` seconds.
+    """
 
-    if SETTINGS.get("debug", False):
-        log(s)
+    idle_time = 0.0
+    max_delay = 60.0
+    last_input = 0.0
+    deferred_since = None
 
+    @classmethod
+    def configure(cls):
+        """Read the idle settings."""
 
-def create_settings(settings_path):
-    """Create settings file."""
+        cls.idle_time = float(multiget(SETTINGS, "idle_time", 0))
+        cls.max_delay = float(multiget(SETTINGS, "idle_max_delay", 60))
+        cls.deferred_since = None
 
-    err = False
-    default_theme = {
-        "enabled": False,
-        "themes": [],
-    }
-    j = json.dumps(default_theme, sort_keys=True, indent=4, separators=(',', ': '))
-    try:
-        with open(settings_path, 'w') as f:
-            f.write(j + "\n")
-    except Exception:
-        err = True
-    return err
+    @classmethod
+    def touch(cls):
+        """Record user input."""
 
+        cls.last_input = time.monotonic()
 
-def total_seconds(t):
-    """Get the total seconds."""
+    @classmethod
+    def is_heavy(cls, record):
+        """Check if applying a record redraws more than the color scheme."""
 
-    return (t.microseconds + (t.seconds + t.days * 24 * 3600) * 10 ** 6) / 10 ** 6
+        return record.filters is not None or (
+            record.ui_theme is not None and record.ui_theme != ThemeScheduler.current_ui_theme
+        )
 
+    @classmethod
+    def ready(cls, record):
+        """Check if a change can be applied now."""
 
-def get_current_time():
-    """Get the current time."""
+        if cls.idle_time <= 0 or not cls.is_heavy(record):
+            return True
 
-    now = datetime.now()
-    seconds = total_seconds(timedelta(hours=now.hour, minutes=now.minute, seconds=now.second))
-    return seconds, now
+        now = time.monotonic()
+        if cls.deferred_since is None:
+            cls.deferred_since = now
+        waited = now - cls.deferred_since
+        if now - cls.last_input < cls.idle_time and waited < cls.max_delay:
+            return False
 
+        cls.deferred_since = None
+        if waited:
+            stats = ThemeScheduler.stats
+            stats["deferred"] += 1
+            stats["deferred_time"] += waited
+            stats["max_deferred_time"] = max(stats["max_deferred_time"], waited)
+            debug_log("Change deferred %.1fs until idle, stats: %s" % (waited, str(stats)))
+        return True
 
-def datetime2sec(t):
-    """Convert `datetime` to seconds."""
 
-    tm = time.strptime(t, '%H:%M')
-    return total_seconds(timedelta(hours=tm.tm_hour, minutes=tm.tm_min, seconds=tm.tm_sec))
+class ThemeSchedulerIdleListener(sublime_plugin.EventListener):
+    """Track user input for the idle gate."""
 
+    def on_modified(self, view):
+        """Record an edit."""
 
-def sec2time(total):
-    """Convert seconds to  actual time."""
+        IdleGate.touch()
 
-    seconds = total % 60
-    t_minutes = (total / 60)
-    minutes = t_minutes % 60
-    hours = t_minutes / 60
-    return "%02d:%02d:%02d" % (hours, minutes, seconds)
+    def on_selection_modified(self, view):
+        """Record cursor movement."""
 
+        IdleGate.touch()
 
-def display_message(msg):
-    """Display alert message."""
 
-    settings = sublime.load_settings("ThemeScheduler.sublime-settings")
-    use_sub_notify = multiget(settings, "use_sub_notify", False)
-    if use_sub_notify:
-        sublime.run_command("sub_notify", {"title": "ThemeScheduler", "msg": msg})
-    else:
-        if ThemeScheduler.dialog_open:
-            log("Dialog already open!")
-            log(msg)
-            return
-        ThemeScheduler.dialog_open = True
-        sublime.ok_cancel_dialog(msg)
-        ThemeScheduler.update = True
-        ThemeScheduler.dialog_open = False
+class Coordination(object):
+    """
+    Coordinate multiple Sublime instances.
 
+    One instance leads: it applies changes, runs commands and filters, and publishes
+    the result.  The other instances adopt the published color scheme and theme
+    instead of doing the work themselves.
+    """
 
-class ThemeSchedulerGetNextChangeCommand(sublime_plugin.ApplicationCommand):
-    """Show the time and theme in queue."""
+    coordinator = None
+    last_renewal = 0.0
 
-    def run(self):
-        """Run command."""
+    @classmethod
+    def configure(cls):
+        """Start or stop coordinating according to the settings."""
+
+        cls.stop()
+        if multiget(SETTINGS, "coordinate_instances", False):
+            import tempfile
+            from .lib.coordination import Coordinator
+
+            folder = multiget(SETTINGS, "coordination_folder", None)
+            cls.coordinator = Coordinator(
+                folder if folder else join(tempfile.gettempdir(), 'ThemeScheduler'),
+                float(multiget(SETTINGS, "coordination_lease", 30))
+            )
+            cls.coordinator.acquire()
+            cls.last_renewal = time.monotonic()
+            log("Coordinating instances as %s" % ("leader" if cls.coordinator.leader else "follower"))
 
-        sublime.message_dialog("ThemeScheduler: Next Change @\n" + str(ThemeScheduler.next_change))
+    @classmethod
+    def stop(cls):
+        """Stop coordinating and give up leadership."""
 
+        if cls.coordinator is not None:
+            cls.coordinator.release()
+            cls.coordinator = None
 
-class ThemeSchedulerRefreshCommand(sublime_plugin.ApplicationCommand):
-    """Refresh the theme for the current time."""
+    @classmethod
+    def is_leader(cls):
+        """Check if this instance should apply changes."""
 
-    def run(self):
-        """Run command."""
+        return cls.coordinator is None or cls.coordinator.leader
 
-        manage_thread()
+    @classmethod
+    def tick(cls):
+        """Renew or try to take the lead, and pick up published changes (called on every scheduler tick)."""
 
+        coordinator = cls.coordinator
+        if coordinator is None:
+            return
+        now = time.monotonic()
+        if now - cls.last_renewal >= coordinator.lease / 3:
+            cls.last_renewal = now
+            was_leader = coordinator.leader
+            if coordinator.acquire() and not was_leader:
+                log("Took the lead of the instances")
+                sublime.set_timeout(ThemeScheduler.update_current, 0)
+        if not coordinator.leader:
+            data = coordinator.poll()
+            if data is not None:
+                sublime.set_timeout(lambda d=data: cls.adopt(d), 0)
 
-class ThemeRecord(namedtuple('ThemeRecord', ["time", "theme", "msg", "filters", "ui_theme", "command"])):
-    """Theme record tuple."""
+    @classmethod
+    def publish(cls, theme, msg, filters, ui_theme):
+        """Publish an applied change to the other instances."""
 
-    def __str__(self):
-        """String representation of record."""
-
-        return textwrap.dedent(
-            '''
-            ThemeRecord(
-                time=%s,
-                theme=%s,
-                msg=%s,
-                filters=%s,
-                ui_theme=%s,
-                command=%s
-            )
-            '''
-        ).strip() % (
-            sec2time(self.time), self.theme, self.msg,
-            self.filters, self.ui_theme, self.command
+        if cls.coordinator is None or not cls.coordinator.leader:
+            return
+        pref = sublime.load_settings("Preferences.sublime-settings")
+        cls.coordinator.publish(
+            {
+                "theme": theme,
+                "msg": msg,
+                "filters": filters,
+                "ui_theme": ui_theme,
+                "preferences": {"color_scheme": pref.get("color_scheme"), "theme": pref.get("theme")}
+            }
         )
 
-    __repr__ = __str__
+    @classmethod
+    def adopt(cls, data):
+        """Adopt a change published by the leader."""
 
+        from .lib.records import output_key
 
-class CommandWrapper(object):
-    """Command wrapper that stores the command and arguments."""
+        debug_log("Adopting change from the leading instance")
+        ThemeScheduler.current_theme = data["theme"]
+        ThemeScheduler.current_msg = data["msg"]
+        ThemeScheduler.current_filters = data["filters"]
+        ThemeScheduler.current_ui_theme = data["ui_theme"]
+        ThemeScheduler.current_key = output_key(data["theme"], data["msg"], data["filters"], data["ui_theme"])
+        pref = sublime.load_settings("Preferences.sublime-settings")
+        for key, value in data["preferences"].items():
+            if value is not None and pref.get(key) != value:
+                pref.set(key, value)
 
-    def __init__(self, cmd):
-        """Setup command and arguments to be run."""
 
-        self.cmd = cmd["command"]
-        self.args = cmd.get("args", {})
+class DynamicSettings(object):
+    """
+    Resolve settings again when a dynamic qualifier changes.
 
-    def __str__(self):
-        """Return command name."""
+    Only the parts of the plugin that read the affected settings are reconfigured;
+    settings that are read on use need nothing.
+    """
 
-        return self.cmd
+    RELOAD = frozenset(("enabled", "scheduler_mode"))
+    SCHEDULE = frozenset(("themes", "profiles", "include", "latitude", "longitude"))
+    IDLE = frozenset(("idle_time", "idle_max_delay"))
+    COORDINATION = frozenset(("coordinate_instances", "coordination_folder", "coordination_lease"))
 
-    __repr__ = __str__
+    @classmethod
+    def watch(cls):
+        """Listen for qualifier changes."""
 
-    def run(self):
-        """Execute command."""
+        Qualifications.add_listener(cls.on_change)
+
+    @classmethod
+    def stop(cls):
+        """Stop listening for qualifier changes."""
+
+        Qualifications.remove_listener(cls.on_change)
 
-        sublime.run_command(self.cmd, self.args)
+    @classmethod
+    def on_change(cls, keys):
+        """Handle qualifier changes from any thread on the main thread."""
+
+        sublime.set_timeout(lambda k=frozenset(keys): cls.apply(k), 0)
+
+    @classmethod
+    def apply(cls, keys):
+        """Reconfigure what depends on the changed settings."""
+
+        debug_log("Qualified settings changed: %s" % ', '.join(sorted(keys)))
+        if keys & cls.RELOAD:
+            manage_thread()
+            return
+        if not ThemeScheduler.ready or not LIFECYCLE.running():
+            return
+        if keys & cls.IDLE:
+            IdleGate.configure()
+        if keys & cls.COORDINATION:
+            Coordination.configure()
+        if keys & cls.SCHEDULE:
+            ThemeScheduler.reload()
 
 
 class ThemeScheduler(object):
     """Manage theme schedule."""
 
     themes = []
+    schedule = Schedule([])
+    profiles = None
     current_theme = ""
     current_msg = None
     current_filters = None
+    current_key = None
     next_change = None
-    day = None
+    next_time = None
+    next_deadline = None
+    due = None
     ready = False
     busy = False
     update = False
+    generation = 0
     current_time = None
     set_safe = False
     dialog_open = False
     current_ui_theme = None
     current_command = None
+    stats = {"deferred": 0, "deferred_time": 0.0, "max_deferred_time": 0.0, "failed": 0}
 
     @classmethod
     def reset_msg_state(cls):
@@ -218,91 +1311,282 @@ class ThemeScheduler(object):
     def init(cls, set_safe=False):
         """Initialize theme changer object."""
 
+        cls.set_safe = set_safe
+        History.configure()
+        IdleGate.configure()
+        Coordination.configure()
+        cls.reload()
+
+    @classmethod
+    def reload(cls):
+        """Load the schedule and apply the theme for the current time, compiling it in the background if needed."""
+
+        if not LIFECYCLE.running():
+            return
+
         cls.busy = True
         cls.ready = False
-        cls.set_safe = set_safe
+        try:
+            names = cls.get_profile_names()
+            profiles = cls.get_profiles()
+            profiles.prune(names)
+            name = profiles.active
+            if name not in names:
+                log("Profile '%s' could not be found, using '%s'!" % (name, DEFAULT_PROFILE))
+                name = DEFAULT_PROFILE
+            cls.load_profile(name, cls.activate)
+        except Exception:
+            cls.ready = True
+            cls.busy = False
+            raise
 
-        cls.themes = []
-        for t in multiget(SETTINGS, "themes", []):
-            theme_time = datetime2sec(t["time"])
-            theme = t.get("theme", None)
-            msg = t.get("msg", None)
-            filters = t.get("filters", None)
-            ui_theme = t.get("ui_theme", None)
-            command = t.get("command", None)
-            if command is not None:
-                command = CommandWrapper(command)
-            cls.themes.append(ThemeRecord(theme_time, theme, msg, filters, ui_theme, command))
-        seconds, now = get_current_time()
-        cls.update_theme(seconds, now)
-        cls.ready = True
+    @classmethod
+    def request_reload(cls):
+        """Reload the schedule on the main thread, if it is loaded."""
+
+        sublime.set_timeout(lambda: cls.reload() if cls.ready else None, 0)
+
+    @classmethod
+    def stop(cls):
+        """Forget the loaded schedule when the scheduler stops, dropping loads that are still compiling."""
+
+        cls.generation += 1
+        cls.ready = False
         cls.busy = False
 
     @classmethod
-    def update_next(cls, seconds, now):
+    def switch(cls, name):
+        """Switch to another profile and apply its theme for the current time."""
+
+        if name not in cls.get_profile_names():
+            log("Profile '%s' could not be found!" % name)
+            return
+        if not cls.ready or not LIFECYCLE.running():
+            # Used when the scheduler starts.
+            cls.get_profiles().select(name)
+            return
+
+        cls.busy = True
+        try:
+            cls.load_profile(name, lambda compiled: cls.activate(compiled, name))
+        except Exception:
+            cls.busy = False
+            raise
+
+    @classmethod
+    def activate(cls, compiled, name=None):
+        """Make a compiled profile the active schedule, switching to it if a `name` is given, and apply its theme."""
+
+        cls.busy = True
+        try:
+            if name is not None and cls.get_profiles().select(name):
+                debug_log("Switched to profile '%s'" % name)
+            cls.swap(compiled)
+            cls.update_theme(repeat=False)
+        finally:
+            cls.ready = True
+            cls.busy = False
+        if LIFECYCLE.worker is not None:
+            LIFECYCLE.worker.wake()
+
+    @classmethod
+    def abort(cls, generation):
+        """Give up on a profile that failed to compile, keeping the current schedule."""
+
+        if generation == cls.generation:
+            cls.ready = True
+            cls.busy = False
+
+    @classmethod
+    def get_profiles(cls):
+        """Get the profiles, which remember the active profile even while the scheduler is stopped."""
+
+        if cls.profiles is None:
+            cls.profiles = Profiles(join(sublime.cache_path(), 'ThemeScheduler', 'profile.json'))
+        return cls.profiles
+
+    @classmethod
+    def get_profile_names(cls):
+        """Get the names of the profiles, the default profile first."""
+
+        profiles = multiget(SETTINGS, "profiles", {})
+        return [DEFAULT_PROFILE] + sorted(
+            name for name in (profiles if isinstance(profiles, dict) else {}) if name != DEFAULT_PROFILE
+        )
+
+    @classmethod
+    def get_themes(cls, name):
+        """Get the `themes` list of a profile."""
+
+        if name == DEFAULT_PROFILE:
+            return multiget(SETTINGS, "themes", [])
+        profiles = multiget(SETTINGS, "profiles", {})
+        return profiles.get(name, []) if isinstance(profiles, dict) else []
+
+    @classmethod
+    def load_profile(cls, name, done):
+        """
+        Pass a compiled profile to `done` on the main thread.
+
+        A profile compiled earlier, or cached on disk, is passed right away.  The resources it was
+        compiled with are then checked in the background, and if they changed, or the profile wasn't
+        compiled yet, it is compiled in the background and passed when it is ready.  Only the latest
+        load passes its profile.
+        """
+
+        cls.generation += 1
+        generation = cls.generation
+        themes = cls.get_themes(name)
+        includes = Includes.get_paths() if name == DEFAULT_PROFILE else []
+        stamps = Includes.get_stamps(includes)
+        key = ScheduleCache.get_key(themes, stamps)
+        if name == DEFAULT_PROFILE:
+            Includes.stamps = stamps
+        profiles = cls.get_profiles()
+
+        def finish(compiled, resources):
+            """Keep the compiled profile and pass it on, unless a newer load superseded it."""
+
+            profiles.add(name, key, (compiled, resources))
+            if generation == cls.generation:
+                done(compiled)
+
+        def build(resources):
+            """Compile the profile, unless it was compiled with the current resources."""
+
+            try:
+                current = ResourceIndex.get_digest()
+                if current == resources:
+                    return
+                entries = cls.compile_schedule(themes, includes)
+                ScheduleCache.save(key, current, entries, name)
+                compiled = cls.load(entries)
+            except Exception as e:
+                log("Failed to compile the schedule of profile '%s': %s" % (name, str(e)))
+                sublime.set_timeout(lambda: cls.abort(generation), 0)
+                return
+            debug_log("Compiled schedule of profile '%s'" % name)
+            sublime.set_timeout(lambda: finish(compiled, current), 0)
+
+        cached = profiles.get(name, key)
+        if cached is None:
+            loaded = ScheduleCache.load(key, name)
+            if loaded is not None:
+                debug_log("Loaded compiled schedule of profile '%s' from cache" % name)
+                cached = (cls.load(loaded[0]), loaded[1])
+                profiles.add(name, key, cached)
+        if cached is not None:
+            done(cached[0])
+            if ResourceIndex.ready and ResourceIndex.digest == cached[1]:
+                return
+
+        thread = threading.Thread(target=build, args=(cached[1] if cached is not None else None,))
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def swap(cls, compiled):
+        """Make a compiled profile the active schedule."""
+
+        cls.themes, cls.schedule, scoped = compiled
+        ProjectScheduler.init(scoped)
+
+        today = get_current_time()[1].date()
+        collapsed = cls.schedule.collapsed(today) + sum(schedule.collapsed(today) for _, schedule in scoped)
+        if collapsed:
+            debug_log("Collapsed %d changes that change nothing, saving %d wakeups today" % (collapsed, collapsed))
+
+    @classmethod
+    def compile_schedule(cls, themes, includes=()):
+        """Compile the schedule settings, layered over the included rules, into validated entries."""
+
+        from .lib.compiler import compile_rules
+        from .lib.includes import merge
+
+        has_location = cls.get_solar() is not None
+
+        def compiler(rules, report=log):
+            """Compile rules."""
+
+            return compile_rules(rules, has_location, ResourceIndex.exists, report)
+
+        context = (has_location, ResourceIndex.get_digest())
+        layers = [Includes.get_cache().compile_includes(path, context, compiler, log) for path in includes]
+        layers.append(compiler(themes))
+        return merge(layers)
+
+    @classmethod
+    def load(cls, entries):
+        """Load compiled entries into a schedule; returns the records, the schedule, and the project schedules."""
+
+        from .lib.compiler import load_entries
+        from .lib.records import SharedFactory
+
+        # Records with the same commands share them.
+        wrappers = SharedFactory(CommandWrapper)
+        stages = SharedFactory(lambda commands: CommandStage(commands, wrappers))
+        solar = cls.get_solar()
+        return load_entries(entries, solar.resolve if solar is not None else None, stages)
+
+    @classmethod
+    def get_solar(cls):
+        """Get the solar time resolver for the configured location."""
+
+        latitude = multiget(SETTINGS, "latitude", None)
+        longitude = multiget(SETTINGS, "longitude", None)
+        if latitude is None or longitude is None:
+            return None
+
+        from .lib.solar import Solar
+
+        return Solar(float(latitude), float(longitude), join(sublime.cache_path(), 'ThemeScheduler'))
+
+    @classmethod
+    def update_next(cls):
         """Setup theme for next update."""
 
-        # Reset tracker members
-        cls.next_change = None
-        cls.day = None
-
-        # Try and find the closest time point to switch the theme
-        closest = None
-        lowest = None
-        for t in cls.themes:
-            if seconds < t.time and (closest is None or t.time < closest.time):
-                closest = t
-            if lowest is None or t.time < lowest.time:
-                lowest = t
-
-        # Select the closest if there was one
-        if closest is not None:
-            cls.next_change = closest
-        elif lowest is not None:
-            cls.next_change = lowest
-        if lowest is not None:
-            cls.lowest = lowest
-
-        if (cls.next_change.time == cls.lowest.time and seconds < cls.lowest.time):
-            # The next change is the first of the next day
-            # But the time is not greater meaning we are already
-            # the next day, initialize to -1 to signify the last good
-            # change was yesterday.
-            cls.day = -1
-        else:
-            # Copy the day in which the next change was picked
-            cls.day = now.day
+        cls.next_time, cls.next_change, epoch = next_deadline(cls.schedule, int(time.time()))
+        cls.next_deadline = Deadline(epoch) if epoch is not None else None
+
+        debug_log(
+            "%s - Next Change @ %s %s" % (
+                time.ctime(),
+                str(aware(epoch)) if epoch is not None else "None",
+                str(cls.next_change)
+            )
+        )
 
-        debug_log("Today = %d" % cls.day)
-        debug_log("%s - Next Change @ %s" % (time.ctime(), str(cls.next_change)))
+        if cls.next_change is not None and multiget(SETTINGS, "preload_resources", False):
+            ResourceIndex.preload(cls.next_change)
 
     @classmethod
-    def update_current(cls):
-        """Set next theme."""
+    def update_current(cls, repeat=True):
+        """Set next theme; unless `repeat` is set, a change that is already applied only has its theme reapplied."""
 
-        if cls.next_change is not None:
-            closest = None
-            greatest = None
-            seconds = get_current_time()[0]
-            for t in cls.themes:
-                if t.time <= seconds and (closest is None or t.time > closest.time):
-                    closest = t
-                elif greatest is None or t.time > greatest.time:
-                    greatest = t
-            if closest is None:
-                closest = cls.next_change if greatest is None else greatest
-
-            if closest is not None:
-                cls.apply_changes(
-                    closest.theme,
-                    closest.msg,
-                    closest.filters,
-                    closest.ui_theme,
-                    closest.command
-                )
+        if cls.next_change is None:
+            return
+
+        closest = cls.schedule.current(get_current_time()[1])
+        if not Coordination.is_leader():
+            debug_log("Following the leading instance, change not applied")
+            History.write("skip", closest, cls.due, reason="follower")
+        elif closest is not None and not repeat and closest.key == cls.current_key:
+            debug_log("Change already applied, reapplying the theme only")
+            try:
+                cls.apply_theme(closest.theme, closest.filters, closest.ui_theme)
+            except Exception as e:
+                log("Failed to reapply the theme: %s" % str(e))
+        elif closest is not None:
+            cls.apply_changes(
+                closest.theme,
+                closest.msg,
+                closest.filters,
+                closest.ui_theme,
+                closest.command
+            )
 
     @classmethod
-    def update_theme(cls, seconds, now, update=True):
+    def update_theme(cls, update=True, repeat=True):
         """
         Update the theme.
 
@@ -311,13 +1595,13 @@ class ThemeScheduler(object):
             - Update current theme if required.
         """
 
-        cls.update_next(seconds, now)
+        cls.update_next()
 
         if update:
-            cls.update_current()
+            cls.update_current(repeat)
 
     @classmethod
-    def on_post_dialog(cls, seconds, now):
+    def on_post_dialog(cls):
         """
         Precaution to make sure an update isn't needed hat was prevented because of a message dialog.
 
@@ -326,14 +1610,14 @@ class ThemeScheduler(object):
 
         cls.busy = True
         update = True
-        last_next = cls.next_change
-        cls.update_next(seconds, now)
+        last_next = cls.next_time
+        cls.update_next()
 
         if last_next is None:
-            if cls.next_change is None:
+            if cls.next_time is None:
                 debug_log("After dialog - No update needed.")
                 update = False
-        elif cls.next_change is not None and cls.next_change.time == last_next.time:
+        elif cls.next_time is not None and cls.next_time == last_next:
             debug_log("After dialog - No update needed.")
             update = False
 
@@ -343,73 +1627,108 @@ class ThemeScheduler(object):
         cls.busy = False
 
     @classmethod
-    def on_change(cls, seconds, now):
+    def on_change(cls):
         """Change the theme and get the next time point to change themes."""
 
         cls.busy = True
+        cls.due = cls.next_deadline.epoch if cls.next_deadline is not None else None
         # Change the theme
         if (
             cls.next_change is not None and
-            (
-                cls.next_change.theme != cls.current_theme or
-                cls.next_change.msg != cls.current_msg or
-                cls.next_change.filters != cls.current_filters or
-                cls.next_change.ui_theme != cls.current_ui_theme or
-                cls.next_change.command is not None
-            )
+            (cls.next_change.key != cls.current_key or cls.next_change.command is not None)
         ):
             debug_log("Change needed!")
             update = True
         else:
             debug_log("Change not needed!")
+            History.write("skip", cls.next_change, cls.due, reason="unchanged")
             update = False
 
-        cls.update_theme(seconds, now, update)
+        cls.update_theme(update)
+        cls.due = None
         cls.busy = False
 
     @classmethod
     def set_theme(cls, theme, ui_theme):
-        """Apply the theme(s)."""
+        """
+        Apply the theme(s) to the User preference file directly.
 
-        if cls.set_safe:
-            # When sublime is loading, the User preference file isn't available yet.
-            # Sublime provides no real way to tell when things are initialized.
-            # Handling the preference file ourselves allows us to avoid
-            # obliterating the User preference file.
-            pref_file = join(sublime.packages_path(), 'User', 'Preferences.sublime-settings')
-            pref = {}
-            if exists(pref_file):
-                try:
-                    with open(pref_file, "r") as f:
-                        # Allow C style comments and be forgiving of trailing commas
-                        content = sanitize_json(f.read(), True)
-                    pref = json.loads(content)
-                except Exception:
-                    log("Failed to open preference file!")
-                    return
-            if ui_theme is not None:
-                debug_log("Selecting UI theme!")
-                pref['theme'] = ui_theme
-            if theme is not None:
-                debug_log("Selecting theme!")
-                pref['color_scheme'] = theme
-            j = json.dumps(pref, sort_keys=True, indent=4, separators=(',', ': '))
+        The file is written once, so either both preferences change or neither does.
+        """
+
+        # When sublime is loading, the User preference file isn't available yet.
+        # Sublime provides no real way to tell when things are initialized.
+        # Handling the preference file ourselves allows us to avoid
+        # obliterating the User preference file.
+        from .lib.file_strip.json import sanitize_json
+
+        pref_file = join(sublime.packages_path(), 'User', 'Preferences.sublime-settings')
+        pref = {}
+        if exists(pref_file):
             try:
-                with open(pref_file, 'w') as f:
-                    f.write(j + "\n")
+                with open(pref_file, "r") as f:
+                    # Allow C style comments and be forgiving of trailing commas
+                    content = sanitize_json(f.read(), True)
+                pref = json.loads(content)
             except Exception:
-                log("Failed to write preference file!")
+                raise RuntimeError("Failed to open preference file!")
+        if ui_theme is not None:
+            debug_log("Selecting UI theme!")
+            pref['theme'] = ui_theme
+        if theme is not None:
+            debug_log("Selecting theme!")
+            pref['color_scheme'] = theme
+        j = json.dumps(pref, sort_keys=True, indent=4, separators=(',', ': '))
+        try:
+            with open(pref_file, 'w') as f:
+                f.write(j + "\n")
+        except Exception:
+            raise RuntimeError("Failed to write preference file!")
+
+    @classmethod
+    def apply_theme(cls, theme, filters, ui_theme):
+        """
+        Apply the theme(s) and filters as one transaction.
+
+        Only preferences that actually change are written, as every write triggers a redraw.
+        If anything fails, the preferences are restored and the error is raised.
+        """
+
+        tweak = filters is not None and is_tweakable()
+        if filters is not None and not tweak:
+            debug_log("ThemeTweaker is not installed :(")
+
+        if cls.set_safe:
+            # The preference file is written in one go, only the filters are left to the transaction.
+            cls.set_theme(None if tweak else theme, ui_theme)
+            txn = Transaction({})
         else:
-            if ui_theme is not None:
-                debug_log("Selecting UI theme!")
-                sublime.load_settings("Preferences.sublime-settings").set("theme", ui_theme)
-            if theme is not None:
-                debug_log("Selecting theme!")
-                sublime.load_settings("Preferences.sublime-settings").set("color_scheme", theme)
+            txn = Transaction(sublime.load_settings("Preferences.sublime-settings"))
+            txn.stage("theme", ui_theme)
+            if not tweak:
+                txn.stage("color_scheme", theme)
+
+        if tweak:
+            def tweaker():
+                debug_log("Using Theme Tweaker to adjust file!")
+                sublime.run_command(
+                    "theme_tweaker_custom",
+                    {"theme": theme, "filters": filters}
+                )
+            txn.add_step(tweaker)
+
+        debug_log("Changed preferences: %s" % ', '.join(txn.commit()))
 
     @classmethod
     def apply_changes(cls, theme, msg, filters, ui_theme, command):
-        """Update theme.  Set the theme, then get the next one in line."""
+        """
+        Update theme.  Set the theme, then get the next one in line.
+
+        The current theme is only updated if the change is applied.  On failure,
+        the preferences stay on the previous theme.
+        """
+
+        from .lib.records import ThemeRecord, output_key
 
         debug_log(
             "apply_changes(\n    theme=%s\n    msg=%s,\n    filters=%s,\n    ui_theme=%s,\n    command=%s\n)" % (
@@ -417,154 +1736,218 @@ class ThemeScheduler(object):
             )
         )
 
+        if command is not None:
+            command.run(before=True)
+
+        # Changes applied when they are due are on schedule, others catch up with the schedule.
+        record = ThemeRecord(0, theme, msg, filters, ui_theme, command)
+        try:
+            cls.apply_theme(theme, filters, ui_theme)
+        except Exception as e:
+            cls.stats["failed"] += 1
+            log("Failed to apply change, keeping the previous theme: %s" % str(e))
+            History.write("fail", record, cls.due, reason=str(e))
+            return
+        History.write("apply" if cls.due is not None else "catchup", record, cls.due)
+
         if cls.next_change is not None:
             cls.current_time = cls.next_change.time
         cls.current_theme = theme
         cls.current_ui_theme = ui_theme
         cls.current_msg = msg
         cls.current_filters = filters
-        if filters is not None:
-            if is_tweakable():
-                debug_log("Using Theme Tweaker to adjust file!")
-                sublime.run_command(
-                    "theme_tweaker_custom",
-                    {"theme": theme, "filters": filters}
-                )
-                if ui_theme is not None:
-                    cls.set_theme(None, ui_theme)
-            else:
-                debug_log("ThemeTweaker is not installed :(")
-                cls.set_theme(theme, ui_theme)
-        else:
-            cls.set_theme(theme, ui_theme)
+        cls.current_key = output_key(theme, msg, filters, ui_theme)
 
-        try:
-            if command is not None:
-                command.run()
-        except Exception as e:
-            log("Command %s failed!" % str(command))
-            log("\n%s" % str(e))
+        if command is not None:
+            command.run(before=False)
+
+        Coordination.publish(theme, msg, filters, ui_theme)
 
         if msg is not None and isinstance(msg, str):
             sublime.set_timeout(lambda m=msg: display_message(m), 3000)
 
 
-class TsThread(threading.Thread):
-    """Load up defaults."""
+class Scheduler(object):
+    """
+    Scheduler operations shared by the scheduling modes.
+
+    Each tick checks the deadlines and dispatches the operations that are due to the main thread.
+    """
 
     INIT = 0
     POST_DIALOG = 1
     CHANGE = 2
+    PROJECT_CHANGE = 3
+    NAMES = ("init", "post_dialog", "change", "project_change")
 
-    def __init__(self):
-        """Setup the thread."""
-
-        self.reset()
-        threading.Thread.__init__(self)
+    def payload(self, code, now=None):
+        """Execute payload, profiling it if the profiler is armed."""
 
-    def reset(self):
-        """Reset the thread variables."""
-
-        self.abort = False
-
-    def kill(self):
-        """Kill thread."""
-
-        self.abort = True
-        while self.is_alive():
-            pass
-        self.reset()
+        try:
+            if self.stopped.is_set():
+                # Queued by a scheduler that has since been stopped.
+                return
+            if Profiler.remaining:
+                Profiler.run(self.NAMES[code], self.execute, code, now)
+            else:
+                self.execute(code, now)
+        finally:
+            self.pending.done(code)
+        self.wake()
 
-    def payload(self, code, s=None, n=None):
-        """Execute payload."""
+    def execute(self, code, now=None):
+        """Execute the operation."""
 
         if code == self.INIT:
             ThemeScheduler.init()
         elif code == self.POST_DIALOG:
-            ThemeScheduler.on_post_dialog(s, n)
+            ThemeScheduler.on_post_dialog()
         elif code == self.CHANGE:
-            ThemeScheduler.on_change(s, n)
+            ThemeScheduler.on_change()
+        elif code == self.PROJECT_CHANGE:
+            ProjectScheduler.update(now)
+
+    def dispatch(self, code, now=None):
+        """Run an operation on the main thread, it is pending until it ran."""
+
+        self.pending.add(code)
+        sublime.set_timeout(lambda: self.payload(code, now), 0)
+
+    def tick(self, monotonic, epoch):
+        """Dispatch the operations that are due."""
+
+        if ThemeScheduler.update:
+            ThemeScheduler.update = False
+            ThemeScheduler.busy = False
+            now = get_current_time()[1]
+            debug_log("Button defferal")
+            debug_log("Is busy: %s" % str(ThemeScheduler.busy))
+            debug_log(
+                "Compare: next: %s current: %s" % (
+                    str(ThemeScheduler.next_time),
+                    str(now)
+                )
+            )
+            self.dispatch(self.POST_DIALOG)
+        elif (
+            self.CHANGE not in self.pending and
+            ThemeScheduler.ready and
+            self.is_update_time(monotonic, epoch) and
+            IdleGate.ready(ThemeScheduler.next_change)
+        ):
+            now = get_current_time()[1]
+            debug_log("Time to update")
+            debug_log("Is busy: %s" % str(ThemeScheduler.busy))
+            debug_log(
+                "Compare: next: %s current: %s" % (
+                    str(ThemeScheduler.next_time),
+                    str(now)
+                )
+            )
+            self.dispatch(self.CHANGE)
+        if ProjectScheduler.next_deadline is not None and ProjectScheduler.next_deadline.due(monotonic, epoch):
+            debug_log("Time to update project color schemes")
+            ProjectScheduler.next_deadline = None
+            self.dispatch(self.PROJECT_CHANGE, get_current_time()[1])
+        Coordination.tick()
+        Qualifications.refresh()
+        Includes.check()
+
+    @staticmethod
+    def is_update_time(monotonic, epoch):
+        """Check if time to update."""
+
+        return (
+            not ThemeScheduler.busy and
+            ThemeScheduler.next_deadline is not None and
+            not ThemeScheduler.update and
+            ThemeScheduler.next_deadline.due(monotonic, epoch)
+        )
+
+
+class TsThread(Scheduler, Worker):
+    """Scheduler thread that checks the deadlines every second."""
+
+    def __init__(self, name):
+        """Setup the thread."""
+
+        Worker.__init__(self, name)
+        self.pending = Pending()
 
     def run(self):
         """Thread loop."""
 
-        def is_update_time(seconds, now):
-            """Check if time to update."""
+        self.dispatch(self.INIT)
 
-            update = False
-            if (
-                not ThemeScheduler.busy and
-                ThemeScheduler.next_change is not None and
-                not ThemeScheduler.update and
-                ThemeScheduler.day is not None
-            ):
-                if ThemeScheduler.day == now.day:
-                    # Comparing time on the same day
-                    # If the next change also equals the lowest,
-                    # it is the first change of the day.
-                    # Wait for the next day.
-                    update = (
-                        seconds >= ThemeScheduler.next_change.time and
-                        ThemeScheduler.next_change.time != ThemeScheduler.lowest.time
-                    )
-                else:
-                    # Its a new day.  If the time is greater than the next or
-                    # even the lowest, update theme.
-                    update = (
-                        seconds >= ThemeScheduler.next_change.time or
-                        seconds >= ThemeScheduler.lowest.time
-                    )
-            return update
-
-        sublime.set_timeout(lambda: self.payload(self.INIT), 0)
-
-        while not self.abort:
-            # Pop back into the main thread and check if time to change theme
-            seconds, now = get_current_time()
-            if ThemeScheduler.update:
-                ThemeScheduler.update = False
-                ThemeScheduler.busy = False
-                debug_log("Button defferal")
-                debug_log("Is busy: %s" % str(ThemeScheduler.busy))
-                debug_log(
-                    "Compare: day: %s now: %s next: %s current: %s" % (
-                        ThemeScheduler.day if ThemeScheduler.day is not None else "None",
-                        now.day,
-                        sec2time(ThemeScheduler.next_change.time) if ThemeScheduler.next_change is not None else "None",
-                        sec2time(seconds)
-                    )
-                )
-                sublime.set_timeout(lambda s=seconds, n=now: self.payload(self.POST_DIALOG, s, n), 0)
-            elif ThemeScheduler.ready and is_update_time(seconds, now):
-                debug_log("Time to update")
-                debug_log("Is busy: %s" % str(ThemeScheduler.busy))
-                debug_log(
-                    "Compare: day: %s now: %s next: %s current: %s" % (
-                        ThemeScheduler.day if ThemeScheduler.day is not None else "None",
-                        now.day,
-                        sec2time(ThemeScheduler.next_change.time) if ThemeScheduler.next_change is not None else "None",
-                        sec2time(seconds)
-                    )
-                )
-                sublime.set_timeout(lambda s=seconds, n=now: self.payload(self.CHANGE, s, n), 0)
-            time.sleep(1)
+        while not self.stopped.is_set():
+            # Pop back into the main thread and check if time to change theme,
+            # or sooner when woken as the deadlines changed.
+            self.tick(time.monotonic(), time.time())
+            self.wait(1)
 
 
-def manage_thread():
-    """Manage killing, starting, and restarting the thread."""
+class TimerScheduler(Scheduler, TimerWorker):
+    """
+    Scheduler without a thread.
+
+    A single `set_timeout_async` is armed for the nearest deadline and re-armed after every tick and operation.
+    The deadlines are also checked on a coarse safety timer in case the clock jumps.
+    """
+
+    SAFETY = 60.0
+    POLL = 1.0
+
+    def __init__(self, name):
+        """Setup the scheduler."""
+
+        TimerWorker.__init__(self, name, sublime.set_timeout_async)
+        self.pending = Pending()
+
+    def start(self):
+        """Start scheduling."""
+
+        self.started = True
+        self.dispatch(self.INIT)
 
-    global ts_thread
+    def get_delay(self):
+        """Get the seconds until something needs to be checked."""
+
+        monotonic = time.monotonic()
+        delay = self.SAFETY
+        # A change that is due stays due until the main thread ran it, and can't run while a profile is
+        # compiling; both re-arm the timer when they are done.
+        theme_deadline = (
+            ThemeScheduler.next_deadline if self.CHANGE not in self.pending and not ThemeScheduler.busy else None
+        )
+        for deadline in (theme_deadline, ProjectScheduler.next_deadline):
+            if deadline is not None:
+                delay = min(delay, deadline.monotonic - monotonic)
+        if (
+            not ThemeScheduler.ready or ThemeScheduler.busy or ThemeScheduler.update or
+            IdleGate.deferred_since is not None or Coordination.coordinator is not None
+        ):
+            # Waiting for something that has no deadline.
+            delay = min(delay, self.POLL)
+        expiry = Qualifications.next_expiry()
+        if expiry is not None:
+            delay = min(delay, expiry - monotonic)
+        return max(delay, 0.0)
+
+
+def manage_thread():
+    """Manage stopping, starting, and restarting the scheduler."""
 
-    # global running_theme_scheduler_loop
     if not multiget(SETTINGS, 'enabled', 'False'):
-        if ts_thread is not None:
-            ts_thread.kill()
+        LIFECYCLE.stop()
+        ThemeScheduler.stop()
+        ProjectScheduler.init([])
+        Coordination.stop()
         log("Kill Thread")
+    elif multiget(SETTINGS, 'scheduler_mode', 'thread') == 'timer':
+        LIFECYCLE.restart(TimerScheduler)
+        log("Start Timer")
     else:
-        if ts_thread is not None:
-            ts_thread.kill()
-        ts_thread = TsThread()
-        ts_thread.start()
+        LIFECYCLE.restart(TsThread)
         log("Start Thread")
 
 
@@ -601,6 +1984,7 @@ def load_plugin(retries):
     """Load the plugin's theme schedule and make sure everything is ready."""
 
     global SETTINGS
+    start = time.perf_counter()
     ThemeScheduler.reset_msg_state()
     external_plugins = ["SubNotifyIsReadyCommand", "ThemeTweakerIsReadyCommand"]
     if external_plugins_loaded(external_plugins) or retries == 0:
@@ -614,21 +1998,34 @@ def load_plugin(retries):
         SETTINGS = sublime.load_settings(settings_file)
         SETTINGS.clear_on_change('reload')
         SETTINGS.add_on_change('reload', manage_thread)
+        ResourceIndex.watch()
+        DynamicSettings.watch()
 
         manage_thread()
+        TIMINGS["plugin_loaded"] += time.perf_counter() - start
+        debug_log("plugin_loaded took %.2fms" % (TIMINGS["plugin_loaded"] * 1000))
     else:
         retries_left = retries - 1
         log("Waiting for ThemeTweaker...")
         sublime.set_timeout(lambda: load_plugin(retries_left), 300)
+        TIMINGS["plugin_loaded"] += time.perf_counter() - start
 
 
 def plugin_loaded():
     """Setup plugin."""
 
+    prefetch_hostname()
     load_plugin(LOAD_RETRIES)
 
 
 def plugin_unloaded():
     """Tear down plugin."""
 
-    ts_thread.kill()
+    LIFECYCLE.stop()
+    ThemeScheduler.stop()
+    Coordination.stop()
+    DynamicSettings.stop()
+    History.stop()
+    ResourceIndex.unwatch()
+    if isinstance(SETTINGS, sublime.Settings):
+        SETTINGS.clear_on_change('reload')
@@ -0,0 +1,186 @@
+"""
+Offline schedule compiler.
+
+Compiles ThemeScheduler settings files without Sublime, and prints the compiled
+timeline, the validation errors, and cost statistics of each file as JSON.
+Run it from the package folder:
+
+```
+python -m lib.cli --os linux --host build-01 --days 7 User/ThemeScheduler.sublime-settings
+```
+
+Relative includes are relative to the settings file.  Resources can't be checked
+offline, so color schemes and UI themes are assumed to exist.  The exit code is `1`
+if any file has errors.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from .clock import format_time
+from .compiler import compile_rules, load_entries
+from .file_strip.json import sanitize_json
+from .includes import IncludeCache, merge, resolve_path
+from .multiconf import get as multiget, simulate
+from .profiles import DEFAULT
+from .qualifiers import QualException
+from .schedule import ScheduleException
+from .solar import Solar
+
+# Files often share includes, so they are cached per process.
+INCLUDES = IncludeCache()
+
+
+def read_settings(path):
+    """Read a settings file, allowing comments and trailing commas."""
+
+    with open(path, 'r', encoding='utf-8') as f:
+        settings = json.loads(sanitize_json(f.read()))
+    if not isinstance(settings, dict):
+        raise ValueError("Settings must be an object")
+    return settings
+
+
+def get_themes(settings, profile):
+    """Get the `themes` list of a profile."""
+
+    if profile == DEFAULT:
+        return multiget(settings, "themes", [])
+    profiles = multiget(settings, "profiles", {})
+    if not isinstance(profiles, dict) or profile not in profiles:
+        raise ValueError("Profile '%s' could not be found" % profile)
+    return profiles[profile]
+
+
+def get_includes(settings, path, profile):
+    """Get the full paths of the includes of the default profile."""
+
+    paths = multiget(settings, "include", []) if profile == DEFAULT else []
+    if isinstance(paths, str):
+        paths = [paths]
+    if not isinstance(paths, list):
+        raise ValueError("'include' must be a list")
+    return [resolve_path(p, os.path.dirname(os.path.abspath(path))) for p in paths if isinstance(p, str)]
+
+
+def get_timeline(schedule, start, days):
+    """Get the changes of a schedule for a number of days, and how many changes were collapsed."""
+
+    timeline = []
+    collapsed = 0
+    for offset in range(days):
+        d = start + timedelta(days=offset)
+        times, records = schedule.day(d)[:2]
+        collapsed += schedule.collapsed(d)
+        for seconds, record in zip(times, records):
+            timeline.append(
+                {
+                    "at": "%s %s" % (d.isoformat(), format_time(seconds)),
+                    "theme": record.theme,
+                    "filters": record.filters,
+                    "ui_theme": record.ui_theme,
+                    "msg": record.msg,
+                    "command": record.command
+                }
+            )
+    return timeline, collapsed
+
+
+def compile_file(path, profile=DEFAULT, start=None, days=1):
+    """Compile a settings file into its report."""
+
+    report = {"path": path, "timeline": [], "errors": [], "stats": {}}
+    begin = time.perf_counter()
+    try:
+        settings = read_settings(path)
+        themes = get_themes(settings, profile)
+        if not isinstance(themes, list):
+            raise ValueError("'themes' must be a list")
+        includes = get_includes(settings, path, profile)
+    except (OSError, ValueError, QualException) as e:
+        report["errors"].append(str(e))
+        return report
+
+    try:
+        latitude = multiget(settings, "latitude", None)
+        longitude = multiget(settings, "longitude", None)
+        solar = Solar(float(latitude), float(longitude)) if latitude is not None and longitude is not None else None
+        has_location = solar is not None
+
+        def compiler(rules, emit=report["errors"].append):
+            """Compile rules."""
+
+            return compile_rules(rules, has_location, None, emit)
+
+        layers = [
+            INCLUDES.compile_includes(include, has_location, compiler, report["errors"].append)
+            for include in includes
+        ]
+        layers.append(compiler(themes))
+        entries = merge(layers)
+        records, schedule, scoped = load_entries(entries, solar.resolve if solar is not None else None)
+        timeline, collapsed = get_timeline(schedule, start if start is not None else date.today(), days)
+    except (AttributeError, TypeError, ValueError, QualException, ScheduleException) as e:
+        report["errors"].append("Failed to compile: %s" % str(e))
+        return report
+    report["timeline"] = timeline
+    report["stats"] = {
+        "rules": len(themes),
+        "includes": len(includes),
+        "merged": len(entries),
+        "project_rules": len(entries) - len(records),
+        "changes": len(timeline),
+        "collapsed": collapsed,
+        "outputs": len(set(r.key for r in records)),
+        "regenerations": sum(1 for c in timeline if c["filters"] is not None),
+        "commands": sum(1 for c in timeline if c["command"] is not None),
+        "compile_ms": round((time.perf_counter() - begin) * 1000, 3)
+    }
+    return report
+
+
+def compile_files(paths, profile=DEFAULT, start=None, days=1, platform=None, host=None, jobs=None):
+    """Compile settings files, in parallel processes when there are several."""
+
+    args = [(path, profile, start, days) for path in paths]
+    if jobs == 1 or len(paths) <= 1:
+        simulate(platform, host)
+        return [compile_file(*a) for a in args]
+    chunksize = max(len(paths) // ((jobs or os.cpu_count() or 1) * 4), 1)
+    with ProcessPoolExecutor(jobs, initializer=simulate, initargs=(platform, host)) as executor:
+        return list(executor.map(compile_file, *zip(*args), chunksize=chunksize))
+
+
+def main(argv=None):
+    """Run the compiler."""
+
+    parser = argparse.ArgumentParser(prog='python -m lib.cli', description='Compile ThemeScheduler settings files.')
+    parser.add_argument('files', nargs='+', help='Settings files to compile.')
+    parser.add_argument('--os', dest='platform', choices=('windows', 'osx', 'linux'), help='Simulated `os` qualifier.')
+    parser.add_argument('--host', help='Simulated `host` qualifier.')
+    parser.add_argument('--profile', default=DEFAULT, help='Profile to compile (default: %(default)s).')
+    parser.add_argument('--start', help='First day of the timeline, `YYYY-MM-DD` (default: today).')
+    parser.add_argument('--days', type=int, default=1, help='Number of days in the timeline (default: %(default)s).')
+    parser.add_argument('--jobs', type=int, help='Number of processes (default: one per CPU).')
+    parser.add_argument('--indent', type=int, help='Indent the JSON output.')
+    args = parser.parse_args(argv)
+
+    try:
+        start = datetime.strptime(args.start, '%Y-%m-%d').date() if args.start else None
+    except ValueError:
+        parser.error("'%s' is not a valid date" % args.start)
+
+    reports = compile_files(args.files, args.profile, start, max(args.days, 0), args.platform, args.host, args.jobs)
+    json.dump(reports, sys.stdout, indent=args.indent)
+    sys.stdout.write('\n')
+    return 1 if any(r["errors"] for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Clock.
+
+Schedules are written in local wall clock time, but deadlines are absolute
+instants: a local wall time (integer seconds since the local epoch) is resolved
+to an epoch instant with the zone's UTC offset, and the scheduler loop waits
+for it with the monotonic clock.  Zones are given as offset functions
+(epoch seconds -> UTC offset in seconds); the default is the system's zone.
+
+DST transitions are handled explicitly:
+
+- Gap: a wall time the clock skips over resolves to the moment the clock
+  jumps, so changes scheduled in the gap still happen, and in order.
+- Overlap: a wall time that occurs twice resolves to its first occurrence.
+  During the second pass of the repeated hour, the wall clock is held at the
+  end of the first pass so no change fires twice.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def local_offset(ts):
+    """Get the UTC offset of the system's zone at an instant."""
+
+    return time.localtime(ts).tm_gmtoff
+
+
+def zone_offset(zone):
+    """Get the offset function of a `tzinfo`."""
+
+    def offset(ts):
+        return int(datetime.fromtimestamp(ts, zone).utcoffset().total_seconds())
+
+    return offset
+
+
+def parse_time(value):
+    """Convert `HH:MM` (or `HH:MM:SS`) to seconds since midnight."""
+
+    parts = value.strip().split(':')
+    if not 2 <= len(parts) <= 3:
+        raise ValueError("'%s' is not a valid time" % value)
+    hours, minutes = int(parts[0]), int(parts[1])
+    seconds = int(parts[2]) if len(parts) == 3 else 0
+    if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        raise ValueError("'%s' is not a valid time" % value)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_time(seconds):
+    """Convert seconds since midnight to `HH:MM:SS`."""
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d" % (hours, minutes, seconds)
+
+
+def wall_datetime(wall):
+    """Convert local wall seconds to a naive `datetime`."""
+
+    return EPOCH + timedelta(seconds=wall)
+
+
+def datetime_wall(dt):
+    """Convert a naive `datetime` to local wall seconds."""
+
+    return (dt.toordinal() - EPOCH_ORDINAL) * DAY + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+
+def transition(lo, hi, offset):
+    """Find the first instant in `(lo, hi]` with a different offset than `lo`."""
+
+    base = offset(lo)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if offset(mid) == base:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def to_instant(wall, offset=local_offset):
+    """Resolve local wall seconds to an epoch instant."""
+
+    before = offset(wall - DAY)
+    first = wall - before
+    after = offset(wall + DAY)
+    if before == after or offset(first) == before:
+        # Unambiguous, or the first occurrence of a repeated wall time.
+        return first
+    second = wall - after
+    if offset(second) == after:
+        return second
+    # Skipped wall time: resolve to the moment the clock jumps.
+    return transition(second, first, offset)
+
+
+def to_wall(ts, offset=local_offset):
+    """Get the local wall seconds of an epoch instant, holding during the second pass of a repeated hour."""
+
+    current = offset(ts)
+    earlier = offset(ts - DAY)
+    if earlier > current:
+        first = ts + current - earlier
+        if offset(first) == earlier:
+            return transition(first, ts, offset) - 1 + earlier
+    return ts + current
+
+
+def aware(ts, offset=local_offset):
+    """Get the aware `datetime` of an epoch instant."""
+
+    return datetime.fromtimestamp(ts, timezone(timedelta(seconds=offset(ts))))
+
+
+def next_deadline(schedule, ts, offset=local_offset):
+    """
+    Find the next change of a schedule after an epoch instant.
+
+    Returns the change's local `datetime`, record, and epoch instant, or `None`s.
+    """
+
+    when, record = schedule.next_change(wall_datetime(to_wall(ts, offset)))
+    while when is not None:
+        epoch = to_instant(datetime_wall(when), offset)
+        if epoch > ts:
+            return when, record, epoch
+        # Changes in the first pass of a repeated hour have already happened.
+        when, record = schedule.next_change(when)
+    return None, None, None
+
+
+class Deadline(object):
+    """
+    An epoch instant tracked with the monotonic clock.
+
+    The monotonic clock is immune to the wall clock being set back, and the
+    wall clock check catches up after time spent suspended.
+    """
+
+    __slots__ = ('epoch', 'monotonic')
+
+    def __init__(self, epoch, now=None, monotonic=None):
+        """Setup the deadline relative to the current time."""
+
+        if now is None:
+            now = time.time()
+        if monotonic is None:
+            monotonic = time.monotonic()
+        self.epoch = epoch
+        self.monotonic = monotonic + (epoch - now)
+
+    def due(self, monotonic, now):
+        """Check if the deadline has passed."""
+
+        return monotonic >= self.monotonic or now >= self.epoch
@@ -0,0 +1,147 @@
+"""
+Schedule compiler.
+
+Compiles `themes` rules into validated entries, and loads entries into a schedule.
+Entries only contain JSON serializable values so they can be cached.
+
+The compiler doesn't depend on Sublime: resources are checked with an optional
+`exists` callback and problems are reported to an optional `report` callback, so
+schedules can also be compiled offline (see `lib.cli`).
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+from collections import OrderedDict
+from .clock import format_time, parse_time
+from .filters import FilterException, canonicalize
+from .records import ThemeRecord, is_noop, make_record, output_key
+from .schedule import DateRange, Rule, Schedule, ScheduleException
+from .solar import parse_solar
+
+
+def ignore(msg):
+    """Ignore a report."""
+
+
+def validate(record, exists=None, report=ignore):
+    """
+    Validate the resources and filters of a record, and compute its output key.
+
+    Missing resources and invalid filters are dropped from the record so they are not applied.
+    """
+
+    if exists is not None and record.theme is not None and not exists(record.theme):
+        report("Color scheme '%s' @ %s could not be found!" % (record.theme, format_time(record.time)))
+        record = record._replace(theme=None, filters=None)
+    if exists is not None and record.ui_theme is not None and not exists(record.ui_theme):
+        report("UI theme '%s' @ %s could not be found!" % (record.ui_theme, format_time(record.time)))
+        record = record._replace(ui_theme=None)
+    try:
+        record = record._replace(filters=canonicalize(record.filters))
+    except FilterException as e:
+        report("Filters '%s' @ %s are invalid: %s" % (record.filters, format_time(record.time), str(e)))
+        record = record._replace(filters=None)
+    return record._replace(key=output_key(record.theme, record.msg, record.filters, record.ui_theme))
+
+
+def compile_rules(themes, has_location, exists=None, report=ignore):
+    """Compile `themes` rules into validated entries, skipping the rules that can't be used."""
+
+    entries = []
+    for t in themes:
+        if not isinstance(t, dict) or not isinstance(t.get("time"), str):
+            report("Skipping rule %s: 'time' is not set." % str(t))
+            continue
+        solar_time = parse_solar(t["time"])
+        if solar_time is not None and not has_location:
+            report("Skipping rule @ %s: 'latitude' and 'longitude' are not set." % t["time"])
+            continue
+        try:
+            # Solar times are resolved to a time of day when each day is compiled.
+            theme_time = parse_time(t["time"]) if solar_time is None else 0
+        except ValueError as e:
+            report("Skipping rule @ %s: %s" % (t["time"], str(e)))
+            continue
+        projects = t.get("projects", None)
+        if isinstance(projects, str):
+            projects = [projects]
+        elif projects is not None and (
+            not isinstance(projects, list) or not all(isinstance(p, str) for p in projects)
+        ):
+            report("Skipping rule @ %s: 'projects' is not a project pattern or list of patterns." % t["time"])
+            continue
+        windows = t.get("windows", None)
+        if isinstance(windows, str):
+            windows = [windows]
+        elif windows is not None and (
+            not isinstance(windows, list) or not all(isinstance(w, str) for w in windows)
+        ):
+            report("Skipping rule @ %s: 'windows' is not a window name or list of names." % t["time"])
+            continue
+        if projects is not None and windows is not None:
+            report("Skipping rule @ %s: a rule can be scoped to 'projects' or 'windows', not both." % t["time"])
+            continue
+        record = validate(
+            ThemeRecord(
+                theme_time, t.get("theme", None), t.get("msg", None),
+                t.get("filters", None), t.get("ui_theme", None), t.get("command", None)
+            ),
+            exists,
+            report
+        )
+        try:
+            rule = Rule.parse(record, t.get("days", None), t.get("dates", None), solar_time)
+        except ScheduleException as e:
+            report("Skipping rule @ %s: %s" % (t["time"], str(e)))
+            continue
+        entry = record._asdict()
+        entry.update(
+            {
+                "days": sorted(rule.days) if rule.days is not None else None,
+                "dates": rule.dates,
+                "solar": solar_time,
+                "projects": projects,
+                "windows": windows
+            }
+        )
+        entries.append(entry)
+    return entries
+
+
+def load_entries(entries, resolver=None, commands=None):
+    """
+    Load compiled entries into a schedule; returns the records, the schedule, and the scoped schedules.
+
+    Scoped schedules are keyed by their scope, `projects` or `windows`, and its patterns or names.
+
+    Command objects are created with the `commands` factory.
+    """
+
+    themes = []
+    rules = []
+    scoped = OrderedDict()
+    for entry in entries:
+        record = make_record(
+            entry["time"], entry["theme"], entry["msg"], entry["filters"], entry["ui_theme"],
+            entry["command"], commands, entry["key"]
+        )
+        days, dates, solar_time = entry["days"], entry["dates"], entry["solar"]
+        rule = Rule(
+            record,
+            frozenset(days) if days is not None else None,
+            tuple(DateRange(tuple(start), tuple(end)) for start, end in dates) if dates is not None else None,
+            tuple(solar_time) if solar_time is not None else None
+        )
+        for scope in ("projects", "windows"):
+            if entry[scope] is not None:
+                # Scoped rules only change the color scheme of the views in the windows they apply to.
+                scoped.setdefault((scope, tuple(entry[scope])), []).append(rule)
+                break
+        else:
+            rules.append(rule)
+            themes.append(record)
+
+    return (
+        themes, Schedule(rules, resolver, is_noop),
+        [(scope, Schedule(r, resolver, is_noop)) for scope, r in scoped.items()]
+    )
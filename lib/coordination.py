@@ -0,0 +1,120 @@
+"""
+Coordination of multiple instances.
+
+Instances elect a leader through a lock file in a shared folder.  The leader
+keeps its lease by touching the lock file; if it stops doing so for longer than
+the lease, another instance takes over.  The leader publishes what it applied
+to a state file that the other instances poll (a `stat` call unless it changed).
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import json
+import os
+import time
+import uuid
+
+LOCK_FILE = 'leader.lock'
+STATE_FILE = 'state.json'
+
+
+class Coordinator(object):
+    """Leader election and shared state for one instance."""
+
+    def __init__(self, folder, lease=30.0, instance=None):
+        """Setup the instance."""
+
+        self.folder = folder
+        self.lease = lease
+        self.instance = instance if instance is not None else '%d-%s' % (os.getpid(), uuid.uuid4().hex[:8])
+        self.lock_path = os.path.join(folder, LOCK_FILE)
+        self.state_path = os.path.join(folder, STATE_FILE)
+        self.leader = False
+        self.state_mtime = None
+
+    def read_lock(self):
+        """Get the owner of the lock and when it last renewed its lease."""
+
+        try:
+            with open(self.lock_path, 'r') as f:
+                owner = f.read().strip()
+            return owner, os.path.getmtime(self.lock_path)
+        except OSError:
+            return None, None
+
+    def write(self, path, content):
+        """Write a file atomically."""
+
+        temp = '%s.%s.tmp' % (path, self.instance)
+        with open(temp, 'w') as f:
+            f.write(content)
+        os.replace(temp, path)
+
+    def acquire(self):
+        """
+        Become or stay the leader if possible.
+
+        Returns whether this instance is the leader.
+        """
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            owner, mtime = self.read_lock()
+            if owner == self.instance:
+                # Renew the lease.
+                os.utime(self.lock_path, None)
+            elif owner is None:
+                try:
+                    fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    self.leader = False
+                    return False
+                with os.fdopen(fd, 'w') as f:
+                    f.write(self.instance)
+            elif time.time() - mtime > self.lease:
+                # The leader went away without releasing the lock, take over.
+                self.write(self.lock_path, self.instance)
+            else:
+                self.leader = False
+                return False
+            # Confirm, in case another instance took over at the same time.
+            self.leader = self.read_lock()[0] == self.instance
+        except OSError:
+            self.leader = False
+        return self.leader
+
+    def release(self):
+        """Give up leadership."""
+
+        if self.leader and self.read_lock()[0] == self.instance:
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+        self.leader = False
+
+    def publish(self, data):
+        """Publish what the leader applied."""
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            self.write(
+                self.state_path,
+                json.dumps({"leader": self.instance, "time": time.time(), "data": data}, separators=(',', ':'))
+            )
+        except OSError:
+            pass
+
+    def poll(self):
+        """Return newly published data from another instance, or `None` if nothing changed."""
+
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+            if mtime == self.state_mtime:
+                return None
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self.state_mtime = mtime
+        except (OSError, ValueError):
+            return None
+        return state.get("data") if state.get("leader") != self.instance else None
@@ -18,8 +18,8 @@ CPP_CODE = r'''
 
 PY_CODE = r'''
 (?P<code>
-    "{3}(?:\\.|[^\\])*"{3}          # triple double quotes
-  | '{3}(?:\\.|[^\\])*'{3}          # triple single quotes
+    "{3}(?:\\.|[^\\])*?"{3}         # triple double quotes
+  | '{3}(?:\\.|[^\\])*?'{3}         # triple single quotes
   | "(?:\\.|[^"\\])*"               # double quotes
   | '(?:\\.|[^'])*'                 # single quotes
   | .[^\#"']*                       # everything else
@@ -52,22 +52,104 @@ PY_PATTERN = re.compile(r'(?x)%(comments)s|%(code)s' % {"comments": PY_COMMENTS,
 
 JSON_PATTERN = re.compile(r'(?x)%(comments)s|%(code)s' % {"comments": CPP_COMMENTS, "code": JSON_CODE}, re.DOTALL)
 
+# Tokens that need a closing delimiter, longest first: `(open, close)`.
+CPP_DELIMITERS = (('/*', '*/'), ('"', '"'), ("'", "'"))
+PY_DELIMITERS = (('"""', '"""'), ("'''", "'''"), ('"', '"'), ("'", "'"))
+JSON_DELIMITERS = (('/*', '*/'), ('"', '"'))
+
+CHUNK_SIZE = 65536
 
-def _strip_regex(pattern, text, preserve_lines):
-    """Generic function that strips out comments pased on the given pattern."""
 
-    def remove_comments(group, preserve_lines=False):
-        """Remove comments."""
+def _evaluate(m, preserve_lines):
+    """Return the code of a match, or what is left of a comment."""
 
-        return ''.join([x[0] for x in LINE_PRESERVE.findall(group)]) if preserve_lines else ''
+    code = m.group('code')
+    if code is not None:
+        return code
+    return ''.join([x[0] for x in LINE_PRESERVE.findall(m.group('comments'))]) if preserve_lines else ''
 
-    def evaluate(m, preserve_lines):
-        """Search for comments."""
 
-        g = m.groupdict()
-        return g["code"] if g["code"] is not None else remove_comments(g["comments"], preserve_lines)
+def _strip_regex(pattern, text, preserve_lines):
+    """Generic function that strips out comments pased on the given pattern."""
 
-    return ''.join(map(lambda m: evaluate(m, preserve_lines), pattern.finditer(text)))
+    return ''.join(map(lambda m: _evaluate(m, preserve_lines), pattern.finditer(text)))
+
+
+def _is_closed(token, text, start, delimiters):
+    """
+    Check that a token starting with a delimiter's first character is not an unclosed string or comment.
+
+    An unclosed string or comment falls back to being matched as code, which more text could change.
+    A string that ends on an escaped quote is not closed either: the pattern only settles for the
+    escaped quote when no real closing quote follows, which more text could also change.
+    """
+
+    for opening, closing in delimiters:
+        if text.startswith(opening, start):
+            if not token.endswith(closing) or len(token) < len(opening) + len(closing):
+                return False
+            if opening == closing and token[-len(closing) - 1] == '\\':
+                body = token[len(opening):-len(closing)]
+                return (len(body) - len(body.rstrip('\\'))) % 2 == 0
+            return True
+    return True
+
+
+def _split_code(m, text, delimiters):
+    """
+    Get where a code match that is not final can be split; the text before the split is final.
+
+    Matched again from any later character that is not whitespace, which could still turn out to lead a
+    comment, the rest of the code matches the same. Code that opens a string or comment is not split.
+    """
+
+    start, stop = m.span()
+    if m.group('code') is None or any(text.startswith(d[0], start) for d in delimiters.get(text[start], ())):
+        return start
+    return start + len(text[start + 1:stop].rstrip())
+
+
+def _strip_regex_stream(pattern, delimiters, chunks, preserve_lines):
+    """
+    Strip comments from an iterable of chunks, yielding stripped text as it goes.
+
+    A match is only final if the text after it is known well enough for the pattern to have decided it,
+    and it is not an unclosed string or comment. Code that is not final is split so only its tail is held,
+    and the held text is matched again when more text arrives, so the output is the same as if the whole
+    text was stripped at once.
+    """
+
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text = pending + chunk
+        limit = len(text) - 1
+        out = []
+        end = 0
+        for m in pattern.finditer(text):
+            stop = m.end()
+            code = m.group('code')
+            # Matches are contiguous, so this one starts at the end of the last; comments are always closed,
+            # and so are most strings: those that end on their unescaped opening quote, unless they are
+            # empty strings that could be the start of a triple quote.
+            if stop >= limit or (
+                code is not None and code[0] in delimiters and
+                not (len(code) > 2 and code[-1] == code[0] and code[-2] != '\\') and
+                not _is_closed(code, text, end, delimiters[code[0]])
+            ):
+                split = _split_code(m, text, delimiters)
+                if split > end:
+                    out.append(text[end:split])
+                    end = split
+                break
+            out.append(code if code is not None else _evaluate(m, preserve_lines))
+            end = stop
+        pending = text[end:]
+        if out:
+            yield ''.join(out)
+    if pending:
+        yield _strip_regex(pattern, pending, preserve_lines)
 
 
 @staticmethod
@@ -121,20 +203,32 @@ class Comments(object):
     """Comment strip class."""
 
     styles = []
+    stream_styles = {}
 
     def __init__(self, style=None, preserve_lines=False):
         """Initialize."""
 
         self.preserve_lines = preserve_lines
+        self.style = style
         self.call = self.__get_style(style)
 
     @classmethod
-    def add_style(cls, style, fn):
-        """Add comment style."""
+    def add_style(cls, style, fn, pattern=None, delimiters=None):
+        """
+        Add comment style.
+
+        Styles that provide their `pattern` and `delimiters` can also be stripped with `strip_stream`.
+        """
 
         if style not in cls.__dict__:
             setattr(cls, style, fn)
             cls.styles.append(style)
+            if pattern is not None:
+                # Index the delimiters by their first character for a quick check.
+                index = {}
+                for delimiter in delimiters or ():
+                    index.setdefault(delimiter[0][0], []).append(delimiter)
+                cls.stream_styles[style] = (pattern, {c: tuple(d) for c, d in index.items()})
 
     def __get_style(self, style):
         """Get the comment style."""
@@ -149,9 +243,22 @@ class Comments(object):
 
         return self.call(text, self.preserve_lines)
 
+    def strip_stream(self, source, chunk_size=CHUNK_SIZE):
+        """
+        Strip comments from a file object or an iterable of text chunks.
+
+        Stripped text is yielded incrementally and joins to the same result as `strip`.
+        """
+
+        if self.style not in self.stream_styles:
+            raise CommentException(self.style)
+        chunks = iter(lambda f=source: f.read(chunk_size), '') if hasattr(source, 'read') else source
+        pattern, delimiters = self.stream_styles[self.style]
+        return _strip_regex_stream(pattern, delimiters, chunks, self.preserve_lines)
+
 
-Comments.add_style("c", _cpp)
-Comments.add_style("json", _json)
-Comments.add_style("cpp", _cpp)
-Comments.add_style("python", _python)
-Comments.add_style("css", _cpp)
+Comments.add_style("c", _cpp, CPP_PATTERN, CPP_DELIMITERS)
+Comments.add_style("json", _json, JSON_PATTERN, JSON_DELIMITERS)
+Comments.add_style("cpp", _cpp, CPP_PATTERN, CPP_DELIMITERS)
+Comments.add_style("python", _python, PY_PATTERN, PY_DELIMITERS)
+Comments.add_style("css", _cpp, CPP_PATTERN, CPP_DELIMITERS)
@@ -0,0 +1,85 @@
+"""
+ThemeTweaker filter strings.
+
+Filters are `;` separated, each a name with an optional argument in parentheses and
+an optional `@fg` or `@bg` context: `brightness(.98)@bg;glow(.1)`.  Filter strings
+are canonicalized so equivalent strings (`brightness(.98)@bg` and
+`brightness(0.98)@bg`) compare equal and don't regenerate the same color scheme.
+The order of the filters is kept as it matters.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import re
+from functools import lru_cache
+
+RE_FILTER = re.compile(r'^([a-z]+)\s*(?:\(\s*([^()]*?)\s*\))?\s*(?:@\s*(fg|bg))?$', re.I)
+
+NUMERIC = frozenset(("brightness", "saturation", "hue", "colorize", "glow", "contrast"))
+PLAIN = frozenset(("sepia", "grayscale", "invert"))
+COLOR = frozenset(("tint",))
+
+
+class FilterException(Exception):
+    """Filter exception."""
+
+    pass
+
+
+def format_number(value):
+    """Format a number without redundant digits."""
+
+    number = float(value)
+    if number != number or number in (float('inf'), float('-inf')):
+        raise ValueError
+    # Fixed-point, as ThemeTweaker can't read back exponents like `1e-05`.
+    text = ('%.12f' % number).rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def canonicalize(filters):
+    """
+    Canonicalize a filter string, `None` if there are no filters.
+
+    Raises `FilterException` if a filter can't be parsed or has an invalid argument.
+    Filters ThemeTweaker may add later are passed through with their spacing and case normalized.
+    """
+
+    if filters is None:
+        return None
+    if not isinstance(filters, str):
+        raise FilterException("Filters must be a string")
+    return parse(filters)
+
+
+@lru_cache(maxsize=256)
+def parse(filters):
+    """Parse and canonicalize a filter string."""
+
+    canonical = []
+    for part in filters.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        m = RE_FILTER.match(part)
+        if m is None:
+            raise FilterException("'%s' is not a valid filter" % part)
+        name, arg, context = m.group(1).lower(), m.group(2), m.group(3)
+        if name in NUMERIC:
+            try:
+                arg = format_number(arg) if arg is not None else None
+            except ValueError:
+                raise FilterException("'%s' requires a number" % name)
+            if arg is None:
+                raise FilterException("'%s' requires a number" % name)
+        elif name in PLAIN:
+            if arg:
+                raise FilterException("'%s' doesn't take an argument" % name)
+            arg = None
+        elif arg is not None:
+            arg = re.sub(r'\s+', '', arg).lower() if name in COLOR else arg
+        text = name if arg is None else '%s(%s)' % (name, arg)
+        if context is not None:
+            text += '@' + context.lower()
+        canonical.append(text)
+    return ';'.join(canonical) if canonical else None
@@ -0,0 +1,147 @@
+"""
+Schedule includes.
+
+Included files hold shared schedule rules, either a list of rules or an object
+with a `themes` list, and may have comments and trailing commas.  Includes are
+layered in order under the settings' own rules: a rule replaces an included rule
+with the same time, days, dates, projects, and windows, other rules are added.
+
+Each include is parsed only when its modification time or size changes, and its
+compiled entries are kept with it, so a change to one include only compiles that
+include again.  The cache holds a limited number of includes.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from .file_strip.json import sanitize_json
+
+MAX_INCLUDES = 32
+
+
+def resolve_path(path, base):
+    """Resolve an include path; `~` and environment variables are expanded, relative paths are relative to `base`."""
+
+    return os.path.normpath(os.path.join(base, os.path.expanduser(os.path.expandvars(path))))
+
+
+def get_stamp(path):
+    """Get the modification time and size of a file, `None` if it doesn't exist."""
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def parse_rules(text):
+    """Parse the rules of an include."""
+
+    data = json.loads(sanitize_json(text))
+    rules = data.get("themes") if isinstance(data, dict) else data
+    if not isinstance(rules, list):
+        raise ValueError("An include must be a list of rules or an object with a 'themes' list")
+    return rules
+
+
+def get_rule_key(entry):
+    """Get what identifies a compiled rule when layering."""
+
+    return json.dumps(
+        [entry["time"], entry["solar"], entry["days"], entry["dates"], entry["projects"], entry["windows"]]
+    )
+
+
+def merge(layers):
+    """Merge lists of compiled entries, entries of later layers replace earlier ones with the same key."""
+
+    merged = OrderedDict()
+    for entries in layers:
+        for entry in entries:
+            merged[get_rule_key(entry)] = entry
+    return list(merged.values())
+
+
+class Include(object):
+    """A parsed include and its compiled entries."""
+
+    __slots__ = ('path', 'stamp', 'rules', 'error', 'context', 'entries', 'messages')
+
+    def __init__(self, path, stamp, rules, error):
+        """Setup the include."""
+
+        self.path = path
+        self.stamp = stamp
+        self.rules = rules
+        self.error = error
+        self.context = None
+        self.entries = None
+        self.messages = []
+
+
+class IncludeCache(object):
+    """Bounded cache of parsed and compiled includes."""
+
+    def __init__(self, max_includes=MAX_INCLUDES):
+        """Setup the cache."""
+
+        self.max_includes = max_includes
+        self.includes = OrderedDict()
+        self.parsed = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """Get an include, parsing it again only if it changed."""
+
+        stamp = get_stamp(path)
+        with self.lock:
+            include = self.includes.get(path)
+            if include is not None and include.stamp == stamp:
+                self.includes.move_to_end(path)
+                return include
+
+        if stamp is None:
+            include = Include(path, stamp, [], "Include '%s' could not be found" % path)
+        else:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    include = Include(path, stamp, parse_rules(f.read()), None)
+            except (OSError, ValueError) as e:
+                include = Include(path, stamp, [], "Include '%s' could not be read: %s" % (path, str(e)))
+            self.parsed += 1
+
+        with self.lock:
+            self.includes[path] = include
+            self.includes.move_to_end(path)
+            while len(self.includes) > self.max_includes:
+                self.includes.popitem(last=False)
+        return include
+
+    def compile_includes(self, path, context, compiler, report=None):
+        """
+        Get the compiled entries of an include.
+
+        `compiler` is called with the rules and a report callback when the include changed or was
+        compiled in another `context`.  What it reported is passed to `report` every time.
+        """
+
+        include = self.get(path)
+        if include.entries is None or include.context != context:
+            messages = [include.error] if include.error is not None else []
+            include.entries = compiler(include.rules, messages.append)
+            include.context = context
+            include.messages = messages
+        if report is not None:
+            for msg in include.messages:
+                report(msg)
+        return include.entries
+
+    def clear(self):
+        """Forget all includes."""
+
+        with self.lock:
+            self.includes.clear()
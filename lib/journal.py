@@ -0,0 +1,158 @@
+"""
+Journal of schedule changes.
+
+Entries are compact JSON lines appended to `journal.log`.  Writes are buffered
+and flushed on a background timer.  When the journal grows past its size limit,
+it is rotated to `journal.1.log`, `journal.2.log`, etc. and the oldest is removed.
+
+Entries are written in time order, so a time range is found by a binary search
+over file offsets and only the lines in the range are read.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import json
+import os
+import threading
+import time
+
+FILE_NAME = 'journal.log'
+MAX_BYTES = 1024 * 1024
+BACKUPS = 3
+FLUSH_DELAY = 2.0
+
+
+class Journal(object):
+    """Append-only, size-rotated journal."""
+
+    def __init__(self, folder, max_bytes=MAX_BYTES, backups=BACKUPS, flush_delay=FLUSH_DELAY):
+        """Setup the journal."""
+
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_delay = flush_delay
+        self.buffer = []
+        self.timer = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def get_path(self, index=0):
+        """Get the path of the journal, or of a rotated journal."""
+
+        name = FILE_NAME if not index else FILE_NAME.replace('.', '.%d.' % index, 1)
+        return os.path.join(self.folder, name)
+
+    def write(self, event, scheduled=None, actual=None, fingerprint=None, **extra):
+        """
+        Buffer an entry.
+
+        `scheduled` and `actual` are epoch seconds, `actual` defaults to now.
+        """
+
+        entry = {"e": event, "s": scheduled, "a": int(time.time()) if actual is None else actual, "f": fingerprint}
+        entry.update(extra)
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self.lock:
+            self.buffer.append(line)
+            if self.timer is None and self.flush_delay is not None:
+                self.timer = threading.Timer(self.flush_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Write the buffered entries."""
+
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+            self.timer = None
+        if not lines:
+            return
+        with self.write_lock:
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                path = self.get_path()
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(lines))
+                if os.path.getsize(path) > self.max_bytes:
+                    self.rotate()
+            except OSError:
+                pass
+
+    def rotate(self):
+        """Move the journal to the first backup, shifting the older backups and replacing the oldest."""
+
+        for index in range(self.backups, 0, -1):
+            src = self.get_path(index - 1)
+            if os.path.exists(src):
+                os.replace(src, self.get_path(index))
+
+    def close(self):
+        """Stop the flush timer and write what is left."""
+
+        with self.lock:
+            timer, self.timer = self.timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+    def query(self, start=None, end=None):
+        """Yield the entries with an actual time in `[start, end]`, oldest first."""
+
+        for index in range(self.backups, -1, -1):
+            path = self.get_path(index)
+            try:
+                with open(path, 'rb') as f:
+                    for entry in self.scan(f, os.fstat(f.fileno()).st_size, start, end):
+                        yield entry
+            except OSError:
+                continue
+
+    @staticmethod
+    def parse(line):
+        """Parse an entry, or return `None` if it is damaged."""
+
+        try:
+            entry = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
+        return entry if isinstance(entry, dict) and isinstance(entry.get("a"), int) else None
+
+    def seek(self, f, size, start):
+        """Find the offset of the first line with an actual time of at least `start`."""
+
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            if mid:
+                # Skip to the start of the next line.
+                f.readline()
+            offset = f.tell()
+            entry = None
+            while entry is None and offset < size:
+                line = f.readline()
+                entry = self.parse(line)
+                if entry is None:
+                    offset = f.tell()
+            if offset >= size or entry["a"] >= start:
+                hi = mid
+            else:
+                lo = mid + 1
+        f.seek(lo)
+        if lo:
+            f.readline()
+        return f.tell()
+
+    def scan(self, f, size, start, end):
+        """Yield the entries of a journal file in the range."""
+
+        f.seek(self.seek(f, size, start) if start is not None else 0)
+        for line in f:
+            entry = self.parse(line)
+            if entry is None:
+                continue
+            if end is not None and entry["a"] > end:
+                break
+            if start is None or entry["a"] >= start:
+                yield entry
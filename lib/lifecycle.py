@@ -0,0 +1,215 @@
+"""
+Worker lifecycle.
+
+Keeps exactly one worker of a given name alive per process.  Plugin reloads
+can replace the module (and its globals) that started a worker, so besides the
+worker it started itself, the lifecycle also stops the last worker started
+under the same name by any lifecycle, and any live thread with the same name,
+which catches workers orphaned by an earlier module.
+
+Workers are threads, or any object with `start`, `stop`, and `is_alive`, like a
+`TimerWorker`, which re-arms a single timer instead of running a thread.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import math
+import threading
+import time
+
+STOP_TIMEOUT = 5.0
+
+# Last worker started under each name.
+ACTIVE = {}
+
+
+class Worker(threading.Thread):
+    """Daemon thread with a stop signal it can wait on."""
+
+    def __init__(self, name):
+        """Setup the thread."""
+
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.stopped = threading.Event()
+        self.woken = threading.Event()
+
+    def wait(self, seconds):
+        """Sleep until the timeout, a wake up, or a stop request; returns whether a stop was requested."""
+
+        self.woken.wait(seconds)
+        self.woken.clear()
+        return self.stopped.is_set()
+
+    def wake(self):
+        """Cut the current wait short."""
+
+        self.woken.set()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Request the thread to stop and wait for it."""
+
+        self.stopped.set()
+        self.woken.set()
+        if self.ident is not None and self is not threading.current_thread():
+            self.join(timeout)
+
+
+class Pending(object):
+    """
+    Operations handed to another thread that haven't run yet.
+
+    An operation is only handed over again once it ran, so a tick that sees the same
+    deadline before the other thread caught up doesn't queue it twice.
+    """
+
+    def __init__(self):
+        """Setup the pending operations."""
+
+        self.codes = set()
+        self.lock = threading.Lock()
+
+    def add(self, code):
+        """Mark an operation as pending; returns `False` if it already is."""
+
+        with self.lock:
+            if code in self.codes:
+                return False
+            self.codes.add(code)
+            return True
+
+    def done(self, code):
+        """Mark an operation as ran."""
+
+        with self.lock:
+            self.codes.discard(code)
+
+    def __contains__(self, code):
+        """Check if an operation is pending."""
+
+        return code in self.codes
+
+
+class TimerWorker(object):
+    """
+    Worker without a thread.
+
+    A single timer is armed with `set_timeout` (called with a callback and milliseconds) for
+    the delay `get_delay` returns, and re-armed after every `tick`.  Arming supersedes the
+    timer already armed, and armed timers do nothing when they fire after a stop.
+    """
+
+    def __init__(self, name, set_timeout):
+        """Setup the worker."""
+
+        self.name = name
+        self.set_timeout = set_timeout
+        self.stopped = threading.Event()
+        self.started = False
+        self.generation = 0
+        self.wakeups = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the timer."""
+
+        self.started = True
+        self.wake()
+
+    def stop(self):
+        """Stop the timer."""
+
+        self.stopped.set()
+
+    def is_alive(self):
+        """Check if the worker is running."""
+
+        return self.started and not self.stopped.is_set()
+
+    def wake(self):
+        """Re-arm the timer for the current delay."""
+
+        self.arm(self.get_delay())
+
+    def arm(self, delay):
+        """Arm the timer, superseding the one already armed."""
+
+        if self.stopped.is_set():
+            return
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        self.set_timeout(lambda: self.fire(generation), int(math.ceil(delay * 1000)))
+
+    def fire(self, generation):
+        """Tick and re-arm the timer."""
+
+        with self.lock:
+            if self.stopped.is_set() or generation != self.generation:
+                return
+            self.wakeups += 1
+        self.tick(time.monotonic(), time.time())
+        self.wake()
+
+    def tick(self, monotonic, epoch):
+        """Do what is due."""
+
+    def get_delay(self):
+        """Get the seconds until the next tick."""
+
+        return 0.0
+
+
+class Lifecycle(object):
+    """Start and stop the one worker of a given name."""
+
+    def __init__(self, name):
+        """Setup the lifecycle."""
+
+        self.name = name
+        self.worker = None
+        self.lock = threading.RLock()
+
+    def orphans(self):
+        """Get live threads with the worker's name that this lifecycle didn't start."""
+
+        return [
+            t for t in threading.enumerate()
+            if t.name == self.name and t is not self.worker and t.is_alive() and hasattr(t, 'stop')
+        ]
+
+    def running(self):
+        """Check if the worker is running."""
+
+        with self.lock:
+            return self.worker is not None and self.worker.is_alive()
+
+    def start(self, factory):
+        """Start a worker created by `factory` (called with the name), unless one is running."""
+
+        with self.lock:
+            if self.running():
+                return self.worker
+            return self.restart(factory)
+
+    def restart(self, factory):
+        """Stop the running worker, if any, and start a new one."""
+
+        with self.lock:
+            self.stop()
+            self.worker = ACTIVE[self.name] = factory(self.name)
+            self.worker.start()
+            return self.worker
+
+    def stop(self):
+        """Stop the worker and any orphaned worker; does nothing if none are running."""
+
+        with self.lock:
+            worker, self.worker = self.worker, None
+            active = ACTIVE.pop(self.name, None)
+            if active is not None and active is not worker:
+                active.stop()
+            for orphan in self.orphans():
+                orphan.stop()
+            if worker is not None:
+                worker.stop()
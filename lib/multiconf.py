@@ -36,6 +36,21 @@ machine it's on. On an MS Windows machine the value returned by `get` will be
 "C:\\Users", and on a Linux machine with the host name `his_pc` the value will be
 "/home".
 
+Besides `os` and `host`, the following qualifiers are available:
+
+    env:NAME              the environment variable is set
+    env:NAME=value        the environment variable has the value
+    file:path             the file or folder exists
+    project:marker        the file or folder exists in a folder of an open window
+    time:HH:MM-HH:MM      the local time is within the band
+
+Qualifier results are cached for a qualifier specific TTL.  More qualifiers can be
+added with `Qualifications.add_qual`, and `Qualifications.add_listener` registers a
+callback that receives the setting keys to resolve again when a cached result changes.
+
+Outside of Sublime, settings must be dictionaries, and `simulate` sets the values
+the `os` and `host` qualifiers match against.
+
 -----
 
 Thanks to: biermeester and matthjes for their ideas and contributions
@@ -59,15 +74,73 @@ THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRI
 AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
-import socket
-import sublime
+try:
+    import sublime
+except ImportError:
+    sublime = None
+import os
 import re
+import sys
+import threading
+from .qualifiers import Qualifiers, QualException, env_match, file_match, time_match  # noqa: F401
 
 __version__ = "1.0"
 
-__CURRENT_HOSTNAME = socket.gethostname().lower()
-
 QUALIFIERS = r"""([A-Za-z\d_]*):([^;]*)(?:;|$)"""
+RE_QUALIFIERS = re.compile(QUALIFIERS)
+
+_hostname = None
+_hostname_lock = threading.Lock()
+_simulated = {"os": None, "host": None}
+
+PLATFORMS = {'darwin': 'osx', 'win32': 'windows'}
+
+
+def get_hostname():
+    """
+    Get the lowercase host name.
+
+    The host name is resolved on first use and cached, as the lookup can be slow on some systems.
+    """
+
+    global _hostname
+
+    if _simulated["host"] is not None:
+        return _simulated["host"]
+    if _hostname is None:
+        with _hostname_lock:
+            if _hostname is None:
+                import socket
+                _hostname = socket.gethostname().lower()
+    return _hostname
+
+
+def prefetch_hostname():
+    """Resolve the host name in the background so the first `host` qualifier doesn't have to wait."""
+
+    if _hostname is None:
+        thread = threading.Thread(target=get_hostname)
+        thread.daemon = True
+        thread.start()
+
+
+def get_platform():
+    """Get the platform name as Sublime names it."""
+
+    if _simulated["os"] is not None:
+        return _simulated["os"]
+    if sublime is not None:
+        return sublime.platform()
+    return PLATFORMS.get(sys.platform, 'linux')
+
+
+def simulate(platform=None, host=None):
+    """Match the `os` and `host` qualifiers against the given values (`None` uses the actual ones)."""
+
+    _simulated["os"] = platform
+    _simulated["host"] = host.lower() if host is not None else None
+    Qualifications.invalidate("os")
+    Qualifications.invalidate("host")
 
 
 def get(settings_obj, key, default=None, callback=None):
@@ -85,7 +158,7 @@ def get(settings_obj, key, default=None, callback=None):
     """
 
     # Parameter validation
-    if not isinstance(settings_obj, (dict, sublime.Settings)):
+    if not isinstance(settings_obj, (dict, sublime.Settings) if sublime is not None else dict):
         raise AttributeError("Invalid settings object")
     if not isinstance(key, str):
         raise AttributeError("Invalid callback function")
@@ -96,6 +169,7 @@ def get(settings_obj, key, default=None, callback=None):
     final_val = None
 
     if isinstance(setting, dict) and "#multiconf#" in setting:
+        Qualifications.track(key)
         reject_item = False
         for entry in setting["#multiconf#"]:
             reject_item = False if isinstance(entry, dict) and len(entry) else True
@@ -105,9 +179,9 @@ def get(settings_obj, key, default=None, callback=None):
             if reject_item:
                 continue
 
-            for qual in re.compile(QUALIFIERS).finditer(k):
+            for qual in RE_QUALIFIERS.finditer(k):
                 if Qualifications.exists(qual.group(1)):
-                    reject_item = not Qualifications.eval_qual(qual.group(1), qual.group(2))
+                    reject_item = not Qualifications.eval_qual(qual.group(1), qual.group(2), key)
                 else:
                     reject_item = True
                 if reject_item:
@@ -125,62 +199,103 @@ def get(settings_obj, key, default=None, callback=None):
     return callback(final_val, default) if callback else final_val
 
 
-class QualException(Exception):
-    """Qualification exception."""
-
-    pass
-
-
 class Qualifications(object):
     """Qualifications."""
 
-    __qualifiers = {}
+    __qualifiers = Qualifiers()
 
     @classmethod
-    def add_qual(cls, key, callback):
-        """Add a qualifier."""
+    def add_qual(cls, key, callback, ttl=None):
+        """
+        Add a qualifier.
 
-        if isinstance(key, str) and re.match(r"^[a-zA-Z][a-zA-Z\d_]*$", key) is None:
-            raise QualException("'%s' is not a valid function name." % key)
-        if not hasattr(callback, '__call__'):
-            raise QualException("Bad function callback.")
-        if key in cls.__qualifiers:
-            raise QualException("'%s' qualifier already exists." % key)
+        Results are cached for `ttl` seconds, until invalidated if `ttl` is `None`, or not at all if `ttl` is `0`.
+        """
 
-        cls.__qualifiers[key] = callback
+        cls.__qualifiers.add(key, callback, ttl)
 
     @classmethod
     def exists(cls, key):
         """See if qualifier exists."""
 
-        return (key in cls.__qualifiers)
+        return cls.__qualifiers.exists(key)
 
     @classmethod
-    def eval_qual(cls, key, value):
+    def eval_qual(cls, key, value, setting=None):
         """
         Evaluate the qualifier.
 
         See if key is in the qualifier list,
-        and if so, test the value.
+        and if so, test the value.  The result is recorded
+        as a dependency of the setting, if one is given.
         """
 
-        try:
-            return cls.__qualifiers[key](value)
-        except Exception:
-            raise QualException("Failed to execute %s qualifier" % key)
+        return cls.__qualifiers.evaluate(key, value, setting)
+
+    @classmethod
+    def track(cls, setting):
+        """Start tracking the qualifiers a setting is resolved with."""
+
+        cls.__qualifiers.track(setting)
+
+    @classmethod
+    def refresh(cls):
+        """Evaluate expired qualifiers and return the settings affected by the ones that changed."""
+
+        return cls.__qualifiers.refresh()
+
+    @classmethod
+    def next_expiry(cls):
+        """Get the monotonic time when the first cached qualifier that settings depend on expires, or `None`."""
+
+        return cls.__qualifiers.next_expiry()
+
+    @classmethod
+    def invalidate(cls, key=None, value=None):
+        """Drop cached qualifier results and return the settings affected by the ones that changed."""
+
+        return cls.__qualifiers.invalidate(key, value)
+
+    @classmethod
+    def add_listener(cls, callback):
+        """Call the callback with the affected settings when a cached qualifier changes."""
+
+        cls.__qualifiers.add_listener(callback)
+
+    @classmethod
+    def remove_listener(cls, callback):
+        """Remove a listener."""
+
+        cls.__qualifiers.remove_listener(callback)
 
 
 def _host_match(h):
     """Check if the host matches the input."""
 
-    return (h.lower() == __CURRENT_HOSTNAME)
+    return (h.lower() == get_hostname())
 
 
 def _os_match(os):
     """See if the OS platform matches the input."""
 
-    return (os == sublime.platform())
+    return (os == get_platform())
+
+
+def _project_match(marker):
+    """See if the marker exists in a folder of an open window."""
+
+    if sublime is None:
+        return False
+    for window in sublime.windows():
+        for folder in window.folders():
+            if os.path.exists(os.path.join(folder, marker)):
+                return True
+    return False
 
 
 Qualifications.add_qual("host", _host_match)
 Qualifications.add_qual("os", _os_match)
+Qualifications.add_qual("env", env_match, 30)
+Qualifications.add_qual("file", file_match, 10)
+Qualifications.add_qual("project", _project_match, 10)
+Qualifications.add_qual("time", time_match, 15)
@@ -0,0 +1,89 @@
+"""
+Schedule profiles.
+
+Each profile is its own `themes` list; the `themes` setting is the default profile.
+Profiles are compiled the first time they are used and kept, keyed by what they
+were compiled from, so switching back to a profile whose settings didn't change
+is just a swap of the compiled schedule.
+
+The active profile is saved to a small state file so it survives restarts without
+touching the settings (which would reload the plugin).
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import json
+import os
+import threading
+
+DEFAULT = 'normal'
+
+
+class Profiles(object):
+    """Active profile and compiled profiles."""
+
+    def __init__(self, path):
+        """Setup the profiles."""
+
+        self.path = path
+        self.compiled = {}
+        self.lock = threading.Lock()
+        self.active = self.read()
+
+    def read(self):
+        """Read the saved active profile."""
+
+        try:
+            with open(self.path, 'r') as f:
+                name = json.load(f).get("active")
+        except (OSError, ValueError, AttributeError):
+            return DEFAULT
+        return name if isinstance(name, str) and name else DEFAULT
+
+    def save(self):
+        """Save the active profile."""
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({"active": self.active}, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError:
+            return False
+        return True
+
+    def select(self, name):
+        """Make a profile the active one and save it; returns whether it changed."""
+
+        if name == self.active:
+            return False
+        self.active = name
+        self.save()
+        return True
+
+    def get(self, name, key):
+        """Get the compiled profile, `None` if it is missing or was compiled from other settings."""
+
+        with self.lock:
+            entry = self.compiled.get(name)
+            return entry[1] if entry is not None and entry[0] == key else None
+
+    def add(self, name, key, compiled):
+        """Keep a compiled profile with the key of the settings it was compiled from."""
+
+        with self.lock:
+            self.compiled[name] = (key, compiled)
+
+    def prune(self, names):
+        """Forget compiled profiles that no longer exist."""
+
+        with self.lock:
+            for name in list(self.compiled):
+                if name not in names:
+                    del self.compiled[name]
+
+    def clear(self):
+        """Forget all compiled profiles."""
+
+        with self.lock:
+            self.compiled.clear()
@@ -0,0 +1,222 @@
+"""
+Cached qualifiers.
+
+Qualifiers decide which value of a multiconf setting applies.  Each qualifier is
+registered with a TTL: `None` caches its results until they are invalidated, `0`
+disables caching.  The registry tracks which qualifiers each setting key was
+resolved with, so when a cached result flips, listeners are told exactly which
+keys need to be resolved again.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import os
+import re
+import threading
+import time
+
+RE_NAME = re.compile(r"^[a-zA-Z][a-zA-Z\d_]*$")
+RE_BAND = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+
+class QualException(Exception):
+    """Qualification exception."""
+
+    pass
+
+
+class Qualifiers(object):
+    """Qualifier registry with cached results."""
+
+    def __init__(self, clock=time.monotonic):
+        """Setup the registry."""
+
+        self.clock = clock
+        self.callbacks = {}
+        # `(name, value)` -> `(result, expires)`
+        self.cache = {}
+        # Setting key -> `(name, value)` pairs it was resolved with
+        self.depends = {}
+        self.listeners = []
+        self.lock = threading.RLock()
+
+    def add(self, name, callback, ttl=None):
+        """Add a qualifier."""
+
+        if not isinstance(name, str) or RE_NAME.match(name) is None:
+            raise QualException("'%s' is not a valid function name." % name)
+        if not hasattr(callback, '__call__'):
+            raise QualException("Bad function callback.")
+        if name in self.callbacks:
+            raise QualException("'%s' qualifier already exists." % name)
+        self.callbacks[name] = (callback, ttl)
+
+    def exists(self, name):
+        """See if qualifier exists."""
+
+        return name in self.callbacks
+
+    def call(self, name, value):
+        """Evaluate the qualifier without the cache."""
+
+        try:
+            return bool(self.callbacks[name][0](value))
+        except Exception:
+            raise QualException("Failed to execute %s qualifier" % name)
+
+    def store(self, pair, result, now):
+        """Cache a result according to the qualifier's TTL."""
+
+        ttl = self.callbacks[pair[0]][1]
+        if ttl != 0:
+            self.cache[pair] = (result, None if ttl is None else now + ttl)
+
+    def track(self, key):
+        """Start tracking the qualifiers a setting key is resolved with."""
+
+        with self.lock:
+            self.depends[key] = set()
+
+    def evaluate(self, name, value, key=None):
+        """Evaluate the qualifier, using the cached result if it hasn't expired."""
+
+        pair = (name, value)
+        flipped = False
+        with self.lock:
+            if key is not None:
+                self.depends.setdefault(key, set()).add(pair)
+            now = self.clock()
+            entry = self.cache.get(pair)
+            if entry is not None and (entry[1] is None or now < entry[1]):
+                return entry[0]
+            result = self.call(name, value)
+            self.store(pair, result, now)
+            flipped = entry is not None and entry[0] != result
+        if flipped:
+            self.notify([pair])
+        return result
+
+    def refresh(self):
+        """
+        Evaluate the expired results that settings depend on.
+
+        Returns the setting keys affected by results that flipped.
+        """
+
+        flipped = []
+        with self.lock:
+            now = self.clock()
+            pairs = set()
+            for deps in self.depends.values():
+                pairs |= deps
+            for pair in pairs:
+                entry = self.cache.get(pair)
+                if entry is None or entry[1] is None or now < entry[1]:
+                    continue
+                try:
+                    result = self.call(*pair)
+                except QualException:
+                    del self.cache[pair]
+                    continue
+                self.store(pair, result, now)
+                if result != entry[0]:
+                    flipped.append(pair)
+        return self.notify(flipped)
+
+    def next_expiry(self):
+        """Get when the first result that settings depend on expires, or `None`."""
+
+        with self.lock:
+            expiry = None
+            for deps in self.depends.values():
+                for pair in deps:
+                    entry = self.cache.get(pair)
+                    if entry is not None and entry[1] is not None and (expiry is None or entry[1] < expiry):
+                        expiry = entry[1]
+            return expiry
+
+    def invalidate(self, name=None, value=None):
+        """
+        Drop cached results of a qualifier (or all of them), evaluating again the ones settings depend on.
+
+        Returns the setting keys affected by results that flipped.
+        """
+
+        flipped = []
+        with self.lock:
+            now = self.clock()
+            pairs = set()
+            for deps in self.depends.values():
+                pairs |= deps
+            for pair, entry in list(self.cache.items()):
+                if (name is not None and pair[0] != name) or (value is not None and pair[1] != value):
+                    continue
+                del self.cache[pair]
+                if pair not in pairs:
+                    continue
+                try:
+                    result = self.call(*pair)
+                except QualException:
+                    continue
+                self.store(pair, result, now)
+                if result != entry[0]:
+                    flipped.append(pair)
+        return self.notify(flipped)
+
+    def notify(self, pairs):
+        """Tell the listeners which setting keys depend on the given results."""
+
+        if not pairs:
+            return set()
+        pairs = set(pairs)
+        with self.lock:
+            keys = set(key for key, deps in self.depends.items() if deps & pairs)
+            listeners = list(self.listeners)
+        if keys:
+            for listener in listeners:
+                listener(keys)
+        return keys
+
+    def add_listener(self, listener):
+        """Call the listener with the affected setting keys when a cached result flips."""
+
+        with self.lock:
+            if listener not in self.listeners:
+                self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener."""
+
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+
+def env_match(value):
+    """See if an environment variable is set (`NAME`) or has a given value (`NAME=value`)."""
+
+    name, sep, expected = value.partition('=')
+    actual = os.environ.get(name.strip())
+    return bool(actual) if not sep else actual == expected
+
+
+def file_match(value):
+    """See if a file or folder exists (`~` and environment variables are expanded)."""
+
+    return os.path.exists(os.path.expanduser(os.path.expandvars(value)))
+
+
+def time_match(value, now=None):
+    """See if the local time is within a band of the form `HH:MM-HH:MM` (bands can wrap past midnight)."""
+
+    m = RE_BAND.match(value)
+    if m is None:
+        raise ValueError("'%s' is not a valid time band" % value)
+    start = int(m.group(1)) * 60 + int(m.group(2))
+    end = int(m.group(3)) * 60 + int(m.group(4))
+    if now is None:
+        now = time.localtime()
+    minutes = now.tm_hour * 60 + now.tm_min
+    if start <= end:
+        return start <= minutes < end
+    return minutes >= start or minutes < end
@@ -0,0 +1,144 @@
+"""
+Schedule records.
+
+Generated schedules can have tens of thousands of entries, so records are kept
+compact: they are plain tuples without an instance dictionary, their strings
+are interned so every record using a color scheme, filter, or UI theme shares
+one string, and command objects are shared by every record with the same
+commands.
+
+Each record also carries a key of its output (color scheme, message, filters,
+and UI theme), so whether a change is needed is a single comparison, and
+records with the same output share one key.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import hashlib
+import json
+from collections import namedtuple
+from functools import lru_cache
+from sys import intern
+from .clock import format_time
+
+RECORD_FORMAT = (
+    'ThemeRecord(\n'
+    '    time=%s,\n'
+    '    theme=%s,\n'
+    '    msg=%s,\n'
+    '    filters=%s,\n'
+    '    ui_theme=%s,\n'
+    '    command=%s\n'
+    ')'
+)
+
+
+class ThemeRecord(
+    namedtuple('ThemeRecord', ["time", "theme", "msg", "filters", "ui_theme", "command", "key"], defaults=(None,))
+):
+    """Theme record tuple."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        """String representation of record."""
+
+        try:
+            return format_record(self)
+        except TypeError:
+            # Records with raw command settings can't be cached.
+            return format_record.__wrapped__(self)
+
+    __repr__ = __str__
+
+
+@lru_cache(maxsize=128)
+def format_record(record):
+    """Format a record, caching the result."""
+
+    return RECORD_FORMAT % (
+        format_time(record.time), record.theme, record.msg,
+        record.filters, record.ui_theme, record.command
+    )
+
+
+@lru_cache(maxsize=128)
+def fingerprint(record):
+    """Get a short hash of what a record applies (everything but its time)."""
+
+    content = json.dumps([str(value) if value is not None else None for value in record[1:6]])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+
+def output_key(theme, msg, filters, ui_theme):
+    """Get the key of what a record outputs; filters should be canonical."""
+
+    output = (theme, msg if isinstance(msg, str) else None, filters, ui_theme)
+    try:
+        return hash_output(output)
+    except TypeError:
+        # Outputs with invalid (unhashable) values can't be cached.
+        return hash_output.__wrapped__(output)
+
+
+@lru_cache(maxsize=1024)
+def hash_output(output):
+    """Hash an output tuple, caching the result as records mostly share a few outputs."""
+
+    content = json.dumps(list(output))
+    return intern(hashlib.sha1(content.encode('utf-8')).hexdigest()[:12])
+
+
+def is_noop(record, previous):
+    """Check if a record changes nothing when it follows another, like the scheduler decides when changing."""
+
+    return record.command is None and record.key is not None and record.key == previous.key
+
+
+def intern_value(value):
+    """Intern a string value."""
+
+    return intern(value) if isinstance(value, str) else value
+
+
+def freeze(value):
+    """Get a hashable key of a JSON value; the types are kept so `1` and `true` differ."""
+
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((k, freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (list, tuple(freeze(v) for v in value))
+    return (type(value), value)
+
+
+class SharedFactory(object):
+    """Create one object per distinct JSON value and share it between records."""
+
+    def __init__(self, factory):
+        """Setup the factory."""
+
+        self.factory = factory
+        self.cache = {}
+
+    def __call__(self, value):
+        """Get the object for the value."""
+
+        key = freeze(value)
+        obj = self.cache.get(key)
+        if obj is None:
+            obj = self.cache[key] = self.factory(value)
+        return obj
+
+
+def make_record(time, theme, msg, filters, ui_theme, command, commands=None, key=None):
+    """
+    Create a record with interned strings, creating its command object with the `commands` factory.
+
+    The output key is computed unless a precomputed `key` is given.
+    """
+
+    return ThemeRecord(
+        time, intern_value(theme), msg, intern_value(filters), intern_value(ui_theme),
+        commands(command) if command is not None and commands is not None else command,
+        intern(key) if key is not None else output_key(theme, msg, filters, ui_theme)
+    )
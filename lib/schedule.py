@@ -0,0 +1,258 @@
+"""
+Schedule index.
+
+Rules can be restricted to certain weekdays and/or date ranges.  For any
+calendar day, the rules that apply are compiled into a sorted list of change
+times which is cached, so finding the current or next change is a binary search.
+
+When rules of different specificity apply to the same day, only the most
+specific ones are used: date rules win over weekday rules, which win over
+rules that apply every day.
+
+Rules with a solar time (`sunset+00:30`) are resolved to a time of day by the
+schedule's resolver when the day is compiled.
+
+Changes that change nothing (say a rule that applies the same theme as the rule
+before it) can be collapsed when the day is compiled, so they are never
+scheduled.  The rule before the first one of a day is the last one of the
+previous day that has rules.  A day keeps its first change if all of them
+would be collapsed.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta, time as dtime
+
+WEEKDAYS = {
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'weekdays': (0, 1, 2, 3, 4), 'weekends': (5, 6)
+}
+
+# How far to look for a change when days have no rules.
+SEARCH_DAYS = 366
+
+# Number of compiled days to hold (previous, current and next day).
+CACHE_DAYS = 3
+
+
+class ScheduleException(Exception):
+    """Schedule exception."""
+
+    pass
+
+
+def parse_days(value):
+    """Parse a weekday name, or list of names, into a set of weekday numbers."""
+
+    if isinstance(value, str):
+        value = [value]
+    elif not isinstance(value, (list, tuple)):
+        raise ScheduleException("'%s' is not a valid weekday or list of weekdays." % str(value))
+    days = set()
+    for name in value:
+        day = WEEKDAYS.get(str(name).strip().lower())
+        if day is None:
+            raise ScheduleException("'%s' is not a valid weekday." % name)
+        days.update(day if isinstance(day, tuple) else (day,))
+    return frozenset(days)
+
+
+def parse_date(value):
+    """Parse `YYYY-MM-DD` or a yearly `MM-DD` into a `(year, month, day)` tuple."""
+
+    try:
+        if value.count('-') == 2:
+            d = datetime.strptime(value, '%Y-%m-%d')
+            return (d.year, d.month, d.day)
+        # Use a leap year so `02-29` is accepted.
+        d = datetime.strptime('2000-' + value, '%Y-%m-%d')
+        return (None, d.month, d.day)
+    except (ValueError, AttributeError):
+        raise ScheduleException("'%s' is not a valid date." % value)
+
+
+class DateRange(namedtuple('DateRange', ['start', 'end'])):
+    """Inclusive date range of `(year, month, day)` tuples."""
+
+    @classmethod
+    def parse(cls, value):
+        """Parse a single date or a `[start, end]` pair."""
+
+        if isinstance(value, str):
+            start = end = parse_date(value)
+        elif isinstance(value, (list, tuple)) and len(value) == 2:
+            start, end = parse_date(value[0]), parse_date(value[1])
+        else:
+            raise ScheduleException("'%s' is not a valid date range." % str(value))
+        if (start[0] is None) != (end[0] is None):
+            raise ScheduleException("Date range '%s' mixes yearly and absolute dates." % str(value))
+        return cls(start, end)
+
+    def matches(self, d):
+        """Check if the date falls within the range."""
+
+        if self.start[0] is not None:
+            return self.start <= (d.year, d.month, d.day) <= self.end
+        key = (d.month, d.day)
+        start, end = self.start[1:], self.end[1:]
+        # Yearly ranges may wrap around the end of the year.
+        return start <= key <= end if start <= end else (key >= start or key <= end)
+
+
+class Rule(namedtuple('Rule', ['record', 'days', 'dates', 'solar'])):
+    """A schedule record with optional weekday and date restrictions, and an optional solar time."""
+
+    @classmethod
+    def parse(cls, record, days=None, dates=None, solar=None):
+        """Create a rule from the raw `days` and `dates` setting values."""
+
+        if isinstance(dates, str):
+            dates = [dates]
+        elif dates is not None and not isinstance(dates, (list, tuple)):
+            raise ScheduleException("'%s' is not a valid date range or list of date ranges." % str(dates))
+        return cls(
+            record,
+            parse_days(days) if days is not None else None,
+            tuple(DateRange.parse(d) for d in dates) if dates is not None else None,
+            solar
+        )
+
+    @property
+    def tier(self):
+        """Specificity of the rule."""
+
+        return 2 if self.dates is not None else (1 if self.days is not None else 0)
+
+    def matches(self, d):
+        """Check if the rule applies to the given date."""
+
+        return (
+            (self.days is None or d.weekday() in self.days) and
+            (self.dates is None or any(r.matches(d) for r in self.dates))
+        )
+
+
+def day_seconds(now):
+    """Get the seconds since midnight."""
+
+    return now.hour * 3600 + now.minute * 60 + now.second
+
+
+class Schedule(object):
+    """Per calendar day index of schedule rules."""
+
+    def __init__(self, rules, resolver=None, noop=None):
+        """
+        Setup the index.
+
+        `resolver` is called with a rule's solar time and a date, and returns the
+        seconds since midnight, or `None` if the event does not occur that day.
+
+        `noop` is called with a record and the record before it, and returns whether
+        the record changes nothing, in which case it is collapsed.
+        """
+
+        self.rules = list(rules)
+        self.resolver = resolver
+        self.noop = noop
+        self.cache = {}
+
+    def get_records(self, d):
+        """Return the sorted records of the rules that apply to a calendar day."""
+
+        tier = -1
+        records = []
+        for rule in self.rules:
+            if not rule.matches(d):
+                continue
+            record = rule.record
+            if rule.solar is not None:
+                seconds = self.resolver(rule.solar, d) if self.resolver is not None else None
+                if seconds is None:
+                    continue
+                record = record._replace(time=seconds)
+            if rule.tier > tier:
+                tier = rule.tier
+                records = []
+            if rule.tier == tier:
+                records.append(record)
+        records.sort(key=lambda r: r.time)
+        return records
+
+    def get_previous(self, d):
+        """Return the last record before a calendar day."""
+
+        for offset in range(1, SEARCH_DAYS + 1):
+            day = d - timedelta(days=offset)
+            # A compiled day's last record is equivalent to the last one it collapsed.
+            entry = self.cache.get(day)
+            records = entry[1] if entry is not None else self.get_records(day)
+            if records:
+                return records[-1]
+        return None
+
+    def day(self, d):
+        """Return the sorted change times and matching records of a calendar day."""
+
+        entry = self.cache.get(d)
+        if entry is None:
+            records = self.get_records(d)
+            collapsed = 0
+            if self.noop is not None and records:
+                previous = self.get_previous(d)
+                kept = []
+                for record in records:
+                    if previous is not None and self.noop(record, previous):
+                        collapsed += 1
+                        continue
+                    kept.append(record)
+                    previous = record
+                if not kept:
+                    # When every rule is the same, something still has to be scheduled.
+                    kept.append(records[0])
+                    collapsed -= 1
+                records = kept
+            entry = ([r.time for r in records], records, collapsed)
+            if len(self.cache) >= CACHE_DAYS:
+                self.cache.clear()
+            self.cache[d] = entry
+        return entry
+
+    def collapsed(self, d):
+        """Return how many changes of a calendar day were collapsed."""
+
+        return self.day(d)[2]
+
+    def next_change(self, now):
+        """Return the `datetime` and record of the next change after `now`."""
+
+        today = now.date()
+        times, records = self.day(today)[:2]
+        index = bisect_right(times, day_seconds(now))
+        if index < len(times):
+            return datetime.combine(today, dtime()) + timedelta(seconds=times[index]), records[index]
+
+        for offset in range(1, SEARCH_DAYS + 1):
+            d = today + timedelta(days=offset)
+            times, records = self.day(d)[:2]
+            if times:
+                return datetime.combine(d, dtime()) + timedelta(seconds=times[0]), records[0]
+        return None, None
+
+    def current(self, now):
+        """Return the record that is in effect at `now`."""
+
+        today = now.date()
+        times, records = self.day(today)[:2]
+        index = bisect_right(times, day_seconds(now))
+        if index:
+            return records[index - 1]
+
+        for offset in range(1, SEARCH_DAYS + 1):
+            times, records = self.day(today - timedelta(days=offset))[:2]
+            if times:
+                return records[-1]
+        return None
@@ -0,0 +1,163 @@
+"""
+Solar schedule.
+
+Sunrise and sunset are calculated offline with the NOAA solar equations.  The
+events of a whole year are calculated at once and stored as a compact array of
+UTC minutes that is cached on disk keyed by location and year.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+import os
+import re
+from array import array
+from calendar import isleap
+from datetime import date, timedelta
+from math import acos, cos, degrees, pi, radians, sin, tan
+from .clock import DAY, EPOCH_ORDINAL, local_offset
+
+RE_SOLAR = re.compile(r'^\s*(sunrise|sunset)\s*(?:([+-])\s*(\d{1,2}):(\d{2}))?\s*$', re.I)
+
+SUNRISE = 0
+SUNSET = 1
+EVENTS = {'sunrise': SUNRISE, 'sunset': SUNSET}
+
+# Marks days where the sun does not rise or set.
+NO_EVENT = -32768
+
+# Zenith of sunrise/sunset accounting for refraction and the solar disc.
+ZENITH = radians(90.833)
+
+
+def parse_solar(value):
+    """
+    Parse a solar time like `sunset+00:30`.
+
+    Returns `(event, offset_seconds)`, or `None` if the value is not a solar time.
+    """
+
+    m = RE_SOLAR.match(value)
+    if m is None:
+        return None
+    offset = int(m.group(3) or 0) * 3600 + int(m.group(4) or 0) * 60
+    return EVENTS[m.group(1).lower()], -offset if m.group(2) == '-' else offset
+
+
+def sun_events(latitude, longitude, day):
+    """Calculate the sunrise and sunset of a date in UTC minutes, or `NO_EVENT`."""
+
+    gamma = 2 * pi / (366 if isleap(day.year) else 365) * (day.timetuple().tm_yday - 1)
+    eqtime = 229.18 * (
+        0.000075 + 0.001868 * cos(gamma) - 0.032077 * sin(gamma) -
+        0.014615 * cos(2 * gamma) - 0.040849 * sin(2 * gamma)
+    )
+    decl = (
+        0.006918 - 0.399912 * cos(gamma) + 0.070257 * sin(gamma) - 0.006758 * cos(2 * gamma) +
+        0.000907 * sin(2 * gamma) - 0.002697 * cos(3 * gamma) + 0.00148 * sin(3 * gamma)
+    )
+    lat = radians(latitude)
+    cos_ha = cos(ZENITH) / (cos(lat) * cos(decl)) - tan(lat) * tan(decl)
+    if not -1 <= cos_ha <= 1:
+        return NO_EVENT, NO_EVENT
+    ha = degrees(acos(cos_ha))
+    return (
+        int(round(720 - 4 * (longitude + ha) - eqtime)),
+        int(round(720 - 4 * (longitude - ha) - eqtime))
+    )
+
+
+class SolarTable(object):
+    """Sunrise and sunset of every day in a year."""
+
+    def __init__(self, latitude, longitude, year, cache_dir=None):
+        """Load the table from the cache, or calculate it."""
+
+        self.latitude = round(latitude, 2)
+        self.longitude = round(longitude, 2)
+        self.year = year
+        self.days = 366 if isleap(year) else 365
+        self.cache_file = os.path.join(
+            cache_dir, 'solar_%+.2f_%+.2f_%d.bin' % (self.latitude, self.longitude, year)
+        ) if cache_dir else None
+        self.table = self.load()
+        if self.table is None:
+            self.table = self.calculate()
+            self.save()
+
+    def calculate(self):
+        """Calculate the events of the year."""
+
+        table = array('h')
+        day = date(self.year, 1, 1)
+        for _ in range(self.days):
+            table.extend(sun_events(self.latitude, self.longitude, day))
+            day += timedelta(days=1)
+        return table
+
+    def load(self):
+        """Load the table from the cache file."""
+
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return None
+        table = array('h')
+        try:
+            with open(self.cache_file, 'rb') as f:
+                table.fromfile(f, self.days * 2)
+        except (OSError, EOFError):
+            return None
+        return table
+
+    def save(self):
+        """Save the table to the cache file."""
+
+        if self.cache_file is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file + '.tmp', 'wb') as f:
+                self.table.tofile(f)
+            os.replace(self.cache_file + '.tmp', self.cache_file)
+        except OSError:
+            pass
+
+    def event(self, event, day):
+        """Get the event of a date in UTC minutes, or `None` if it does not occur."""
+
+        minutes = self.table[(day.timetuple().tm_yday - 1) * 2 + event]
+        return None if minutes == NO_EVENT else minutes
+
+
+class Solar(object):
+    """Resolve solar times into local seconds since midnight."""
+
+    def __init__(self, latitude, longitude, cache_dir=None):
+        """Setup location."""
+
+        self.latitude = latitude
+        self.longitude = longitude
+        self.cache_dir = cache_dir
+        self.tables = {}
+
+    def table(self, year):
+        """Get the table of a year."""
+
+        table = self.tables.get(year)
+        if table is None:
+            table = SolarTable(self.latitude, self.longitude, year, self.cache_dir)
+            self.tables[year] = table
+        return table
+
+    def resolve(self, solar, day):
+        """
+        Get the local seconds since midnight of an `(event, offset)` on a date, or `None`.
+
+        An offset that moves the event past midnight is clamped to the date, as the
+        rule's weekdays and dates apply to the date of the event.
+        """
+
+        event, offset = solar
+        minutes = self.table(day.year).event(event, day)
+        if minutes is None:
+            return None
+        ts = (day.toordinal() - EPOCH_ORDINAL) * DAY + minutes * 60
+        return min(max((ts + local_offset(ts)) % DAY + offset, 0), DAY - 1)
@@ -0,0 +1,66 @@
+"""
+Preference transactions.
+
+Preference changes are staged and then applied in one pass, skipping keys that
+already have the staged value (every `set` can trigger a redraw).  Extra steps
+run after the preferences are set, and if anything fails, the preferences are
+rolled back to their previous values.
+
+Licensed under MIT
+Copyright (c) 2012 - 2026 Isaac Muse <isaacmuse@gmail.com>
+"""
+from collections import OrderedDict
+
+
+class Transaction(object):
+    """Staged preference changes."""
+
+    def __init__(self, settings):
+        """Setup the settings object (anything with `get`, `set` and `erase`)."""
+
+        self.settings = settings
+        self.staged = OrderedDict()
+        self.steps = []
+
+    def stage(self, key, value):
+        """Stage a preference, `None` leaves the preference alone."""
+
+        if value is not None:
+            self.staged[key] = value
+
+    def add_step(self, step):
+        """Add a step to run once the preferences are set."""
+
+        self.steps.append(step)
+
+    def commit(self):
+        """
+        Apply the staged preferences and run the steps.
+
+        Returns the keys that were changed.  On failure, the changed keys are
+        restored and the exception is raised again.
+        """
+
+        previous = OrderedDict()
+        try:
+            for key, value in self.staged.items():
+                old = self.settings.get(key)
+                if old == value:
+                    continue
+                previous[key] = old
+                self.settings.set(key, value)
+            for step in self.steps:
+                step()
+        except Exception:
+            self.rollback(previous)
+            raise
+        return list(previous)
+
+    def rollback(self, previous):
+        """Restore the previous preference values."""
+
+        for key, value in previous.items():
+            if value is None:
+                self.settings.erase(key)
+            else:
+                self.settings.set(key, value)
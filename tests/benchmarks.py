@@ -0,0 +1,422 @@
+"""
+Benchmarks.
+
+Run all benchmarks with `python -m tests.benchmarks`, or select some by name:
+`python -m tests.benchmarks comments`.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(fn):
+    """Register a benchmark."""
+
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def measure(fn):
+    """Run a function and return its result, the time it took, and its peak memory in MiB."""
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024.0 * 1024.0)
+
+
+@benchmark
+def comments(size=8):
+    """Compare stripping a multi-megabyte file at once to streaming it."""
+
+    from lib.file_strip.comments import Comments
+
+    block = (
+        '{\n'
+        '    // Line comment\n'
+        '    "theme": "Packages/User/Color Scheme/theme.tmTheme", /* block comment */\n'
+        '    "filters": "brightness(.98)@bg // not a comment",\n'
+        '    "time": "21:30",\n'
+        '},\n'
+    )
+    folder = tempfile.mkdtemp()
+    try:
+        file_name = os.path.join(folder, 'comments.json')
+        with open(file_name, 'w') as f:
+            f.write(block * (size * 1024 * 1024 // len(block)))
+        megabytes = os.path.getsize(file_name) / (1024.0 * 1024.0)
+
+        def strip():
+            with open(file_name, 'r') as f:
+                return len(Comments('json').strip(f.read()))
+
+        def stream():
+            with open(file_name, 'r') as f:
+                return sum(len(chunk) for chunk in Comments('json').strip_stream(f))
+
+        print('Input: %.1f MiB' % megabytes)
+        for name, fn in (('strip', strip), ('strip_stream', stream)):
+            length, elapsed, peak = measure(fn)
+            print(
+                '%-14s %.3fs  %6.1f MiB/s  peak %7.2f MiB  (%d chars)' % (
+                    name, elapsed, megabytes / elapsed, peak, length
+                )
+            )
+    finally:
+        shutil.rmtree(folder)
+
+
+@benchmark
+def clock(ticks=200000):
+    """Compare the per-tick cost of the old naive time check to the deadline check."""
+
+    from datetime import datetime, timedelta
+    from lib.clock import Deadline, to_wall, format_time
+
+    def total_seconds(t):
+        return (t.microseconds + (t.seconds + t.days * 24 * 3600) * 10 ** 6) / 10 ** 6
+
+    next_time = datetime.now() + timedelta(days=1)
+    deadline = Deadline(int(time.time()) + 86400)
+
+    def naive():
+        due = 0
+        for _ in range(ticks):
+            now = datetime.now()
+            total_seconds(timedelta(hours=now.hour, minutes=now.minute, seconds=now.second))
+            due += now >= next_time
+        return due
+
+    def monotonic():
+        due = 0
+        for _ in range(ticks):
+            due += deadline.due(time.monotonic(), time.time())
+        return due
+
+    def wall():
+        return sum(to_wall(int(time.time())) % 86400 for _ in range(ticks))
+
+    def sec2time():
+        for total in range(ticks):
+            total %= 86400
+            t_minutes = (total / 60)
+            "%02d:%02d:%02d" % (t_minutes / 60, t_minutes % 60, total % 60)
+
+    def formatted():
+        for total in range(ticks):
+            format_time(total % 86400)
+
+    for name, fn in (
+        ('naive tick', naive), ('deadline tick', monotonic), ('local wall', wall),
+        ('sec2time', sec2time), ('format_time', formatted)
+    ):
+        _, elapsed, peak = measure(fn)
+        print('%-14s %7.3f us/call  peak %7.3f MiB' % (name, elapsed / ticks * 1e6, peak))
+
+
+@benchmark
+def records(count=100000):
+    """Compare the memory of a large schedule's records before and after compaction."""
+
+    import gc
+    import json
+    from collections import namedtuple
+    from lib.records import SharedFactory, make_record
+
+    class LegacyRecord(namedtuple('LegacyRecord', ["time", "theme", "msg", "filters", "ui_theme", "command"])):
+        pass
+
+    class Command(object):
+        def __init__(self, command):
+            self.command = command
+
+    # A generated schedule, loaded from JSON like the compiled schedule cache.
+    content = json.dumps(
+        [
+            {
+                "time": i % 86400,
+                "theme": "Packages/Color Scheme - Default/Scheme %d.sublime-color-scheme" % (i % 8),
+                "msg": None,
+                "filters": "brightness(.%d)@bg" % (90 + i % 5),
+                "ui_theme": "Default Dark.sublime-theme" if i % 2 else "Default.sublime-theme",
+                "command": {"command": "toggle_%d" % (i % 4)} if i % 3 == 0 else None
+            } for i in range(count)
+        ]
+    )
+
+    def legacy():
+        return [
+            LegacyRecord(
+                e["time"], e["theme"], e["msg"], e["filters"], e["ui_theme"],
+                Command(e["command"]) if e["command"] is not None else None
+            ) for e in json.loads(content)
+        ]
+
+    def compact():
+        commands = SharedFactory(Command)
+        return [
+            make_record(e["time"], e["theme"], e["msg"], e["filters"], e["ui_theme"], e["command"], commands)
+            for e in json.loads(content)
+        ]
+
+    for name, fn in (('namedtuple', legacy), ('compact', compact)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            '%-14s %.3fs  retained %7.2f MiB  (%d records)' % (
+                name, elapsed, retained / (1024.0 * 1024.0), len(result)
+            )
+        )
+        del result
+
+
+class SimulatedTime(object):
+    """
+    Simulated clock and `set_timeout` queue.
+
+    `time.time` and `time.monotonic` are replaced while it is installed, and timers
+    run in order of their due time, advancing the clock, when the queue is run.
+    """
+
+    def __init__(self):
+        """Setup the clock."""
+
+        self.now = float(int(time.time()))
+        self.timers = []
+        self.count = 0
+        self.patched = None
+
+    def install(self):
+        """Replace the clock functions."""
+
+        self.patched = (time.time, time.monotonic)
+        time.time = time.monotonic = lambda: self.now
+
+    def uninstall(self):
+        """Restore the clock functions."""
+
+        time.time, time.monotonic = self.patched
+
+    def set_timeout(self, callback, ms=0):
+        """Queue a callback."""
+
+        import heapq
+
+        self.count += 1
+        heapq.heappush(self.timers, (self.now + ms / 1000.0, self.count, callback))
+
+    def run(self, until):
+        """Run the callbacks that are due by `until`, then move the clock to `until`."""
+
+        import heapq
+
+        while self.timers and self.timers[0][0] <= until:
+            due, _, callback = heapq.heappop(self.timers)
+            self.now = max(self.now, due)
+            callback()
+        self.now = until
+
+
+def load_plugin(clock):
+    """Import the plugin with a `sublime` API that only schedules on the simulated clock."""
+
+    import importlib
+    import types
+
+    sublime = types.ModuleType('sublime')
+    sublime.Settings = type('Settings', (dict,), {
+        'set': dict.__setitem__,
+        'erase': lambda self, key: self.pop(key, None),
+        'add_on_change': lambda self, key, callback: None,
+        'clear_on_change': lambda self, key: None
+    })
+    settings = {}
+    sublime.set_timeout = sublime.set_timeout_async = clock.set_timeout
+    sublime.load_settings = lambda name: settings.setdefault(name, sublime.Settings())
+    sublime.find_resources = lambda pattern: []
+    sublime.cache_path = sublime.packages_path = tempfile.gettempdir
+    sublime.platform = lambda: sys.platform
+    sublime.active_window = lambda: None
+    sublime.windows = list
+    sublime_plugin = types.ModuleType('sublime_plugin')
+    for name in ('ApplicationCommand', 'EventListener', 'TextCommand', 'WindowCommand'):
+        setattr(sublime_plugin, name, type(name, (object,), {}))
+    sublime_plugin.application_command_classes = []
+    sys.modules['sublime'] = sublime
+    sys.modules['sublime_plugin'] = sublime_plugin
+
+    # The plugin uses relative imports, so the package folder is imported as a package.
+    package = types.ModuleType('ThemeScheduler')
+    package.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    sys.modules['ThemeScheduler'] = package
+    return importlib.import_module('ThemeScheduler.ThemeScheduler')
+
+
+@benchmark
+def scheduler(span=86400, period=900):
+    """
+    Compare the CPU time and wakeups of the scheduler thread to the chained timers.
+
+    The plugin's `TsThread` and `TimerScheduler` run on a simulated clock and
+    `set_timeout` queue, so a simulated day takes a moment.  A change is due every
+    `period` seconds; running one only moves the deadline on.
+    """
+
+    clock = SimulatedTime()
+    clock.install()
+    try:
+        plugin = load_plugin(clock)
+        from ThemeScheduler.lib.clock import Deadline
+
+        class Change(object):
+            """Run changes by moving the deadline on."""
+
+            changes = 0
+
+            def execute(self, code, now=None):
+                """Run the operation."""
+
+                scheduler = plugin.ThemeScheduler
+                if code == self.INIT:
+                    scheduler.ready = True
+                    scheduler.next_deadline = Deadline(clock.now + period)
+                elif code == self.CHANGE:
+                    self.changes += 1
+                    scheduler.next_deadline = Deadline(scheduler.next_deadline.epoch + period)
+
+        class Thread(Change, plugin.TsThread):
+            """Scheduler thread run on the simulated clock."""
+
+            wakeups = 0
+
+            def wait(self, seconds):
+                """Run the main thread until the next tick."""
+
+                self.wakeups += 1
+                clock.run(clock.now + seconds)
+                if clock.now >= end:
+                    self.stopped.set()
+                return self.stopped.is_set()
+
+        class Timer(Change, plugin.TimerScheduler):
+            """Timer scheduler."""
+
+        def run_thread():
+            worker = Thread('ThemeSchedulerBenchmark')
+            worker.run()
+            return worker
+
+        def run_timer():
+            worker = Timer('ThemeSchedulerBenchmark')
+            worker.start()
+            clock.run(end)
+            worker.stop()
+            return worker
+
+        for name, fn in (('thread', run_thread), ('timer', run_timer)):
+            plugin.ThemeScheduler.ready = False
+            plugin.ThemeScheduler.next_deadline = None
+            clock.timers = []
+            end = clock.now + span
+            cpu = time.process_time()
+            worker = fn()
+            cpu = time.process_time() - cpu
+            print('%-14s cpu %7.3f ms  wakeups %5d  changes %d' % (name, cpu * 1000, worker.wakeups, worker.changes))
+    finally:
+        clock.uninstall()
+
+
+# Modules the plugin imports where they are first used, instead of when it is imported.
+LAZY = (
+    'lib.compiler', 'lib.coordination', 'lib.file_strip.json', 'lib.includes', 'lib.journal', 'lib.records', 'lib.solar'
+)
+
+
+def start_plugin(eager=False):
+    """
+    Import the plugin and load it until its schedule is ready, and print the seconds each took.
+
+    Meant to run in a fresh interpreter, so nothing is imported yet.  With `eager`, the modules the plugin
+    imports lazily are imported with it, as they were before.
+    """
+
+    import importlib
+
+    clock = SimulatedTime()
+    folder = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        plugin = load_plugin(clock)
+        if eager:
+            for name in LAZY:
+                importlib.import_module('ThemeScheduler.' + name)
+            # The host name was also looked up on import.
+            importlib.import_module('ThemeScheduler.lib.multiconf').get_hostname()
+        imported = time.perf_counter()
+
+        import sublime
+
+        sublime.cache_path = sublime.packages_path = lambda: folder
+        sublime.load_settings('ThemeScheduler.sublime-settings').update(
+            enabled=True, scheduler_mode='timer', themes=[{"time": "0:00", "theme": "Default.sublime-color-scheme"}]
+        )
+        plugin.plugin_loaded()
+        # Let the plugin retry for the plugins it waits for, and wait for the schedule to compile.
+        for _ in range(60):
+            if plugin.ThemeScheduler.ready:
+                break
+            clock.run(clock.now + 1)
+            for thread in threading.enumerate():
+                # Timers only flush the history.
+                if thread is not threading.current_thread() and not isinstance(thread, threading.Timer):
+                    thread.join()
+        loaded = time.perf_counter()
+        plugin.plugin_unloaded()
+    finally:
+        shutil.rmtree(folder)
+    print('%f %f' % (imported - start, loaded - imported))
+
+
+@benchmark
+def startup(runs=10):
+    """Compare importing and loading the plugin with its lazy imports to importing everything up front."""
+
+    import subprocess
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name, eager in (('lazy', False), ('eager', True)):
+        timings = []
+        for _ in range(runs):
+            output = subprocess.check_output(
+                [sys.executable, '-c', 'from tests.benchmarks import start_plugin; start_plugin(%r)' % eager],
+                cwd=root,
+                universal_newlines=True
+            )
+            timings.append([float(t) for t in output.split()[-2:]])
+        imported, loaded = (sorted(t)[len(t) // 2] for t in zip(*timings))
+        print(
+            '%-14s import %7.2f ms  plugin_loaded %7.2f ms  (median of %d)' % (
+                name, imported * 1000, loaded * 1000, runs
+            )
+        )
+
+
+if __name__ == "__main__":
+    for name in (sys.argv[1:] or list(BENCHMARKS)):
+        print('=== %s ===' % name)
+        BENCHMARKS[name]()
@@ -0,0 +1,147 @@
+"""Test DST handling of the clock."""
+import unittest
+from collections import namedtuple
+from datetime import date, datetime, timezone
+from lib.clock import (
+    DAY, EPOCH_ORDINAL, Deadline, format_time, next_deadline, parse_time, to_instant, to_wall,
+    wall_datetime, zone_offset
+)
+from lib.schedule import Rule, Schedule
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+Record = namedtuple('Record', ['time', 'name'])
+
+# Zone, transition day, and the size of the shift in seconds (positive for a gap, negative for an overlap).
+TRANSITIONS = [
+    ('America/New_York', date(2026, 3, 8), 3600),
+    ('America/New_York', date(2026, 11, 1), -3600),
+    ('Europe/London', date(2026, 3, 29), 3600),
+    ('Europe/London', date(2026, 10, 25), -3600),
+    ('Australia/Sydney', date(2026, 10, 4), 3600),
+    ('Australia/Sydney', date(2026, 4, 5), -3600),
+    # Half hour shifts.
+    ('Australia/Lord_Howe', date(2026, 10, 4), 1800),
+    ('Australia/Lord_Howe', date(2026, 4, 5), -1800),
+    # Transitions at midnight.
+    ('America/Santiago', date(2026, 9, 6), 3600),
+    ('America/Santiago', date(2026, 4, 4), -3600),
+]
+
+
+def utc(*args):
+    """Get the epoch instant of a UTC time."""
+
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def midnight(d):
+    """Get the local wall seconds of midnight."""
+
+    return (d.toordinal() - EPOCH_ORDINAL) * DAY
+
+
+@unittest.skipIf(ZoneInfo is None, "zoneinfo is not available")
+class TestClock(unittest.TestCase):
+    """Test DST handling of the clock."""
+
+    def offset(self, name):
+        """Get the offset function of a zone."""
+
+        try:
+            return zone_offset(ZoneInfo(name))
+        except Exception:  # pragma: no cover
+            self.skipTest("time zone data is not available")
+
+    def test_gap(self):
+        """Test that skipped wall times resolve to the moment the clock jumps."""
+
+        offset = self.offset('America/New_York')
+        jump = utc(2026, 3, 8, 7)
+        wall = midnight(date(2026, 3, 8))
+        self.assertEqual(to_instant(wall + parse_time('02:00'), offset), jump)
+        self.assertEqual(to_instant(wall + parse_time('02:30'), offset), jump)
+        self.assertEqual(to_instant(wall + parse_time('03:00'), offset), jump)
+        self.assertEqual(to_instant(wall + parse_time('01:59:59'), offset), jump - 1)
+
+    def test_overlap(self):
+        """Test that repeated wall times resolve to the first occurrence, and the clock holds on the second pass."""
+
+        offset = self.offset('America/New_York')
+        wall = midnight(date(2026, 11, 1))
+        self.assertEqual(to_instant(wall + parse_time('01:30'), offset), utc(2026, 11, 1, 5, 30))
+        self.assertEqual(to_wall(utc(2026, 11, 1, 5, 30), offset), wall + parse_time('01:30'))
+        # Second pass of 01:30 holds at the end of the first pass.
+        self.assertEqual(to_wall(utc(2026, 11, 1, 6, 30), offset), wall + parse_time('01:59:59'))
+        self.assertEqual(to_wall(utc(2026, 11, 1, 7), offset), wall + parse_time('02:00'))
+
+    def test_matrix(self):
+        """Test every quarter hour of transition days in several zones."""
+
+        for name, d, shift in TRANSITIONS:
+            with self.subTest(zone=name, day=d):
+                offset = self.offset(name)
+                start = midnight(d) - DAY
+                # Make sure the data has the transition.
+                self.assertEqual(offset(to_instant(start + 2 * DAY, offset)) - offset(to_instant(start, offset)), shift)
+                last = None
+                for wall in range(start, start + 3 * DAY, 900):
+                    ts = to_instant(wall, offset)
+                    if last is not None:
+                        self.assertGreaterEqual(ts, last)
+                    last = ts
+                    # Wall times that exist round trip.
+                    if ts + offset(ts) == wall:
+                        self.assertEqual(to_wall(ts, offset), wall)
+                last = None
+                for ts in range(to_instant(start, offset), to_instant(start + 3 * DAY, offset), 60):
+                    wall = to_wall(ts, offset)
+                    if last is not None:
+                        self.assertGreaterEqual(wall, last)
+                    last = wall
+
+    def test_fire_once(self):
+        """Test that a simulated loop fires every change exactly once, in order, across transitions."""
+
+        records = [Record(seconds, format_time(seconds)) for seconds in range(0, DAY, 900)]
+        for name, d, _ in TRANSITIONS:
+            with self.subTest(zone=name, day=d):
+                offset = self.offset(name)
+                schedule = Schedule([Rule.parse(r) for r in records])
+                start = to_instant(midnight(d) - DAY // 2, offset)
+                end = to_instant(midnight(d) + DAY + DAY // 2, offset)
+                fired = []
+                when, record, epoch = next_deadline(schedule, start, offset)
+                for ts in range(start, end, 60):
+                    while epoch is not None and ts >= epoch:
+                        fired.append(ts)
+                        when, record, epoch = next_deadline(schedule, ts, offset)
+                        # The change applied is one that is already due.
+                        wall = to_wall(ts, offset)
+                        current = schedule.current(wall_datetime(wall))
+                        self.assertLessEqual(to_instant(wall - wall % DAY + current.time, offset), ts)
+                walls = range(midnight(d) - DAY // 2 + 900, midnight(d) + DAY + DAY // 2, 900)
+                expected = sorted(set(to_instant(wall, offset) for wall in walls))
+                # Every change fires once at its instant; changes in a gap all fire once at the jump.
+                self.assertEqual(fired, [ts for ts in expected if ts < end])
+
+    def test_deadline(self):
+        """Test monotonic deadlines."""
+
+        deadline = Deadline(1000, now=990, monotonic=50.0)
+        self.assertFalse(deadline.due(59.0, 999))
+        self.assertTrue(deadline.due(60.0, 999))
+        # Wall clock catches up after a suspend.
+        self.assertTrue(deadline.due(51.0, 1000))
+
+    def test_time_strings(self):
+        """Test time parsing and formatting."""
+
+        self.assertEqual(parse_time('21:30'), 77400)
+        self.assertEqual(format_time(77400), '21:30:00')
+        self.assertEqual(format_time(parse_time('07:05:09')), '07:05:09')
+        with self.assertRaises(ValueError):
+            parse_time('25:00')
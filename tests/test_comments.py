@@ -0,0 +1,98 @@
+"""Test comment stripping."""
+import io
+import unittest
+from lib.file_strip.comments import Comments
+
+CPP = r'''/* Header
+ * comment */
+int a = 1; // trailing
+char *s = "a // not a comment \" /* still not */";
+char c = '/';  /* block */ int b = a / 2;
+// one
+    // two
+"unclosed /* string
+'''
+
+PYTHON = r'''"""Docstring # not a comment"""
+a = 1  # comment
+b = '# not a comment' # comment
+c = """one""" # comment
+d = """two"""
+# comment
+e = 'unclosed # string
+'''
+
+JSON = r'''{
+    // comment
+    "a": "// not a comment", /* block
+    comment */ "b": [1, 2], "c": '/' // end
+}
+/* unclosed'''
+
+
+class TestStreamComments(unittest.TestCase):
+    """Test that streaming gives the same result as stripping all at once."""
+
+    def check(self, style, text):
+        """Compare streaming with several chunk sizes to `strip`."""
+
+        for preserve_lines in (False, True):
+            comments = Comments(style, preserve_lines)
+            expected = comments.strip(text)
+            for size in (1, 2, 3, 5, 8, 64, len(text)):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                self.assertEqual(''.join(comments.strip_stream(chunks)), expected, (style, size, preserve_lines))
+            self.assertEqual(''.join(comments.strip_stream(io.StringIO(text), 7)), expected)
+
+    def test_styles(self):
+        """Test all registered styles."""
+
+        for style in ('c', 'cpp', 'css'):
+            self.check(style, CPP)
+        self.check('python', PYTHON)
+        self.check('json', JSON)
+
+    def test_escaped_quotes(self):
+        """Test unclosed strings that end on an escaped quote."""
+
+        for text in ('\'/\\\']#*\'\\}\n}"#,', "'a\\' # b\n'c", "x = '\\\\' # a\n'\\' # b"):
+            self.check('python', text)
+            self.check('cpp', text)
+
+    def test_incremental(self):
+        """Test that output is produced before the input ends."""
+
+        stream = Comments('json').strip_stream(iter(['{"a": 1, // comment\n', '"b": 2}\n']))
+        self.assertEqual(next(stream), '{"a": 1, ')
+
+    def test_split_code(self):
+        """Test code split between chunks, also where whitespace leads a comment."""
+
+        for text in ('a = b / c    // d\n  e /* f */', 'x = 1      # y\nz = "/"  /'):
+            self.check('python', text)
+            self.check('cpp', text)
+            self.check('json', text)
+
+    def test_large_code(self):
+        """Test that code without any delimiters is streamed instead of held until the input ends."""
+
+        chunk = 'a = 1; b = 2; c = 3; d = 4;\n' * 4096
+        read = []
+
+        def chunks():
+            """Read the chunks, counting them."""
+
+            for _ in range(64):
+                read.append(chunk)
+                yield chunk
+
+        stream = Comments('json').strip_stream(chunks())
+        first = next(stream)
+        self.assertEqual(len(read), 1)
+        self.assertGreater(len(first), len(chunk) - 8)
+        self.assertEqual(first + ''.join(stream), chunk * 64)
+
+    def test_python_triple_quotes(self):
+        """Test that comments between triple quoted strings are stripped."""
+
+        self.assertEqual(Comments('python').strip('"""a""" # b\n"""c"""'), '"""a"""\n"""c"""')
@@ -0,0 +1,130 @@
+"""Test the offline schedule compiler."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from lib.cli import compile_files
+from lib.compiler import compile_rules, load_entries
+from lib.multiconf import simulate
+
+
+class TestCompiler(unittest.TestCase):
+    """Test the offline schedule compiler."""
+
+    def setUp(self):
+        """Setup settings folder."""
+
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove settings folder and simulated qualifiers."""
+
+        shutil.rmtree(self.folder)
+        simulate()
+
+    def write(self, name, settings):
+        """Write a settings file with a comment."""
+
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write('// Settings\n' + json.dumps(settings))
+        return path
+
+    def test_compile(self):
+        """Test that invalid rules are reported and skipped."""
+
+        errors = []
+        entries = compile_rules(
+            [
+                {"time": "8:00", "theme": "a.sublime-color-scheme", "filters": "glow(.1)"},
+                {"time": "sunset", "theme": "b.sublime-color-scheme"},
+                {"time": "25:00", "theme": "b.sublime-color-scheme"},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "days": "someday"},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "days": 5},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "projects": 3},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "projects": ["a", 3]},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "windows": {}},
+                {"time": "9:00", "theme": "b.sublime-color-scheme", "projects": "a", "windows": "b"},
+                {"theme": "b.sublime-color-scheme"},
+                {"time": "10:00", "theme": "c.sublime-color-scheme", "filters": "glow"}
+            ],
+            False,
+            lambda resource: not resource.startswith('c'),
+            errors.append
+        )
+        self.assertEqual(len(errors), 10)
+        self.assertEqual([(e["time"], e["theme"], e["filters"]) for e in entries], [
+            (28800, "a.sublime-color-scheme", "glow(0.1)"), (36000, None, None)
+        ])
+        themes, schedule, scoped = load_entries(json.loads(json.dumps(entries)))
+        self.assertEqual(len(themes), 2)
+        self.assertEqual(scoped, [])
+
+    def test_scoped(self):
+        """Test that rules scoped to projects or windows form their own schedules."""
+
+        entries = compile_rules(
+            [
+                {"time": "8:00", "theme": "a.sublime-color-scheme"},
+                {"time": "8:00", "theme": "b.sublime-color-scheme", "projects": "incident-*"},
+                {"time": "8:00", "theme": "c.sublime-color-scheme", "windows": "incident"},
+                {"time": "20:00", "theme": "d.sublime-color-scheme", "windows": ["incident"]}
+            ],
+            False
+        )
+        themes, schedule, scoped = load_entries(json.loads(json.dumps(entries)))
+        self.assertEqual([r.theme for r in themes], ["a.sublime-color-scheme"])
+        self.assertEqual([scope for scope, _ in scoped], [("projects", ("incident-*",)), ("windows", ("incident",))])
+        self.assertEqual(len(scoped[1][1].rules), 2)
+
+    def test_files(self):
+        """Test compiling files with simulated qualifiers."""
+
+        themes = [
+            {"time": "8:00", "theme": "a.sublime-color-scheme"},
+            {"time": "12:00", "theme": "a.sublime-color-scheme"},
+            {"time": "20:00", "theme": "b.sublime-color-scheme", "command": {"command": "foo"}}
+        ]
+        paths = [
+            self.write(
+                'ThemeScheduler.sublime-settings',
+                {"themes": {"#multiconf#": [{"os:windows;host:work": themes}, {"os:linux": themes[:1]}]}}
+            ),
+            os.path.join(self.folder, 'missing.sublime-settings')
+        ]
+        reports = compile_files(paths, start=date(2026, 10, 19), days=2, platform='windows', host='Work', jobs=1)
+        self.assertEqual(reports[0]["errors"], [])
+        self.assertEqual(
+            [c["at"] for c in reports[0]["timeline"]],
+            ["2026-10-19 08:00:00", "2026-10-19 20:00:00", "2026-10-20 08:00:00", "2026-10-20 20:00:00"]
+        )
+        self.assertEqual(reports[0]["stats"]["collapsed"], 2)
+        self.assertEqual(reports[0]["stats"]["commands"], 2)
+        self.assertEqual(len(reports[1]["errors"]), 1)
+        self.assertEqual(len(compile_files(paths[:1], platform='linux')[0]["timeline"]), 1)
+
+    def test_bad_file(self):
+        """Test that a file that fails to compile is reported without aborting the others."""
+
+        paths = [
+            self.write('bad.sublime-settings', {"themes": {"#multiconf#": [{"time:bad": []}]}}),
+            self.write('good.sublime-settings', {"themes": [{"time": "8:00", "theme": "a"}]})
+        ]
+        reports = compile_files(paths, start=date(2026, 10, 19), jobs=2)
+        self.assertEqual(len(reports[0]["errors"]), 1)
+        self.assertEqual(reports[1]["errors"], [])
+        self.assertEqual(len(reports[1]["timeline"]), 1)
+
+    def test_include(self):
+        """Test that included rules are layered under the settings' rules."""
+
+        self.write('base.json', [{"time": "8:00", "theme": "a"}, {"time": "20:00", "theme": "b"}])
+        path = self.write(
+            'ThemeScheduler.sublime-settings',
+            {"include": ["base.json"], "themes": [{"time": "20:00", "theme": "c"}]}
+        )
+        report = compile_files([path], start=date(2026, 10, 19))[0]
+        self.assertEqual([c["theme"] for c in report["timeline"]], ["a", "c"])
+        self.assertEqual(report["stats"]["includes"], 1)
@@ -0,0 +1,85 @@
+"""Test coordination of multiple instances."""
+import multiprocessing
+import shutil
+import tempfile
+import time
+import unittest
+from lib.coordination import Coordinator
+
+
+def contend(folder, barrier, results, hold):
+    """Try to become the leader at the same time as the other processes."""
+
+    coordinator = Coordinator(folder, lease=hold * 2)
+    barrier.wait()
+    leader = coordinator.acquire()
+    results.put(leader)
+    if leader:
+        coordinator.publish({"theme": "leader"})
+        # Hold leadership while the others try.
+        time.sleep(hold)
+        coordinator.release()
+
+
+def abandon(folder):
+    """Become the leader and exit without releasing the lock."""
+
+    Coordinator(folder).acquire()
+
+
+class TestCoordination(unittest.TestCase):
+    """Test coordination of multiple instances."""
+
+    def setUp(self):
+        """Setup shared folder."""
+
+        self.folder = tempfile.mkdtemp()
+        self.context = multiprocessing.get_context('spawn')
+
+    def tearDown(self):
+        """Remove shared folder."""
+
+        shutil.rmtree(self.folder)
+
+    def test_single_leader(self):
+        """Test that only one of several processes becomes the leader."""
+
+        count = 4
+        barrier = self.context.Barrier(count)
+        results = self.context.Queue()
+        processes = [
+            self.context.Process(target=contend, args=(self.folder, barrier, results, 1.0)) for _ in range(count)
+        ]
+        for p in processes:
+            p.start()
+        leaders = [results.get(timeout=30) for _ in range(count)]
+        for p in processes:
+            p.join(30)
+        self.assertEqual(leaders.count(True), 1)
+
+        follower = Coordinator(self.folder)
+        self.assertEqual(follower.poll(), {"theme": "leader"})
+        self.assertIsNone(follower.poll())
+        # The leader released the lock.
+        self.assertTrue(follower.acquire())
+
+    def test_stale_lease(self):
+        """Test that a lock abandoned by a dead process is taken over after the lease expires."""
+
+        p = self.context.Process(target=abandon, args=(self.folder,))
+        p.start()
+        p.join(30)
+
+        follower = Coordinator(self.folder, lease=0.5)
+        self.assertFalse(follower.acquire())
+        time.sleep(1)
+        self.assertTrue(follower.acquire())
+        self.assertTrue(follower.acquire())
+
+    def test_publish_own_state(self):
+        """Test that an instance doesn't pick up its own state."""
+
+        leader = Coordinator(self.folder)
+        self.assertTrue(leader.acquire())
+        leader.publish({"theme": "a"})
+        self.assertIsNone(leader.poll())
@@ -0,0 +1,36 @@
+"""Test filter strings."""
+import unittest
+from lib.filters import FilterException, canonicalize
+
+
+class TestFilters(unittest.TestCase):
+    """Test filter strings."""
+
+    def test_equivalent(self):
+        """Test that equivalent filter strings are canonicalized the same."""
+
+        self.assertEqual(canonicalize("brightness(.98)@bg"), "brightness(0.98)@bg")
+        self.assertEqual(canonicalize(" Brightness( 0.980 ) @BG ;"), "brightness(0.98)@bg")
+        self.assertEqual(canonicalize("brightness(1.0);glow(.1)"), "brightness(1);glow(0.1)")
+        self.assertEqual(canonicalize("grayscale();invert@fg"), "grayscale;invert@fg")
+        self.assertEqual(canonicalize("tint(#FF0000 + 20)"), "tint(#ff0000+20)")
+        self.assertEqual(canonicalize("glow(1e-5);brightness(-0.0)"), "glow(0.00001);brightness(0)")
+        self.assertEqual(canonicalize("hue(120.50)"), "hue(120.5)")
+
+    def test_order(self):
+        """Test that the order of the filters is kept."""
+
+        self.assertEqual(canonicalize("glow(.1);brightness(.9)"), "glow(0.1);brightness(0.9)")
+
+    def test_empty(self):
+        """Test that no filters are `None`."""
+
+        self.assertIsNone(canonicalize(None))
+        self.assertIsNone(canonicalize(" ; "))
+
+    def test_invalid(self):
+        """Test that invalid filters are reported."""
+
+        for filters in ("brightness", "brightness(bright)", "brightness(nan)", "sepia(1)", "glow(.1", "a b", 3, []):
+            with self.assertRaises(FilterException):
+                canonicalize(filters)
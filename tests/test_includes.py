@@ -0,0 +1,91 @@
+"""Test schedule includes."""
+import os
+import shutil
+import tempfile
+import unittest
+from lib.compiler import compile_rules
+from lib.includes import IncludeCache, merge, resolve_path
+
+
+class TestIncludes(unittest.TestCase):
+    """Test schedule includes."""
+
+    def setUp(self):
+        """Setup include folder."""
+
+        self.folder = tempfile.mkdtemp()
+        self.compiled = []
+
+    def tearDown(self):
+        """Remove include folder."""
+
+        shutil.rmtree(self.folder)
+
+    def write(self, name, content):
+        """Write an include."""
+
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def compiler(self, rules, report):
+        """Compile rules, counting compilations."""
+
+        self.compiled.append(len(rules))
+        return compile_rules(rules, False, None, report)
+
+    def test_cached(self):
+        """Test that includes are only parsed and compiled again when they change."""
+
+        cache = IncludeCache()
+        base = self.write('base.json', '// Base\n[{"time": "8:00", "theme": "a"}, {"time": "20:00", "theme": "b"},]')
+        other = self.write('other.json', '{"themes": [{"time": "12:00", "theme": "c"}]}')
+        for _ in range(2):
+            for path in (base, other):
+                cache.compile_includes(path, None, self.compiler)
+        self.assertEqual((cache.parsed, self.compiled), (2, [2, 1]))
+
+        self.write('other.json', '{"themes": [{"time": "12:00", "theme": "c"}, {"time": "13:00", "theme": "d"}]}')
+        for path in (base, other):
+            cache.compile_includes(path, None, self.compiler)
+        self.assertEqual((cache.parsed, self.compiled), (3, [2, 1, 2]))
+
+    def test_bounded(self):
+        """Test that the cache holds a limited number of includes."""
+
+        cache = IncludeCache(max_includes=2)
+        paths = [self.write('%d.json' % i, '[]') for i in range(3)]
+        for path in paths:
+            cache.get(path)
+        self.assertEqual(list(cache.includes), paths[1:])
+
+    def test_errors(self):
+        """Test that problems are reported every time."""
+
+        cache = IncludeCache()
+        bad = self.write('bad.json', '[{"time": "25:00"}]')
+        for _ in range(2):
+            errors = []
+            self.assertEqual(cache.compile_includes(bad, None, self.compiler, errors.append), [])
+            self.assertEqual(len(errors), 1)
+            errors = []
+            cache.compile_includes(os.path.join(self.folder, 'missing.json'), None, self.compiler, errors.append)
+            self.assertEqual(len(errors), 1)
+        self.assertEqual(self.compiled, [1, 0])
+
+    def test_merge(self):
+        """Test that rules replace included rules with the same time, days, dates, and projects."""
+
+        base = compile_rules(
+            [{"time": "8:00", "theme": "a"}, {"time": "8:00", "theme": "b", "days": "weekends"}], False
+        )
+        own = compile_rules([{"time": "8:00", "theme": "c"}, {"time": "9:00", "theme": "d"}], False)
+        self.assertEqual([e["theme"] for e in merge([base, own])], ["c", "b", "d"])
+
+    def test_path(self):
+        """Test that relative paths are relative to the base folder."""
+
+        expected = os.path.join(self.folder, 'shared', 'base.json')
+        self.assertEqual(resolve_path('shared/base.json', self.folder), expected)
+        self.assertEqual(resolve_path('/etc/base.json', self.folder), os.path.normpath('/etc/base.json'))
@@ -0,0 +1,69 @@
+"""Test the journal of schedule changes."""
+import os
+import shutil
+import tempfile
+import unittest
+from lib.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    """Test the journal of schedule changes."""
+
+    def setUp(self):
+        """Setup journal folder."""
+
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove journal folder."""
+
+        shutil.rmtree(self.folder)
+
+    def test_buffered(self):
+        """Test that entries are written when flushed."""
+
+        journal = Journal(self.folder, flush_delay=None)
+        journal.write("apply", 100, 101, "abc")
+        self.assertFalse(os.path.exists(journal.get_path()))
+        journal.flush()
+        self.assertEqual(list(journal.query()), [{"e": "apply", "s": 100, "a": 101, "f": "abc"}])
+
+    def test_timer(self):
+        """Test that entries are flushed in the background."""
+
+        journal = Journal(self.folder, flush_delay=0.01)
+        journal.write("apply", actual=1)
+        timer = journal.timer
+        timer.join(5)
+        self.assertEqual([e["a"] for e in journal.query()], [1])
+
+    def test_query(self):
+        """Test time range queries."""
+
+        journal = Journal(self.folder, flush_delay=None)
+        for actual in range(0, 10000, 10):
+            journal.write("apply", actual, actual, "%x" % actual)
+        journal.flush()
+        with open(journal.get_path(), 'a') as f:
+            f.write('{"damaged\n')
+        self.assertEqual([e["a"] for e in journal.query(95, 140)], [100, 110, 120, 130, 140])
+        self.assertEqual([e["a"] for e in journal.query(0, 0)], [0])
+        self.assertEqual([e["a"] for e in journal.query(9985)], [9990])
+        self.assertEqual(list(journal.query(20000)), [])
+        self.assertEqual(len(list(journal.query())), 1000)
+
+    def test_rotate(self):
+        """Test that the journal is rotated and queried across files."""
+
+        journal = Journal(self.folder, max_bytes=2048, backups=2, flush_delay=None)
+        for actual in range(1000):
+            journal.write("skip", actual=actual)
+            if actual % 10 == 9:
+                journal.flush()
+        self.assertTrue(os.path.exists(journal.get_path(2)))
+        self.assertFalse(os.path.exists(journal.get_path(3)))
+        self.assertLessEqual(os.path.getsize(journal.get_path(1)), 2048 + 1024)
+        actual = [e["a"] for e in journal.query()]
+        # The oldest entries were rotated away, the rest is in order.
+        self.assertEqual(actual, list(range(actual[0], 1000)))
+        self.assertEqual([e["a"] for e in journal.query(990, 995)], list(range(990, 996)))
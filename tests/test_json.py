@@ -3,18 +3,21 @@ import unittest
 from . import validate_json_format
 import os
 import fnmatch
+import shutil
+import tempfile
 
 
 class TestSettings(unittest.TestCase):
     """Test JSON settings."""
 
-    def _get_json_files(self, pattern, folder='.'):
+    def _get_json_files(self, patterns, folder='.'):
         """Get JSON files."""
 
         for root, dirnames, filenames in os.walk(folder):
-            for filename in fnmatch.filter(filenames, pattern):
-                yield os.path.join(root, filename)
-            dirnames[:] = [d for d in dirnames if d not in ('.svn', '.git', '.tox')]
+            for pattern in patterns:
+                for filename in fnmatch.filter(filenames, pattern):
+                    yield os.path.join(root, filename)
+            dirnames[:] = [d for d in dirnames if d not in ('.svn', '.git', '.tox', '.pytest_cache')]
 
     def test_json_settings(self):
         """Test each JSON file."""
@@ -28,9 +31,97 @@ class TestSettings(unittest.TestCase):
             '*.sublime-color-scheme'
         )
 
-        for pattern in patterns:
-            for f in self._get_json_files(pattern):
-                self.assertFalse(
-                    validate_json_format.CheckJsonFormat(False, True).check_format(f),
-                    "%s does not comform to expected format!" % f
-                )
+        failures = validate_json_format.check_files(list(self._get_json_files(patterns)), False, True)
+        self.assertFalse(
+            failures,
+            '\n'.join(
+                "%s does not comform to expected format!\n%s" % (f, '\n'.join(failures[f])) for f in sorted(failures)
+            )
+        )
+
+
+class TestCheckJsonFormat(unittest.TestCase):
+    """Test the JSON format checker."""
+
+    def test_failures(self):
+        """Test that comments and dangling commas are found on the right lines."""
+
+        checker = validate_json_format.CheckJsonFormat(False, False, quiet=True)
+        text = '{\n    // Comment\n    "a": [1, 2,\n        // Comment\n    ],\n    "b": 1,\n}\n'
+        self.assertTrue(checker.check_text(text))
+        self.assertEqual(
+            checker.messages,
+            [
+                'E1: Line 2 - Comments are not part of the JSON spec.',
+                'E2: Line 3 - Dangling comma found.',
+                'E1: Line 4 - Comments are not part of the JSON spec.',
+                'E2: Line 6 - Dangling comma found.'
+            ]
+        )
+
+    def test_pass(self):
+        """Test that valid content passes."""
+
+        checker = validate_json_format.CheckJsonFormat(False, True, quiet=True)
+        self.assertFalse(checker.check_text('{\n    /* Comment */\n    "a": "//,]"\n}\n'))
+
+
+class TestFormatCache(unittest.TestCase):
+    """Test the cache of files that passed the check."""
+
+    VALID = '{\n    "a": 12\n}\n'
+    INVALID = '{\n    "a": 1,\n}\n'
+
+    def setUp(self):
+        """Setup a folder for the files and the cache."""
+
+        self.folder = tempfile.mkdtemp()
+        self.cache = os.path.join(self.folder, 'cache.json')
+        self.file_name = os.path.join(self.folder, 'test.sublime-settings')
+
+    def tearDown(self):
+        """Remove the folder."""
+
+        shutil.rmtree(self.folder)
+
+    def write(self, text, stat=None):
+        """Write the file, keeping the modification time of an earlier `stat` if given."""
+
+        with open(self.file_name, 'w') as f:
+            f.write(text)
+        if stat is not None:
+            os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def check(self, **kwargs):
+        """Check the file with the cache."""
+
+        return validate_json_format.check_files([self.file_name], cache=self.cache, jobs=1, **kwargs)
+
+    def test_hit(self):
+        """Test that a file that passed is skipped while its modification time and size are unchanged."""
+
+        self.write(self.VALID)
+        self.assertFalse(self.check())
+        # Same size and modification time, so the invalid content isn't checked.
+        self.write(self.INVALID, os.stat(self.file_name))
+        self.assertFalse(self.check())
+        self.assertTrue(validate_json_format.check_files([self.file_name], jobs=1))
+
+    def test_miss(self):
+        """Test that a changed file, or a check with other options, is checked again."""
+
+        self.write(self.VALID)
+        self.assertFalse(self.check())
+        self.assertTrue(validate_json_format.FormatCache(self.cache).is_current(self.file_name))
+        self.assertFalse(validate_json_format.FormatCache(self.cache, allow_comments=True).is_current(self.file_name))
+        self.write(self.INVALID + ' ')
+        self.assertIn(self.file_name, self.check())
+        self.assertNotIn(self.file_name, validate_json_format.FormatCache(self.cache).entries)
+
+    def test_content(self):
+        """Test that a file that was only touched is skipped by its content hash."""
+
+        self.write(self.VALID)
+        self.assertFalse(self.check())
+        os.utime(self.file_name, ns=(0, 0))
+        self.assertTrue(validate_json_format.FormatCache(self.cache).is_current(self.file_name))
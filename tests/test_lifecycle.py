@@ -0,0 +1,291 @@
+"""Test the worker lifecycle."""
+import gc
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from lib.lifecycle import Lifecycle, Pending, TimerWorker, Worker
+from .benchmarks import SimulatedTime, load_plugin
+
+NAME = 'TestScheduler'
+
+
+class Scheduler(Worker):
+    """Worker that ticks like the scheduler."""
+
+    def run(self):
+        """Tick until stopped."""
+
+        while not self.wait(0.01):
+            pass
+
+
+class Timer(object):
+    """Worker without a thread."""
+
+    def __init__(self, name):
+        """Setup the worker."""
+
+        self.name = name
+        self.alive = False
+
+    def start(self):
+        """Start the worker."""
+
+        self.alive = True
+
+    def stop(self):
+        """Stop the worker."""
+
+        self.alive = False
+
+    def is_alive(self):
+        """Check if the worker is running."""
+
+        return self.alive
+
+
+class Changer(TimerWorker):
+    """Timer that hands a due change to a main queue, like the scheduler."""
+
+    def __init__(self, name):
+        """Setup the timer and the queues."""
+
+        self.timers = []
+        self.main = []
+        self.due = True
+        self.changes = 0
+        self.pending = Pending()
+        TimerWorker.__init__(self, name, lambda callback, ms: self.timers.append((callback, ms)))
+
+    def tick(self, monotonic, epoch):
+        """Hand the change to the main queue if it is due."""
+
+        if self.due and self.pending.add('change'):
+            self.main.append(self.change)
+
+    def change(self):
+        """Run the change on the main queue."""
+
+        self.changes += 1
+        self.due = False
+        self.pending.done('change')
+        self.wake()
+
+    def get_delay(self):
+        """Get the delay, a due change only waits for the main queue."""
+
+        return 0.0 if self.due and 'change' not in self.pending else 60.0
+
+
+def live():
+    """Count the live workers."""
+
+    return sum(1 for t in threading.enumerate() if t.name == NAME)
+
+
+class TestLifecycle(unittest.TestCase):
+    """Test the worker lifecycle."""
+
+    def test_idempotent(self):
+        """Test that starting and stopping more than once is harmless."""
+
+        lifecycle = Lifecycle(NAME)
+        worker = lifecycle.start(Scheduler)
+        self.assertIs(lifecycle.start(Scheduler), worker)
+        self.assertEqual(live(), 1)
+        lifecycle.stop()
+        lifecycle.stop()
+        self.assertEqual(live(), 0)
+        self.assertFalse(lifecycle.running())
+
+    def test_orphans(self):
+        """Test that a worker left behind by a reloaded module is stopped."""
+
+        Lifecycle(NAME).start(Scheduler)
+        lifecycle = Lifecycle(NAME)
+        lifecycle.start(Scheduler)
+        self.assertEqual(live(), 1)
+        lifecycle.stop()
+        self.assertEqual(live(), 0)
+
+    def test_threadless(self):
+        """Test that a threadless worker left behind by a reloaded module is stopped."""
+
+        timer = Lifecycle(NAME).start(Timer)
+        lifecycle = Lifecycle(NAME)
+        lifecycle.start(Scheduler)
+        self.assertFalse(timer.alive)
+        timer = lifecycle.restart(Timer)
+        self.assertEqual(live(), 0)
+        Lifecycle(NAME).stop()
+        self.assertFalse(timer.alive)
+
+    def test_wake(self):
+        """Test that waking a worker cuts its wait short without stopping it."""
+
+        worker = Worker(NAME)
+        worker.wake()
+        self.assertFalse(worker.wait(5))
+        worker.stop()
+        self.assertTrue(worker.wait(5))
+
+    def test_stress(self):
+        """Test that load, settings change, and unload cycles don't leak threads or memory."""
+
+        baseline = threading.active_count()
+
+        def cycle():
+            # A reload creates the lifecycle anew, the old module's globals are gone.
+            lifecycle = Lifecycle(NAME)
+            lifecycle.start(Scheduler)
+            lifecycle.restart(Scheduler)
+            self.assertEqual(live(), 1)
+            lifecycle.stop()
+
+        for _ in range(100):
+            cycle()
+        gc.collect()
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(1000):
+            cycle()
+            if i % 2:
+                # Unload skipped, the next load has to clean up.
+                Lifecycle(NAME).start(Scheduler)
+        Lifecycle(NAME).stop()
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        self.assertEqual(threading.active_count(), baseline)
+        self.assertLess(growth, 64 * 1024)
+
+    def test_in_flight(self):
+        """Test that a due change is handed over once while the main queue is busy."""
+
+        timer = Changer(NAME)
+        timer.start()
+        for _ in range(5):
+            callback, ms = timer.timers.pop()
+            self.assertFalse(timer.timers)
+            callback()
+        self.assertEqual(ms, 60000)
+        self.assertEqual(len(timer.main), 1)
+        timer.main.pop()()
+        self.assertEqual(timer.changes, 1)
+        self.assertEqual(timer.timers[-1][1], 60000)
+        # The timer armed before the change is superseded.
+        timer.timers.pop(0)[0]()
+        self.assertEqual(timer.wakeups, 5)
+        timer.stop()
+        timer.timers.pop()[0]()
+        self.assertFalse(timer.timers)
+        self.assertEqual(timer.wakeups, 5)
+
+
+class TestPlugin(unittest.TestCase):
+    """Test the plugin's own load, enable, disable, and unload sequence with a stub `sublime`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Import the plugin, keeping the modules the stub replaces."""
+
+        cls.modules = {name: sys.modules.get(name) for name in ('sublime', 'sublime_plugin')}
+        cls.clock = SimulatedTime()
+        cls.plugin = load_plugin(cls.clock)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Put back the modules the stub replaced."""
+
+        for name, module in cls.modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    def setUp(self):
+        """Setup the settings and a folder for the plugin's files."""
+
+        self.folder = tempfile.mkdtemp()
+        sublime = self.plugin.sublime
+        sublime.cache_path = sublime.packages_path = lambda: self.folder
+        self.settings = sublime.load_settings('ThemeScheduler.sublime-settings')
+        self.settings.update(enabled=True, themes=[{"time": "0:00", "theme": "Scheduled.sublime-color-scheme"}])
+        self.preferences = sublime.load_settings('Preferences.sublime-settings')
+
+    def tearDown(self):
+        """Unload the plugin and remove its files."""
+
+        self.plugin.plugin_unloaded()
+        self.plugin.ThemeScheduler.profiles = None
+        self.settings.clear()
+        self.preferences.clear()
+        shutil.rmtree(self.folder)
+
+    def run_main(self, seconds=5):
+        """Run the main thread queue, waiting for the threads it starts, until the schedule is ready."""
+
+        for _ in range(seconds):
+            self.clock.run(self.clock.now + 1)
+            for thread in threading.enumerate():
+                # Schedulers run until stopped, and timers only flush the history.
+                if (
+                    thread is not threading.current_thread() and
+                    not isinstance(thread, (self.plugin.Worker, threading.Timer))
+                ):
+                    thread.join()
+            if self.plugin.ThemeScheduler.ready:
+                break
+
+    def check_stopped(self):
+        """Assert no scheduler is left running and the schedule is no longer ready."""
+
+        self.assertFalse(self.plugin.LIFECYCLE.running())
+        self.assertFalse(self.plugin.ThemeScheduler.ready)
+        self.assertFalse([t for t in threading.enumerate() if t.name == 'ThemeScheduler' and t.is_alive()])
+
+    def test_cycles(self):
+        """Test load, enable and disable, and unload cycles in both scheduler modes."""
+
+        for i in range(20):
+            self.settings['scheduler_mode'] = 'timer' if i % 2 else 'thread'
+            self.settings['enabled'] = True
+            self.plugin.plugin_loaded()
+            self.run_main()
+            self.assertTrue(self.plugin.ThemeScheduler.ready)
+            self.assertTrue(self.plugin.LIFECYCLE.running())
+            self.assertEqual(self.preferences.get('color_scheme'), 'Scheduled.sublime-color-scheme')
+
+            self.settings['enabled'] = False
+            self.plugin.manage_thread()
+            self.check_stopped()
+            self.settings['enabled'] = True
+            self.plugin.manage_thread()
+            self.run_main()
+            self.assertTrue(self.plugin.ThemeScheduler.ready)
+
+            if i % 3:
+                self.plugin.plugin_unloaded()
+                self.check_stopped()
+            # Otherwise the unload is skipped, and the next load replaces the running scheduler.
+        self.plugin.plugin_unloaded()
+        self.check_stopped()
+
+    def test_disable_while_loading(self):
+        """Test that a schedule that finishes compiling after the plugin was disabled is not applied."""
+
+        self.settings['scheduler_mode'] = 'timer'
+        self.plugin.plugin_loaded()
+        # Retry for the plugins it waits for, until the compile is started.
+        while self.plugin.ThemeScheduler.generation == 0:
+            self.clock.run(self.clock.now + 0.1)
+        self.settings['enabled'] = False
+        self.plugin.manage_thread()
+        self.run_main()
+        self.plugin.ThemeScheduler.request_reload()
+        self.run_main()
+        self.check_stopped()
+        self.assertIsNone(self.preferences.get('color_scheme'))
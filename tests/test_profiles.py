@@ -0,0 +1,52 @@
+"""Test schedule profiles."""
+import os
+import shutil
+import tempfile
+import unittest
+from lib.profiles import Profiles, DEFAULT
+
+
+class TestProfiles(unittest.TestCase):
+    """Test schedule profiles."""
+
+    def setUp(self):
+        """Setup state folder."""
+
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'ThemeScheduler', 'profile.json')
+
+    def tearDown(self):
+        """Remove state folder."""
+
+        shutil.rmtree(self.folder)
+
+    def test_persist(self):
+        """Test that the active profile survives a restart."""
+
+        profiles = Profiles(self.path)
+        self.assertEqual(profiles.active, DEFAULT)
+        self.assertTrue(profiles.select("focus"))
+        self.assertFalse(profiles.select("focus"))
+        self.assertEqual(Profiles(self.path).active, "focus")
+
+    def test_damaged(self):
+        """Test that a damaged state file falls back to the default profile."""
+
+        os.makedirs(os.path.dirname(self.path))
+        for content in ('{"active', '[]', '{"active": 3}'):
+            with open(self.path, 'w') as f:
+                f.write(content)
+            self.assertEqual(Profiles(self.path).active, DEFAULT)
+
+    def test_compiled(self):
+        """Test that compiled profiles are only used while their settings don't change."""
+
+        profiles = Profiles(self.path)
+        self.assertIsNone(profiles.get("focus", "a"))
+        profiles.add("focus", "a", 1)
+        self.assertEqual(profiles.get("focus", "a"), 1)
+        self.assertIsNone(profiles.get("focus", "b"))
+        profiles.add("focus", "b", 2)
+        self.assertEqual(profiles.get("focus", "b"), 2)
+        profiles.prune([DEFAULT])
+        self.assertIsNone(profiles.get("focus", "b"))
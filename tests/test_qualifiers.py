@@ -0,0 +1,128 @@
+"""Test cached qualifiers."""
+import os
+import time
+import unittest
+from lib.qualifiers import Qualifiers, QualException, env_match, time_match
+
+
+class Clock(object):
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        """Setup time."""
+
+        self.now = 0.0
+
+    def __call__(self):
+        """Get time."""
+
+        return self.now
+
+
+class TestQualifiers(unittest.TestCase):
+    """Test cached qualifiers."""
+
+    def setUp(self):
+        """Setup registry with a counted qualifier."""
+
+        self.clock = Clock()
+        self.state = {"dark": True}
+        self.calls = 0
+        self.changes = []
+
+        def mode(value):
+            self.calls += 1
+            return self.state[value]
+
+        self.qualifiers = Qualifiers(self.clock)
+        self.qualifiers.add("mode", mode, 10)
+        self.qualifiers.add_listener(self.changes.append)
+
+    def test_ttl(self):
+        """Test that results are cached until the TTL expires."""
+
+        for _ in range(3):
+            self.assertTrue(self.qualifiers.evaluate("mode", "dark", "themes"))
+        self.assertEqual(self.calls, 1)
+        self.clock.now = 10
+        self.assertTrue(self.qualifiers.evaluate("mode", "dark", "themes"))
+        self.assertEqual(self.calls, 2)
+
+    def test_next_expiry(self):
+        """Test when the next refresh is needed."""
+
+        self.assertIsNone(self.qualifiers.next_expiry())
+        self.clock.now = 5
+        self.qualifiers.evaluate("mode", "dark", "themes")
+        self.assertEqual(self.qualifiers.next_expiry(), 15)
+
+    def test_refresh(self):
+        """Test that a flip only reports the keys that depend on it."""
+
+        self.state["light"] = False
+        self.qualifiers.evaluate("mode", "dark", "themes")
+        self.qualifiers.evaluate("mode", "light", "idle_time")
+        self.state["dark"] = False
+
+        # Not expired yet.
+        self.assertEqual(self.qualifiers.refresh(), set())
+        self.clock.now = 10
+        self.assertEqual(self.qualifiers.refresh(), {"themes"})
+        self.assertEqual(self.changes, [{"themes"}])
+        self.assertFalse(self.qualifiers.evaluate("mode", "dark"))
+
+    def test_invalidate(self):
+        """Test that invalidation evaluates the qualifier again without waiting for the TTL."""
+
+        self.qualifiers.evaluate("mode", "dark", "themes")
+        self.state["dark"] = False
+        self.assertEqual(self.qualifiers.invalidate("mode"), {"themes"})
+        self.assertEqual(self.calls, 2)
+        # Nothing changed this time.
+        self.assertEqual(self.qualifiers.invalidate(), set())
+
+    def test_track(self):
+        """Test that keys only depend on the qualifiers of their last resolution."""
+
+        self.state["light"] = True
+        self.qualifiers.evaluate("mode", "dark", "themes")
+        self.qualifiers.track("themes")
+        self.qualifiers.evaluate("mode", "light", "themes")
+        self.state["dark"] = False
+        self.assertEqual(self.qualifiers.invalidate("mode", "dark"), set())
+
+    def test_errors(self):
+        """Test registration and evaluation errors."""
+
+        with self.assertRaises(QualException):
+            self.qualifiers.add("mode", bool)
+        with self.assertRaises(QualException):
+            self.qualifiers.add("1bad", bool)
+        with self.assertRaises(QualException):
+            self.qualifiers.evaluate("mode", "missing")
+
+    def test_env(self):
+        """Test environment qualifier."""
+
+        os.environ["THEME_SCHEDULER_TEST"] = "dark"
+        try:
+            self.assertTrue(env_match("THEME_SCHEDULER_TEST"))
+            self.assertTrue(env_match("THEME_SCHEDULER_TEST=dark"))
+            self.assertFalse(env_match("THEME_SCHEDULER_TEST=light"))
+        finally:
+            del os.environ["THEME_SCHEDULER_TEST"]
+        self.assertFalse(env_match("THEME_SCHEDULER_TEST"))
+
+    def test_time(self):
+        """Test time band qualifier."""
+
+        def at(hour, minute):
+            return time.struct_time((2026, 1, 1, hour, minute, 0, 3, 1, -1))
+
+        self.assertTrue(time_match("08:00-18:00", at(8, 0)))
+        self.assertFalse(time_match("08:00-18:00", at(18, 0)))
+        self.assertTrue(time_match("22:00-06:00", at(23, 30)))
+        self.assertTrue(time_match("22:00-06:00", at(5, 59)))
+        self.assertFalse(time_match("22:00-06:00", at(12, 0)))
+        with self.assertRaises(ValueError):
+            time_match("noon")
@@ -0,0 +1,55 @@
+"""Test compact schedule records."""
+import json
+import unittest
+from lib.records import SharedFactory, ThemeRecord, fingerprint, make_record
+
+
+class TestRecords(unittest.TestCase):
+    """Test compact schedule records."""
+
+    def test_compact(self):
+        """Test that records have no instance dictionary."""
+
+        record = ThemeRecord(0, "a.sublime-color-scheme", None, None, None, None)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record._replace(time=60).time, 60)
+
+    def test_shared(self):
+        """Test that strings and commands are shared between records."""
+
+        entries = json.loads(
+            json.dumps(
+                [
+                    {"theme": "a.sublime-color-scheme", "filters": "brightness(.9)", "command": {"command": "foo"}}
+                ] * 2
+            )
+        )
+        self.assertIsNot(entries[0]["theme"], entries[1]["theme"])
+        commands = SharedFactory(lambda command: object())
+        first, second = [
+            make_record(0, e["theme"], None, e["filters"], None, e["command"], commands) for e in entries
+        ]
+        self.assertIs(first.theme, second.theme)
+        self.assertIs(first.filters, second.filters)
+        self.assertIs(first.command, second.command)
+        self.assertIsNot(commands({"command": "bar"}), first.command)
+        self.assertIs(commands({"command": "foo", "args": {"a": 1}}), commands({"args": {"a": 1}, "command": "foo"}))
+        self.assertIsNot(commands({"command": "foo", "args": [1]}), commands({"command": "foo", "args": [True]}))
+
+    def test_str(self):
+        """Test string form."""
+
+        record = ThemeRecord(77400, "a.sublime-color-scheme", None, None, None, {"command": "foo"})
+        self.assertIn("time=21:30:00,", str(record))
+        record = record._replace(command=None)
+        self.assertIs(str(record), str(record))
+
+    def test_key(self):
+        """Test that records with the same output share a key."""
+
+        first = make_record(0, "a.sublime-color-scheme", None, "glow(0.1)", None, None)
+        second = make_record(3600, "a.sublime-color-scheme", None, "glow(0.1)", None, {"command": "foo"})
+        self.assertIs(first.key, second.key)
+        self.assertNotEqual(first.key, make_record(0, "a.sublime-color-scheme", "Hi", "glow(0.1)", None, None).key)
+        self.assertEqual(make_record(0, None, None, None, None, None, key="abc").key, "abc")
+        self.assertEqual(fingerprint(first), fingerprint(ThemeRecord(*first[:6])))
@@ -0,0 +1,134 @@
+"""Test schedule index."""
+import unittest
+from collections import namedtuple
+from datetime import datetime
+from lib.schedule import Rule, Schedule, ScheduleException
+
+Record = namedtuple('Record', ['time', 'name'])
+
+
+def hm(hours, minutes=0):
+    """Get seconds from hours and minutes."""
+
+    return hours * 3600 + minutes * 60
+
+
+class TestSchedule(unittest.TestCase):
+    """Test schedule index."""
+
+    def setUp(self):
+        """Setup schedule."""
+
+        self.day = Record(hm(8, 30), 'day')
+        self.night = Record(hm(21, 30), 'night')
+        self.weekend = Record(hm(10), 'weekend')
+        self.holiday = Record(hm(12), 'holiday')
+        self.schedule = Schedule(
+            [
+                Rule.parse(self.day),
+                Rule.parse(self.night),
+                Rule.parse(self.weekend, days=['sat', 'Sunday']),
+                Rule.parse(self.holiday, dates=[['12-24', '01-01']])
+            ]
+        )
+
+    def test_daily(self):
+        """Test a plain daily cycle on a weekday."""
+
+        # 2026-10-20 is a Tuesday.
+        now = datetime(2026, 10, 20, 7, 0)
+        self.assertEqual(self.schedule.current(now), self.night)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2026, 10, 20, 8, 30), self.day))
+
+        now = datetime(2026, 10, 20, 8, 30)
+        self.assertEqual(self.schedule.current(now), self.day)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2026, 10, 20, 21, 30), self.night))
+
+    def test_day_rollover(self):
+        """Test that the next change rolls over to the next day."""
+
+        now = datetime(2026, 10, 19, 22, 0)
+        self.assertEqual(self.schedule.current(now), self.night)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2026, 10, 20, 8, 30), self.day))
+
+    def test_weekend(self):
+        """Test that weekday rules replace the daily rules."""
+
+        now = datetime(2026, 10, 23, 22, 0)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2026, 10, 24, 10, 0), self.weekend))
+
+        now = datetime(2026, 10, 25, 23, 0)
+        self.assertEqual(self.schedule.current(now), self.weekend)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2026, 10, 26, 8, 30), self.day))
+
+    def test_holiday_wraps_year(self):
+        """Test yearly date ranges that wrap around the end of the year."""
+
+        now = datetime(2026, 12, 31, 13, 0)
+        self.assertEqual(self.schedule.current(now), self.holiday)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2027, 1, 1, 12, 0), self.holiday))
+
+        now = datetime(2027, 1, 1, 13, 0)
+        self.assertEqual(self.schedule.next_change(now), (datetime(2027, 1, 2, 10, 0), self.weekend))
+
+    def test_empty(self):
+        """Test an empty schedule."""
+
+        schedule = Schedule([])
+        now = datetime(2026, 10, 19, 12, 0)
+        self.assertIsNone(schedule.current(now))
+        self.assertEqual(schedule.next_change(now), (None, None))
+
+    def test_invalid(self):
+        """Test invalid restrictions."""
+
+        with self.assertRaises(ScheduleException):
+            Rule.parse(self.day, days=['someday'])
+        with self.assertRaises(ScheduleException):
+            Rule.parse(self.day, dates=['02-30'])
+        with self.assertRaises(ScheduleException):
+            Rule.parse(self.day, dates=[['2026-12-24', '01-01']])
+        with self.assertRaises(ScheduleException):
+            Rule.parse(self.day, days=5)
+        with self.assertRaises(ScheduleException):
+            Rule.parse(self.day, dates=5)
+
+    def test_collapse(self):
+        """Test that changes that change nothing are collapsed, also across midnight."""
+
+        def noop(record, previous):
+            return record.name == previous.name
+
+        evening = Record(hm(18), 'night')
+        morning = Record(hm(1), 'night')
+        schedule = Schedule([Rule.parse(r) for r in (morning, self.day, evening, self.night)], noop=noop)
+        now = datetime(2026, 10, 20, 12, 0)
+        self.assertEqual(schedule.collapsed(now.date()), 2)
+        self.assertEqual(schedule.next_change(now), (datetime(2026, 10, 20, 18, 0), evening))
+        self.assertEqual(schedule.next_change(datetime(2026, 10, 20, 19, 0)), (datetime(2026, 10, 21, 8, 30), self.day))
+        self.assertEqual(schedule.current(datetime(2026, 10, 21, 2, 0)), evening)
+
+        schedule = Schedule([Rule.parse(r) for r in (morning, evening, self.night)], noop=noop)
+        self.assertEqual(schedule.collapsed(now.date()), 2)
+        self.assertEqual(schedule.current(now), morning)
+        self.assertEqual(schedule.next_change(now), (datetime(2026, 10, 21, 1, 0), morning))
+
+    def test_solar(self):
+        """Test that solar rules are resolved per day and skipped when the event does not occur."""
+
+        sunset = Record(0, 'sunset')
+
+        def resolver(solar, d):
+            """Resolve to a time that depends on the day, with no event on the 21st."""
+
+            return None if d.day == 21 else hm(18, d.day) + solar
+
+        schedule = Schedule([Rule.parse(self.day), Rule.parse(sunset, solar=1800)], resolver)
+        self.assertEqual(
+            schedule.next_change(datetime(2026, 10, 20, 12, 0)),
+            (datetime(2026, 10, 20, 18, 50), sunset._replace(time=hm(18, 50)))
+        )
+        self.assertEqual(
+            schedule.next_change(datetime(2026, 10, 21, 12, 0)),
+            (datetime(2026, 10, 22, 8, 30), self.day)
+        )
@@ -0,0 +1,60 @@
+"""Test solar schedule."""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from lib.clock import DAY
+from lib.solar import SUNRISE, SUNSET, Solar, SolarTable, parse_solar
+
+
+class TestSolar(unittest.TestCase):
+    """Test solar schedule."""
+
+    def setUp(self):
+        """Setup cache folder."""
+
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove cache folder."""
+
+        shutil.rmtree(self.cache_dir)
+
+    def test_parse(self):
+        """Test parsing solar times."""
+
+        self.assertEqual(parse_solar('sunset'), (SUNSET, 0))
+        self.assertEqual(parse_solar('sunset+00:30'), (SUNSET, 1800))
+        self.assertEqual(parse_solar('Sunrise - 1:15'), (SUNRISE, -4500))
+        self.assertIsNone(parse_solar('21:30'))
+
+    def test_events(self):
+        """Test against known sunrise and sunset times (London, summer solstice: 04:43 and 21:21 BST)."""
+
+        table = SolarTable(51.5074, -0.1278, 2024)
+        self.assertAlmostEqual(table.event(SUNRISE, date(2024, 6, 21)), 3 * 60 + 43, delta=3)
+        self.assertAlmostEqual(table.event(SUNSET, date(2024, 6, 21)), 20 * 60 + 21, delta=3)
+
+    def test_offset_clamped(self):
+        """Test that offsets past midnight don't wrap around to the same day."""
+
+        solar = Solar(51.5074, -0.1278)
+        day = date(2024, 6, 21)
+        self.assertEqual(solar.resolve(parse_solar('sunset+23:59'), day), DAY - 1)
+        self.assertEqual(solar.resolve(parse_solar('sunrise-23:59'), day), 0)
+
+    def test_polar(self):
+        """Test days where the sun does not rise."""
+
+        table = SolarTable(69.65, 18.96, 2024)
+        self.assertIsNone(table.event(SUNRISE, date(2024, 12, 21)))
+        self.assertIsNone(table.event(SUNSET, date(2024, 6, 21)))
+
+    def test_cache(self):
+        """Test that the table is cached on disk and reloaded."""
+
+        table = SolarTable(40.71, -74.01, 2023, self.cache_dir)
+        self.assertEqual(len(table.table), 365 * 2)
+        self.assertTrue(os.path.exists(table.cache_file))
+        self.assertEqual(SolarTable(40.71, -74.01, 2023, self.cache_dir).load(), table.table)
@@ -0,0 +1,69 @@
+"""Test preference transactions."""
+import unittest
+from lib.transaction import Transaction
+
+
+class Settings(dict):
+    """Settings that count the writes that would trigger a redraw."""
+
+    def __init__(self, *args, **kwargs):
+        """Setup counter."""
+
+        super().__init__(*args, **kwargs)
+        self.redraws = 0
+
+    def set(self, key, value):  # noqa: A003
+        """Set a value (mirrors `sublime.Settings`)."""
+
+        self[key] = value
+        self.redraws += 1
+
+    def erase(self, key):
+        """Erase a value."""
+
+        self.pop(key, None)
+        self.redraws += 1
+
+
+class TestTransaction(unittest.TestCase):
+    """Test preference transactions."""
+
+    def test_batch(self):
+        """Test that each changed key is written once and unchanged keys not at all."""
+
+        settings = Settings({"color_scheme": "a.sublime-color-scheme", "theme": "Default.sublime-theme"})
+        txn = Transaction(settings)
+        txn.stage("color_scheme", "b.sublime-color-scheme")
+        txn.stage("theme", "Default.sublime-theme")
+        txn.stage("font_size", None)
+        self.assertEqual(txn.commit(), ["color_scheme"])
+        self.assertEqual(settings.redraws, 1)
+        self.assertEqual(settings["color_scheme"], "b.sublime-color-scheme")
+
+    def test_no_change(self):
+        """Test that reapplying the same record doesn't trigger a redraw."""
+
+        settings = Settings({"color_scheme": "a.sublime-color-scheme"})
+        txn = Transaction(settings)
+        txn.stage("color_scheme", "a.sublime-color-scheme")
+        self.assertEqual(txn.commit(), [])
+        self.assertEqual(settings.redraws, 0)
+
+    def test_rollback(self):
+        """Test that a failing step restores the previous preferences."""
+
+        def fail():
+            """Fail."""
+
+            raise RuntimeError("failed")
+
+        settings = Settings({"color_scheme": "a.sublime-color-scheme"})
+        txn = Transaction(settings)
+        txn.stage("color_scheme", "b.sublime-color-scheme")
+        txn.stage("theme", "Adaptive.sublime-theme")
+        txn.add_step(fail)
+        with self.assertRaises(RuntimeError):
+            txn.commit()
+        self.assertEqual(settings, {"color_scheme": "a.sublime-color-scheme"})
+        # Two writes to apply, two to roll back.
+        self.assertEqual(settings.redraws, 4)
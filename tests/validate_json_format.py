@@ -7,45 +7,36 @@ Copyright (c) 2012-2015 Isaac Muse <isaacmuse@gmail.com>
 import re
 import codecs
 import json
+import os
+import hashlib
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_VERSION = 1
 
 RE_LINE_PRESERVE = re.compile(r"\r?\n", re.MULTILINE)
-RE_COMMENT = re.compile(
+RE_BLOCK_COMMENT = r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
+RE_JSON = re.compile(
     r'''(?x)
         (?P<comments>
-            /\*[^*]*\*+(?:[^/*][^*]*\*+)*/  # multi-line comments
+            %(block)s                       # multi-line comments
           | [ \t]*//(?:[^\r\n])*            # single line comments
         )
-      | (?P<code>
-            "(?:\\.|[^"\\])*"               # double quotes
-          | .[^/"']*                        # everything else
-        )
-    ''',
-    re.DOTALL
-)
-RE_TRAILING_COMMA = re.compile(
-    r'''(?x)
-        (
-            (?P<square_comma>
-                ,                        # trailing comma
-                (?P<square_ws>[\s\r\n]*) # white space
-                (?P<square_bracket>\])   # bracket
-            )
-          | (?P<curly_comma>
-                ,                        # trailing comma
-                (?P<curly_ws>[\s\r\n]*)  # white space
-                (?P<curly_bracket>\})    # bracket
-            )
+      | (?P<comma>
+            ,                               # trailing comma
+            (?P<comma_ws>(?:\s|%(block)s|//[^\r\n]*)*)  # white space and comments
+            (?P<bracket>[\]}])              # bracket
         )
       | (?P<code>
-            "(?:\\.|[^"\\])*"            # double quoted string
-          | .[^,"']*                     # everything else
+            "(?:\\.|[^"\\])*"               # double quotes
+          | .[^/,"']*                       # everything else
         )
-    ''',
+    ''' % {'block': RE_BLOCK_COMMENT},
     re.DOTALL
 )
+RE_INNER_COMMENT = re.compile(r'%s|//[^\r\n]*' % RE_BLOCK_COMMENT)
 RE_LINE_INDENT_TAB = re.compile(r'^(?:(\t+)?(?:(/\*)|[^ \t\r\n])[^\r\n]*)?\r?\n$')
 RE_LINE_INDENT_SPACE = re.compile(r'^(?:((?: {4})+)?(?:(/\*)|[^ \t\r\n])[^\r\n]*)?\r?\n$')
-RE_TRAILING_SPACES = re.compile(r'^.*?[ \t]+\r?\n?$')
 RE_COMMENT_END = re.compile(r'\*/')
 PATTERN_COMMENT_INDENT_SPACE = r'^(%s *?[^\t\r\n][^\r\n]*)?\r?\n$'
 PATTERN_COMMENT_INDENT_TAB = r'^(%s[ \t]*[^ \t\r\n][^\r\n]*)?\r?\n$'
@@ -85,37 +76,30 @@ class CheckJsonFormat(object):
         - Malformed JSON.
     """
 
-    def __init__(self, use_tabs=False, allow_comments=False):
+    def __init__(self, use_tabs=False, allow_comments=False, quiet=False):
         """Setup the settings."""
 
         self.use_tabs = use_tabs
         self.allow_comments = allow_comments
+        self.quiet = quiet
         self.fail = False
+        self.messages = []
+        self.line_starts = []
 
     def index_lines(self, text):
-        """Index the char range of each line."""
+        """Index the starting char of each line."""
 
-        self.line_range = []
-        count = 1
-        last = 0
-        for m in re.finditer('\n', text):
-            self.line_range.append((last, m.end(0) - 1, count))
-            last = m.end(0)
-            count += 1
+        self.line_starts = [0]
+        self.line_starts.extend(m.end(0) for m in re.finditer('\n', text))
 
     def get_line(self, pt):
         """Get the line from char index."""
 
-        line = None
-        for r in self.line_range:
-            if pt >= r[0] and pt <= r[1]:
-                line = r[2]
-                break
-        return line
+        return bisect_right(self.line_starts, pt)
 
-    def check_comments(self, text):
+    def check_content(self, text):
         """
-        Check for JavaScript comments.
+        Check for JavaScript comments and dangling commas in a single pass.
 
         Log them and strip them out so we can continue.
         """
@@ -124,39 +108,22 @@ class CheckJsonFormat(object):
             return ''.join([x[0] for x in RE_LINE_PRESERVE.findall(group)])
 
         def evaluate(m):
-            text = ''
             g = m.groupdict()
-            if g["code"] is None:
+            if g["code"] is not None:
+                return g["code"]
+            if g["comments"] is not None:
                 if not self.allow_comments:
                     self.log_failure(E_COMMENTS, self.get_line(m.start(0)))
-                text = remove_comments(g["comments"])
-            else:
-                text = g["code"]
-            return text
-
-        content = ''.join(map(lambda m: evaluate(m), RE_COMMENT.finditer(text)))
-        return content
-
-    def check_dangling_commas(self, text):
-        """
-        Check for dangling commas.
-
-        Log them and strip them out so we can continue.
-        """
-
-        def check_comma(g, m, line):
+                return remove_comments(g["comments"])
             # ,] -> ] or ,} -> }
-            self.log_failure(E_COMMA, line)
-            if g["square_comma"] is not None:
-                return g["square_ws"] + g["square_bracket"]
-            else:
-                return g["curly_ws"] + g["curly_bracket"]
+            self.log_failure(E_COMMA, self.get_line(m.start(0)))
+            ws = g["comma_ws"]
+            if not self.allow_comments:
+                for c in RE_INNER_COMMENT.finditer(ws):
+                    self.log_failure(E_COMMENTS, self.get_line(m.start('comma_ws') + c.start(0)))
+            return RE_INNER_COMMENT.sub(lambda c: remove_comments(c.group(0)), ws) + g["bracket"]
 
-        def evaluate(m):
-            g = m.groupdict()
-            return check_comma(g, m, self.get_line(m.start(0))) if g["code"] is None else g["code"]
-
-        return ''.join(map(lambda m: evaluate(m), RE_TRAILING_COMMA.finditer(text)))
+        return ''.join(map(evaluate, RE_JSON.finditer(text)))
 
     def log_failure(self, code, line=None):
         """
@@ -166,66 +133,233 @@ class CheckJsonFormat(object):
         """
 
         if line:
-            print("%s: Line %d - %s" % (code, line, VIOLATION_MSG[code]))
+            msg = "%s: Line %d - %s" % (code, line, VIOLATION_MSG[code])
         else:
-            print("%s: %s" % (code, VIOLATION_MSG[code]))
+            msg = "%s: %s" % (code, VIOLATION_MSG[code])
+        self.messages.append(msg)
+        if not self.quiet:
+            print(msg)
         self.fail = True
 
-    def check_format(self, file_name):
-        """Initiate the check."""
+    def check_lines(self, text):
+        """Check the format of each line."""
 
-        self.fail = False
         comment_align = None
-        with codecs.open(file_name, encoding='utf-8') as f:
-            count = 1
-            for line in f:
-                indent_match = (RE_LINE_INDENT_TAB if self.use_tabs else RE_LINE_INDENT_SPACE).match(line)
-                end_comment = (
-                    (comment_align is not None or (indent_match and indent_match.group(2))) and
-                    RE_COMMENT_END.search(line)
-                )
-                # Don't allow empty lines at file start.
-                if count == 1 and line.strip() == '':
-                    self.log_failure(W_NL_START, count)
-                # Line must end in new line
-                if not line.endswith('\n'):
-                    self.log_failure(W_NL_END, count)
-                # Trailing spaces
-                if RE_TRAILING_SPACES.match(line):
-                    self.log_failure(W_TRAILING_SPACE, count)
-                # Handle block comment content indentation
-                if comment_align is not None:
-                    if comment_align.match(line) is None:
-                        self.log_failure(W_COMMENT_INDENT, count)
-                    if end_comment:
-                        comment_align = None
-                # Handle general indentation
-                elif indent_match is None:
-                    self.log_failure(W_INDENT, count)
-                # Enter into block comment
-                elif comment_align is None and indent_match.group(2):
-                    alignment = indent_match.group(1) if indent_match.group(1) is not None else ""
-                    if not end_comment:
-                        comment_align = re.compile(
-                            (PATTERN_COMMENT_INDENT_TAB if self.use_tabs else PATTERN_COMMENT_INDENT_SPACE) % alignment
-                        )
-                count += 1
-            f.seek(0)
-            text = f.read()
+        for count, line in enumerate(text.splitlines(True), 1):
+            indent_match = (RE_LINE_INDENT_TAB if self.use_tabs else RE_LINE_INDENT_SPACE).match(line)
+            end_comment = (
+                (comment_align is not None or (indent_match and indent_match.group(2))) and
+                RE_COMMENT_END.search(line)
+            )
+            # Don't allow empty lines at file start.
+            if count == 1 and line.strip() == '':
+                self.log_failure(W_NL_START, count)
+            # Line must end in new line
+            if not line.endswith('\n'):
+                self.log_failure(W_NL_END, count)
+            # Trailing spaces
+            if line.rstrip('\r\n')[-1:] in (' ', '\t'):
+                self.log_failure(W_TRAILING_SPACE, count)
+            # Handle block comment content indentation
+            if comment_align is not None:
+                if comment_align.match(line) is None:
+                    self.log_failure(W_COMMENT_INDENT, count)
+                if end_comment:
+                    comment_align = None
+            # Handle general indentation
+            elif indent_match is None:
+                self.log_failure(W_INDENT, count)
+            # Enter into block comment
+            elif comment_align is None and indent_match.group(2):
+                alignment = indent_match.group(1) if indent_match.group(1) is not None else ""
+                if not end_comment:
+                    comment_align = re.compile(
+                        (PATTERN_COMMENT_INDENT_TAB if self.use_tabs else PATTERN_COMMENT_INDENT_SPACE) % alignment
+                    )
+
+    def check_text(self, text):
+        """Check the text of a file."""
 
+        self.fail = False
+        self.messages = []
+        self.check_lines(text)
         self.index_lines(text)
-        text = self.check_comments(text)
-        self.index_lines(text)
-        text = self.check_dangling_commas(text)
+        text = self.check_content(text)
         try:
             json.loads(text)
         except Exception as e:
             self.log_failure(E_MALFORMED)
-            print(e)
+            self.messages.append(str(e))
+            if not self.quiet:
+                print(e)
         return self.fail
 
+    def check_format(self, file_name):
+        """Initiate the check."""
+
+        with codecs.open(file_name, encoding='utf-8') as f:
+            text = f.read()
+        return self.check_text(text)
+
+
+class FormatCache(object):
+    """
+    Cache of files that passed the check.
+
+    A file is skipped if its modification time and size are unchanged, or if its content hash is unchanged.
+    """
+
+    def __init__(self, path, use_tabs=False, allow_comments=False):
+        """Load the cache."""
+
+        self.path = path
+        self.key = '%d:%d:%d' % (CACHE_VERSION, use_tabs, allow_comments)
+        self.entries = {}
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('key') == self.key:
+                self.entries = data['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def stat(file_name):
+        """Get the modification time and size of a file."""
+
+        st = os.stat(file_name)
+        return [st.st_mtime_ns, st.st_size]
+
+    @staticmethod
+    def digest(file_name):
+        """Get the content hash of a file."""
+
+        with open(file_name, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def is_current(self, file_name):
+        """Check if the file is unchanged since it last passed."""
+
+        entry = self.entries.get(file_name)
+        if entry is None:
+            return False
+        stat = self.stat(file_name)
+        if entry[:2] == stat:
+            return True
+        if entry[2] == self.digest(file_name):
+            entry[:2] = stat
+            return True
+        return False
+
+    def add(self, file_name):
+        """Record a file that passed."""
+
+        self.entries[file_name] = self.stat(file_name) + [self.digest(file_name)]
+
+    def discard(self, file_name):
+        """Forget a file that failed."""
+
+        self.entries.pop(file_name, None)
+
+    def save(self):
+        """Save the cache."""
+
+        try:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump({'key': self.key, 'files': self.entries}, f)
+        except OSError:
+            pass
+
+
+def _check_file(args):
+    """Check a file in a worker process."""
+
+    file_name, use_tabs, allow_comments = args
+    checker = CheckJsonFormat(use_tabs, allow_comments, quiet=True)
+    return file_name, checker.check_format(file_name), checker.messages
+
+
+def check_files(files, use_tabs=False, allow_comments=False, cache=None, jobs=None):
+    """
+    Check files in parallel.
+
+    Returns a dictionary of failing files and their messages.
+    Files that are unchanged since they last passed (according to the optional cache file) are skipped.
+    """
+
+    fmt_cache = FormatCache(cache, use_tabs, allow_comments) if cache else None
+    pending = [f for f in files if fmt_cache is None or not fmt_cache.is_current(f)]
+    failures = {}
+    if len(pending) > 1 and jobs != 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = list(
+                executor.map(
+                    _check_file,
+                    [(f, use_tabs, allow_comments) for f in pending],
+                    chunksize=max(1, len(pending) // ((jobs or os.cpu_count() or 1) * 4))
+                )
+            )
+    else:
+        results = [_check_file((f, use_tabs, allow_comments)) for f in pending]
+    for file_name, fail, messages in results:
+        if fail:
+            failures[file_name] = messages
+            if fmt_cache is not None:
+                fmt_cache.discard(file_name)
+        elif fmt_cache is not None:
+            fmt_cache.add(file_name)
+    if fmt_cache is not None:
+        fmt_cache.save()
+    return failures
+
+
+def benchmark(count=2000, entries=200):
+    """Time the check of a synthetic corpus, sequentially, in parallel, and with a warm cache."""
+
+    import tempfile
+    import shutil
+    import timeit
+
+    folder = tempfile.mkdtemp()
+    try:
+        content = json.dumps(
+            {
+                "enabled": True,
+                "themes": [
+                    {"theme": "Packages/User/Color Scheme/theme%d.tmTheme" % i, "time": "%d:%02d" % (i % 24, i % 60)}
+                    for i in range(entries)
+                ]
+            },
+            indent=4
+        ).replace('{\n', '{\n    // Comment\n', 1) + '\n'
+        files = []
+        for i in range(count):
+            file_name = os.path.join(folder, 'test%d.sublime-settings' % i)
+            with open(file_name, 'w') as f:
+                f.write(content)
+            files.append(file_name)
+        cache = os.path.join(folder, 'cache.json')
+
+        size = len(content) * count / (1024.0 * 1024.0)
+        print('Corpus: %d files, %.1f MiB' % (count, size))
+        for name, fn in (
+            ('sequential', lambda: check_files(files, False, True, jobs=1)),
+            ('parallel', lambda: check_files(files, False, True)),
+            ('cold cache', lambda: check_files(files, False, True, cache=cache)),
+            ('warm cache', lambda: check_files(files, False, True, cache=cache))
+        ):
+            print('%-12s %.3fs' % (name, timeit.timeit(fn, number=1)))
+    finally:
+        shutil.rmtree(folder)
+
 
 if __name__ == "__main__":
     import sys
-    cjf = CheckJsonFormat(False, True)
-    cjf.check_format(sys.argv[1])
+    if sys.argv[1] == '--benchmark':
+        benchmark(*[int(x) for x in sys.argv[2:4]])
+    else:
+        cjf = CheckJsonFormat(False, True)
+        cjf.check_format(sys.argv[1])